@@ -1,11 +1,38 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
+import os
 import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
 from rtmask.core.ip_converter import IPConverter, IPConversionResult
+from rtmask.core.bulk import CIDRBatch, expand_results
+from rtmask.core.executor import DEFAULT_CONCURRENCY
+from rtmask.core.cache import DEFAULT_TTLS, EnrichmentCache
+from rtmask.core.http import DEFAULT_POOL_SIZE, HTTPClient
+from rtmask.core.enrichment import get_stages
+from rtmask.core.incremental import DEFAULT_MAX_AGES, IncrementalRun
+from rtmask.core.rdap import IANA_BOOTSTRAP_URL, REFERRAL_SERVER, RDAPClient
+from rtmask.core.metrics import Metrics
+from rtmask.core.prober import DEFAULT_PORTS, DEFAULT_PROBE_TIMEOUT, MAX_PORTS, ReachabilityProber
+from rtmask.core.resolver import DEFAULT_DNS_CONCURRENCY, AsyncResolver
+from rtmask.core.shard import count_targets, parse_shard, shard_bounds, shard_units
+from rtmask.utils.merge import CONCATENABLE, read_results, shard_order
 from rtmask.utils.output_formatter import OutputFormatter
+from rtmask.utils.writers import DEFAULT_PAGE_SIZE
+
+if TYPE_CHECKING:
+    from rtmask.core.journal import JobJournal
+
+# Domains read ahead from the input and resolved together
+DNS_PREFETCH_CHUNK = 1024
+
+# Options that define what a journaled job produces; --resume restores them
+JOB_OPTIONS = ('ip', 'domain', 'cidr', 'file', 'output', 'format', 'output_dir', 'qr', 'qr_archive',
+               'whois', 'geo', 'network', 'ports', 'probe_timeout', 'geo_db', 'all_records', 'plain', 'compact',
+               'shard', 'dedupe', 'page_size', 'rdap_bootstrap', 'whois_referral', 'previous', 'max_age',
+               'changes')
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -18,8 +45,18 @@ Examples:
   %(prog)s -c 192.168.1.0/24
   %(prog)s -f input.txt
   %(prog)s -i 192.168.1.1 --format json
+  %(prog)s -c 10.0.0.0/16 --format html-pages -o report.html
   %(prog)s -i 192.168.1.1 --qr
+  %(prog)s -c 192.168.1.0/24 --qr --qr-archive codes.zip
   %(prog)s -i 192.168.1.1 --whois --geo
+  %(prog)s -f networks.txt --geo -o results.jsonl --job-dir jobs/sweep
+  %(prog)s --resume jobs/sweep
+  %(prog)s -f networks.txt --dedupe -o results.csv
+  %(prog)s -f targets.txt --geo --whois --previous last.jsonl -o new.jsonl --changes changes.jsonl
+  %(prog)s -c 10.0.0.0/8 -o sweep.csv --parallel
+  %(prog)s -c 10.0.0.0/8 -o part-3.jsonl --shard 3/16
+  %(prog)s --merge part-*.jsonl -o report.html
+  %(prog)s --serve 127.0.0.1:8750 --geo
         '''
     )
 
@@ -28,18 +65,151 @@ Examples:
     input_group.add_argument('-d', '--domain', help='Domain name to resolve and convert')
     input_group.add_argument('-c', '--cidr', help='CIDR notation (e.g., 192.168.1.0/24)')
     input_group.add_argument('-f', '--file', help='File containing IPv4 addresses or CIDR ranges')
+    input_group.add_argument('--resume', metavar='JOBDIR',
+                           help='Continue an interrupted job with the options it was started with')
+    input_group.add_argument('--merge', nargs='+', metavar='FILE',
+                           help='Combine shard outputs (.jsonl, .json or .rtm, or .csv into a CSV output) into one report')
+    input_group.add_argument('--serve', nargs='?', const='127.0.0.1:8750', metavar='ADDR',
+                           help='Serve a JSON API on HOST:PORT or unix:PATH (default: 127.0.0.1:8750)')
 
     parser.add_argument('-o', '--output', help='Output file (format determined by extension)')
-    parser.add_argument('--format', choices=['text', 'json', 'csv', 'html'], 
-                      default='text', help='Output format')
+    parser.add_argument('--format', choices=['text', 'json', 'jsonl', 'csv', 'html', 'html-pages', 'rtm'], 
+                      default='text', help='Output format (html-pages: paginated report with chunked data; '
+                                           'rtm: packed columnar file)')
+    parser.add_argument('--page-size', type=parse_positive_int, default=DEFAULT_PAGE_SIZE,
+                      help=f'Rows per page of an html-pages report (default: {DEFAULT_PAGE_SIZE})')
     parser.add_argument('--output-dir', help='Directory for output files')
+    parser.add_argument('--job-dir', metavar='JOBDIR',
+                      help='Journal finished work in JOBDIR so an interrupted run can be resumed')
+    parser.add_argument('--dedupe', action='store_true',
+                      help='Merge overlapping ranges and process every address once (output sorted by address)')
+    parser.add_argument('--previous', metavar='FILE',
+                      help='Results of an earlier run (.json, .jsonl or .rtm); reuse its enrichments '
+                           'that are not stale and report what changed')
+    parser.add_argument('--max-age', type=parse_max_age, action='append', metavar='STAGE=SECONDS',
+                      help='With --previous, re-run geo, whois or network lookups older than this')
+    parser.add_argument('--changes', metavar='FILE',
+                      help='With --previous, write the change report to FILE as JSON Lines')
+    parser.add_argument('--shard', type=parse_shard_arg, metavar='K/N',
+                      help='Only process shard K of N of the targets (e.g. 3/16)')
+    parser.add_argument('--parallel', type=parse_positive_int, nargs='?', const=os.cpu_count() or 1, metavar='N',
+                      help='Run N shards in separate processes and merge their outputs (default: one per CPU)')
     parser.add_argument('--qr', action='store_true', help='Generate QR codes for URLs')
+    parser.add_argument('--qr-archive', metavar='PATH',
+                      help='Store QR codes in one .zip file, or in .png sprite sheets with a JSON index')
+    parser.add_argument('--qr-workers', type=parse_positive_int,
+                      help='Processes rendering QR codes (default: one per CPU)')
     parser.add_argument('--whois', action='store_true', help='Include WHOIS information')
+    parser.add_argument('--rdap-bootstrap', default=IANA_BOOTSTRAP_URL, metavar='URL',
+                      help='Where to fetch the RDAP bootstrap tables used to route --whois queries '
+                           '(default: IANA)')
+    parser.add_argument('--whois-referral', default=REFERRAL_SERVER, metavar='HOST[:PORT]',
+                      help=f'Port-43 server asked where to send queries RDAP cannot answer (default: {REFERRAL_SERVER})')
     parser.add_argument('--geo', action='store_true', help='Include geolocation information')
     parser.add_argument('--network', action='store_true', help='Include network information')
+    parser.add_argument('--ports', type=parse_ports, default=DEFAULT_PORTS, metavar='PORTS',
+                      help=f"Comma-separated TCP ports to check with --network (default: {','.join(map(str, DEFAULT_PORTS))})")
+    parser.add_argument('--probe-timeout', type=float, default=DEFAULT_PROBE_TIMEOUT,
+                      help=f'Seconds to wait for ping and port probes (default: {DEFAULT_PROBE_TIMEOUT})')
+    parser.add_argument('--geo-db', metavar='PATH',
+                      help='Local MaxMind .mmdb database for offline geolocation (ipapi.co is the fallback)')
+    parser.add_argument('--workers', type=parse_positive_int, default=DEFAULT_CONCURRENCY,
+                      help=f'Concurrent lookups per enrichment stage (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--target-timeout', type=parse_positive_float,
+                      help='Seconds to wait for the resolution and enrichments of a single target')
+    parser.add_argument('--all-records', action='store_true',
+                      help='Convert every A record of a domain instead of only the first')
+    parser.add_argument('--dns-concurrency', type=parse_positive_int, default=DEFAULT_DNS_CONCURRENCY,
+                      help=f'DNS queries in flight at once (default: {DEFAULT_DNS_CONCURRENCY})')
+    parser.add_argument('--rate-limit', type=parse_rate, action='append', metavar='HOST=RPS',
+                      help='Requests per second allowed to an enrichment provider host')
+    parser.add_argument('--cache-dir', help='Directory for the enrichment cache (default: ~/.cache/rtmask)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the enrichment cache')
+    parser.add_argument('--cache-stats', action='store_true', help='Print cache statistics after the run')
+    parser.add_argument('--cache-ttl', type=parse_ttl, action='append', metavar='KIND=SECONDS',
+                      help='Override the cache TTL for dns, ptr, geo or whois lookups')
+    parser.add_argument('--stats', action='store_true',
+                      help='Print per-stage timings, error, cache hit and retry counts after the run')
+    parser.add_argument('--metrics-file', metavar='PATH',
+                      help='Write per-stage metrics as JSON, or Prometheus text for a .prom path')
+    parser.add_argument('--profile', metavar='PATH',
+                      help='Save a cProfile dump of the run (main thread) for python -m pstats')
     parser.add_argument('--no-banner', action='store_true', help='Disable banner display')
+    parser.add_argument('--plain', action='store_true',
+                      help='Print text results as tab-separated lines instead of tables (fastest startup)')
+    parser.add_argument('--compact', action='store_true',
+                      help='Print text results as one streaming, column-aligned table (for large inputs)')
+    parser.add_argument('--progress', action='store_true', default=None,
+                      help='Show a live progress line with rate, ETA and stage errors on stderr '
+                           '(default: for -c/-f runs on a terminal, with --compact or a file output)')
+    parser.add_argument('--no-progress', dest='progress', action='store_false',
+                      help='Do not show the progress line')
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    args.cache_ttl = dict(args.cache_ttl or [])
+    args.rate_limit = dict(args.rate_limit or [])
+    args.max_age = dict(args.max_age or [])
+    return args
+
+def parse_shard_arg(value: str) -> Tuple[int, int]:
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def parse_positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected at least 1, not {number}")
+    return number
+
+def parse_positive_float(value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {value}")
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"expected a number above 0, not {value}")
+    return number
+
+def parse_ports(value: str) -> Tuple[int, ...]:
+    try:
+        ports = tuple(int(port) for port in value.split(',') if port.strip())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid port list: {value}")
+    if len(ports) > MAX_PORTS or any(not 0 < port < 65536 for port in ports):
+        raise argparse.ArgumentTypeError(f"expected up to {MAX_PORTS} ports between 1 and 65535")
+    return ports
+
+def parse_rate(value: str) -> Tuple[str, float]:
+    host, sep, rate = value.partition('=')
+    try:
+        if not sep or not host or float(rate) <= 0:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected HOST=RPS with a positive number of requests per second")
+    return host, float(rate)
+
+def parse_ttl(value: str) -> Tuple[str, float]:
+    kind, sep, seconds = value.partition('=')
+    if not sep or kind not in DEFAULT_TTLS:
+        raise argparse.ArgumentTypeError(f"expected KIND=SECONDS with KIND one of {', '.join(DEFAULT_TTLS)}")
+    try:
+        return kind, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number of seconds: {seconds}")
+
+def parse_max_age(value: str) -> Tuple[str, float]:
+    stage, sep, seconds = value.partition('=')
+    if not sep or stage not in DEFAULT_MAX_AGES:
+        raise argparse.ArgumentTypeError(f"expected STAGE=SECONDS with STAGE one of {', '.join(DEFAULT_MAX_AGES)}")
+    try:
+        return stage, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number of seconds: {seconds}")
 
 def generate_banner() -> str:
     return """
@@ -52,35 +222,121 @@ def generate_banner() -> str:
     #     #    #          #     # #     #  #####  #    # 
     """
 
-def process_input(converter: IPConverter, args: argparse.Namespace) -> List[IPConversionResult]:
-    results = []
+def selected_enrichments(args: argparse.Namespace) -> List[str]:
+    return [name for name in ('geo', 'whois', 'network') if getattr(args, name)]
+
+def enrichment_requested(args: argparse.Namespace) -> bool:
+    return args.qr or bool(selected_enrichments(args))
+
+def read_entries(path: str) -> Iterator[str]:
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+def prefetch_entries(converter: IPConverter, entries: Iterable[str], chunk_size: int = DNS_PREFETCH_CHUNK) -> Iterator[str]:
+    """Pass entries through, resolving the domains among them a chunk at a time."""
+    chunk = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) >= chunk_size:
+            converter.prefetch_domains(e for e in chunk if isinstance(e, str) and '/' not in e)
+            yield from chunk
+            chunk = []
+    if chunk:
+        converter.prefetch_domains(e for e in chunk if isinstance(e, str) and '/' not in e)
+        yield from chunk
+
+def iter_units(converter: IPConverter, entries: Iterable[Union[str, CIDRBatch]]) -> Iterator[Union[str, CIDRBatch]]:
+    """Split entries into units of plain work: CIDR batches and single targets."""
+    for entry in entries:
+        if isinstance(entry, CIDRBatch):  # Part of a range split by --shard
+            yield entry
+        elif '/' in entry:  # CIDR notation
+            yield from converter.iter_cidr_batches(entry)
+        else:
+            yield entry
+
+def iter_targets(converter: IPConverter, entries: Iterable[Union[str, CIDRBatch]]) -> Iterator[str]:
+    """Expand CIDR entries into individual host addresses."""
+    for unit in iter_units(converter, entries):
+        if isinstance(unit, CIDRBatch):
+            yield from unit.ipv4
+        else:
+            yield unit
+
+def shard_entries(args: argparse.Namespace, read: Callable[[], Iterable[str]]) -> Iterable[Union[str, CIDRBatch]]:
+    """Entries of the input, restricted to the shard selected with --shard."""
+    if not args.shard:
+        return read()
+    # One pass to number the targets, a second to pick this shard's slice
+    return shard_units(read(), *args.shard, count_targets(read()))
+
+def process_entries(converter: IPConverter, entries: Iterable[Union[str, CIDRBatch]], args: argparse.Namespace,
+                    journal: Optional['JobJournal'] = None,
+                    incremental: Optional[IncrementalRun] = None) -> Iterator[Union[IPConversionResult, CIDRBatch]]:
+    if not args.dedupe:
+        yield from process_units(converter, entries, args, journal, incremental)
+        return
     
+    # Plan the whole input first so every address is processed once
+    from rtmask.core.planner import InputPlan
+    plan = InputPlan.build(converter, entries, all_records=args.all_records)
+    print('\n'.join(plan.report()), file=sys.stderr)
+    yield from plan.expand(process_units(converter, plan.units(), args, journal, incremental))
+
+def process_units(converter: IPConverter, entries: Iterable[Union[str, CIDRBatch]], args: argparse.Namespace,
+                  journal: Optional['JobJournal'] = None,
+                  incremental: Optional[IncrementalRun] = None) -> Iterator[Union[IPConversionResult, CIDRBatch]]:
+    if journal:
+        # Results of an earlier run of the job come first, then the rest
+        yield from journal.replay()
+        if journal.complete:
+            return
+    entries = prefetch_entries(converter, entries)
+    if enrichment_requested(args):
+        # Enrich every host of every entry through one concurrent batch
+        targets = iter_targets(converter, entries)
+        if journal:
+            targets = journal.skip(targets)
+        carry_over = incremental.carry_over if incremental else None
+        for results in converter.map_targets(targets, concurrency=args.workers, generate_qr=args.qr,
+                                             timeout=args.target_timeout, carry_over=carry_over):
+            if journal:
+                journal.record(results)
+            yield from results
+        return
+
+    # Plain conversions skip per-host processing and use the bulk path
+    units = iter_units(converter, entries)
+    if journal:
+        units = journal.skip(units)
+    for unit in units:
+        results = unit if isinstance(unit, CIDRBatch) else converter.process_target(unit)
+        if journal:
+            journal.record(results)
+        if isinstance(results, CIDRBatch):
+            yield results
+        else:
+            yield from results
+
+def process_input(converter: IPConverter, args: argparse.Namespace,
+                  journal: Optional['JobJournal'] = None,
+                  incremental: Optional[IncrementalRun] = None) -> Iterator[Union[IPConversionResult, CIDRBatch]]:
+    """Yield results as they are produced so they can be written immediately."""
     if args.ip:
-        result = converter.process_ip(args.ip, args.qr)
-        if result:
-            results.append(result)
+        yield from process_entries(converter, shard_entries(args, lambda: [args.ip]), args, journal, incremental)
     
     elif args.domain:
-        result = converter.process_ip(args.domain, args.qr)
-        if result:
-            results.append(result)
+        yield from process_entries(converter, shard_entries(args, lambda: [args.domain]), args, journal, incremental)
     
     elif args.cidr:
-        results.extend(converter.process_cidr(args.cidr, args.qr))
+        yield from process_entries(converter, shard_entries(args, lambda: [args.cidr]), args, journal, incremental)
     
     elif args.file:
-        with open(args.file) as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                    
-                if '/' in line:  # CIDR notation
-                    results.extend(converter.process_cidr(line, args.qr))
-                else:
-                    result = converter.process_ip(line, args.qr)
-                    if result:
-                        results.append(result)
+        yield from process_entries(converter, shard_entries(args, lambda: read_entries(args.file)), args, journal,
+                                   incremental)
     
     else:  # Interactive mode
         while True:
@@ -89,12 +345,7 @@ def process_input(converter: IPConverter, args: argparse.Namespace) -> List[IPCo
                 if user_input.lower() == 'exit':
                     break
                     
-                if '/' in user_input:  # CIDR notation
-                    results.extend(converter.process_cidr(user_input, args.qr))
-                else:
-                    result = converter.process_ip(user_input, args.qr)
-                    if result:
-                        results.append(result)
+                yield from process_entries(converter, [user_input], args)
                         
             except KeyboardInterrupt:
                 print("\nExiting...")
@@ -102,11 +353,205 @@ def process_input(converter: IPConverter, args: argparse.Namespace) -> List[IPCo
                 
             except Exception as e:
                 print(f"\033[91mError: {str(e)}\033[0m")
+
+def output_path(args: argparse.Namespace) -> str:
+    """The -o file, or a default name for --format."""
+    if args.output:
+        return args.output
+    return f"rtmask_results.{'html' if args.format == 'html-pages' else args.format}"
+
+def output_format(args: argparse.Namespace, output_file: str) -> Optional[str]:
+    for fmt in ('json', 'jsonl', 'html-pages', 'html', 'csv', 'rtm'):
+        if args.format == fmt or output_file.endswith(f'.{fmt}'):
+            return fmt
+    return None
+
+def show_progress(args: argparse.Namespace) -> bool:
+    """Whether to draw the progress line: never under per-result text output, else --progress or auto."""
+    if args.format == 'text' and not args.output and not args.compact:
+        return False
+    if args.progress is not None:
+        return args.progress
+    return bool(args.cidr or args.file) and sys.stderr.isatty()
+
+def progress_total(args: argparse.Namespace) -> Optional[int]:
+    """Number of targets in the input (of this shard), or None for interactive input."""
+    if args.file:
+        total = count_targets(read_entries(args.file))
+    elif args.ip or args.domain or args.cidr:
+        total = count_targets([args.ip or args.domain or args.cidr])
+    else:
+        return None
+    if args.shard:
+        start, stop = shard_bounds(total, *args.shard)
+        total = stop - start
+    return total
+
+def emit_results(converter: IPConverter, formatter: OutputFormatter, args: argparse.Namespace,
+                 journal: Optional['JobJournal'] = None, incremental: Optional[IncrementalRun] = None):
+    # Results are produced lazily and written out as they arrive
+    results = process_input(converter, args, journal, incremental)
+    if incremental:
+        results = incremental.track(results)
+    progress = None
+    if show_progress(args):
+        from rtmask.utils.console import ProgressBar
+        progress = ProgressBar(progress_total(args), converter.metrics)
+        progress.start()
+        # Before a file output prints where it was saved; the table is
+        # flushed above the bar instead
+        results = progress.track(results, close=args.format != 'text' or bool(args.output))
+    
+    # Handle output based on format
+    try:
+        if args.format == 'text' and not args.output and args.compact:
+            from rtmask.utils.console import ConsoleTable
+            with ConsoleTable(selected_enrichments(args), progress=progress, metrics=converter.metrics) as table:
+                count = table.write_many(results)
+        
+        elif args.format == 'text' and not args.output:
+            count = 0
+            show = formatter.print_plain if args.plain else formatter.print_result
+            for result in expand_results(results):
+                with converter.metrics.timer('write'):
+                    show(result)
+                count += 1
+        
+        else:
+            output_file = output_path(args)
+            fmt = output_format(args, output_file)
+            if fmt is None:
+                print(f"\033[91mUnsupported output format: {args.format}\033[0m")
+                return
+            count = formatter.stream(results, fmt, output_file)
+    finally:
+        if progress:
+            progress.close()
     
-    return results
+    if not count:
+        print("\033[91mNo valid results to display.\033[0m")
+    if incremental:
+        write_changes(incremental, args)
+
+def open_incremental(args: argparse.Namespace) -> IncrementalRun:
+    """Load the earlier results given by --previous."""
+    if not enrichment_requested(args):
+        raise ValueError("--previous needs an enrichment (--geo, --whois, --network or --qr) to reuse")
+    if args.format != 'text' or args.output:
+        output_file = Path(args.output_dir or '.') / output_path(args)
+        if output_file.resolve() == Path(args.previous).resolve():
+            raise ValueError("--previous must not be the output file; write to a new file and replace it afterwards")
+    stages = get_stages(selected_enrichments(args) + (['qr'] if args.qr else []))
+    return IncrementalRun.from_file(args.previous, stages, args.max_age)
+
+def write_changes(incremental: IncrementalRun, args: argparse.Namespace):
+    """Print the change summary and write the change report given by --changes."""
+    print('\n'.join(incremental.report()), file=sys.stderr)
+    if args.changes:
+        with open(args.changes, 'w') as f:
+            for change in incremental.changes():
+                f.write(json.dumps(change) + '\n')
+        print(f"Changes saved to {args.changes}", file=sys.stderr)
+
+def merge_outputs(formatter: OutputFormatter, paths: Iterable[str], args: argparse.Namespace):
+    """Combine shard outputs into the output selected by -o/--format."""
+    if args.format == 'text' and not args.output and args.compact:
+        from rtmask.utils.console import ConsoleTable
+        with ConsoleTable(selected_enrichments(args)) as table:
+            for path in shard_order(paths):
+                table.write_many(read_results(path))
+        count = table.count
+    
+    elif args.format == 'text' and not args.output:
+        count = 0
+        show = formatter.print_plain if args.plain else formatter.print_result
+        for path in shard_order(paths):
+            for result in read_results(path):
+                show(result)
+                count += 1
+    
+    else:
+        output_file = output_path(args)
+        fmt = output_format(args, output_file)
+        if fmt is None:
+            print(f"\033[91mUnsupported output format: {args.format}\033[0m")
+            return
+        count = formatter.merge(paths, fmt, output_file)
+    
+    if not count:
+        print("\033[91mNo valid results to display.\033[0m")
+
+def run_parallel(formatter: OutputFormatter, args: argparse.Namespace):
+    """Run every shard of the input in its own process, then merge their outputs."""
+    import shutil
+    import subprocess
+    import tempfile
+
+    if not (args.ip or args.domain or args.cidr or args.file):
+        raise ValueError("--parallel needs an input (-i, -d, -c or -f)")
+    if (args.job_dir or args.resume or args.qr_archive or args.stats or args.metrics_file or args.profile
+            or args.previous):
+        raise ValueError("--parallel cannot be combined with --job-dir, --resume, --qr-archive, --stats, "
+                         "--metrics-file, --profile or --previous; run the shards with --shard instead")
+    count = args.parallel
+    # Parts are joined as they are when they match the output, else read back
+    # from the compact columnar format
+    fmt = output_format(args, output_path(args))
+    part_fmt = fmt if fmt in CONCATENABLE else 'rtm'
+    workdir = Path(tempfile.mkdtemp(prefix='rtmask-shards-', dir=formatter.output_dir))
+    command = [sys.executable, str(Path(__file__).resolve()), *sys.argv[1:]]
+    parts, procs = [], []
+    for index in range(1, count + 1):
+        part = workdir / f"shard-{index:04d}.{part_fmt}"
+        with open(workdir / f"shard-{index:04d}.log", 'w') as log:
+            procs.append(subprocess.Popen(
+                command + ['--shard', f"{index}/{count}", '--format', part_fmt, '-o', str(part.resolve()), '--no-banner',
+                           '--no-progress'],
+                stdout=log, stderr=subprocess.STDOUT))
+        parts.append(part)
+    
+    failed = [index for index, proc in enumerate(procs, 1) if proc.wait()]
+    if failed:
+        raise RuntimeError(f"Shards {', '.join(map(str, failed))} of {count} failed; "
+                           f"outputs and logs are in {workdir}")
+    merge_outputs(formatter, parts, args)
+    shutil.rmtree(workdir)
+
+def open_journal(args: argparse.Namespace) -> 'JobJournal':
+    """Start the job given by --job-dir, or reopen the one given by --resume."""
+    from rtmask.core.journal import JobJournal
+
+    if args.resume:
+        journal = JobJournal.open(args.resume)
+        for name, value in journal.config['options'].items():
+            setattr(args, name, value)
+        args.ports = tuple(args.ports)
+        args.shard = tuple(args.shard) if args.shard else None
+        args.job_dir = args.resume
+        return journal
+
+    if not (args.ip or args.domain or args.cidr or args.file):
+        raise ValueError("--job-dir needs an input (-i, -d, -c or -f)")
+    options = {name: getattr(args, name) for name in JOB_OPTIONS}
+    # Paths are stored absolute so the job can be resumed from anywhere
+    for name in ('file', 'output_dir', 'previous', 'changes'):
+        if options[name]:
+            options[name] = str(Path(options[name]).resolve())
+    # The output is stored as the file actually written, inside --output-dir
+    if args.format != 'text' or args.output:
+        options['output'] = str((Path(args.output_dir or '.') / output_path(args)).resolve())
+    return JobJournal.create(args.job_dir, options, [args.file] if args.file else [])
+
+def print_cache_stats(cache: EnrichmentCache):
+    stats = cache.stats()
+    print(f"\nCache: {stats['path']} ({stats['size_bytes'] / 1024:.1f} KiB, {stats['evictions']} evicted)")
+    for kind, kind_stats in stats['kinds'].items():
+        print(f"  {kind:<8} entries={kind_stats['entries']:<8} hits={kind_stats['hits']:<8} "
+              f"misses={kind_stats['misses']:<8} ttl={kind_stats['ttl']}s")
 
 def main():
     args = parse_args()
+    journal = open_journal(args) if args.resume or args.job_dir else None
     
     # Show banner unless disabled
     if not args.no_banner:
@@ -114,36 +559,68 @@ def main():
     
     # Initialize converter and formatter
     output_dir = args.output_dir if args.output_dir else None
-    converter = IPConverter(output_dir)
-    formatter = OutputFormatter(output_dir)
-    
-    # Process input and get results
-    results = process_input(converter, args)
-    
-    if not results:
-        print("\033[91mNo valid results to display.\033[0m")
+    if args.merge:
+        merge_outputs(OutputFormatter(output_dir, page_size=args.page_size), args.merge, args)
         return
+    if args.parallel and not args.shard:
+        run_parallel(OutputFormatter(output_dir, page_size=args.page_size), args)
+        return
+    metrics = Metrics()
+    cache = None if args.no_cache else EnrichmentCache(args.cache_dir, ttls=args.cache_ttl)
+    http = HTTPClient(rate_limits=args.rate_limit, pool_size=max(args.workers, DEFAULT_POOL_SIZE), metrics=metrics)
+    prober = ReachabilityProber(ports=args.ports, timeout=args.probe_timeout)
+    resolver = AsyncResolver(concurrency=args.dns_concurrency)
+    qr = None
+    if args.qr:
+        from rtmask.core.qr import QRRenderer
+        qr = QRRenderer(output_dir or Path.cwd(), archive=args.qr_archive, workers=args.qr_workers)
+    converter = IPConverter(output_dir, enrichments=selected_enrichments(args), cache=cache,
+                            geo_db=args.geo_db, http=http, prober=prober, resolver=resolver,
+                            all_records=args.all_records, qr=qr, metrics=metrics,
+                            rdap=RDAPClient(http, bootstrap_dir=cache.cache_dir if cache else None,
+                                            bootstrap_url=args.rdap_bootstrap, referral_server=args.whois_referral))
+    formatter = OutputFormatter(output_dir, metrics=metrics, page_size=args.page_size)
     
-    # Handle output based on format
-    if args.format == 'text' and not args.output:
-        for result in results:
-            formatter.print_result(result)
-    
-    elif args.output or args.format != 'text':
-        output_file = args.output if args.output else f"rtmask_results.{args.format}"
-        
-        if args.format == 'json' or output_file.endswith('.json'):
-            formatter.save_json(results, output_file)
-        
-        elif args.format == 'html' or output_file.endswith('.html'):
-            formatter.save_html(results, output_file)
-        
-        elif args.format == 'csv' or output_file.endswith('.csv'):
-            formatter.save_csv(results, output_file)
-        
-        else:
-            print(f"\033[91mUnsupported output format: {args.format}\033[0m")
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if args.serve:
+            from rtmask.utils.service import RTMaskService
+            RTMaskService(converter, concurrency=args.workers, timeout=args.target_timeout,
+                          cache=cache).serve(args.serve)
             return
+        if journal and journal.complete:
+            print(f"Job in {args.job_dir} is complete; writing its results from the journal")
+        incremental = open_incremental(args) if args.previous else None
+        emit_results(converter, formatter, args, journal, incremental)
+        if journal:
+            journal.finish()
+    finally:
+        if journal and not journal.complete:
+            journal.close()
+            print(f"\nProgress saved to {args.job_dir} ({journal.completed} units done); "
+                  f"continue with: --resume {args.job_dir}")
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"Profile saved to {args.profile} (view with: python -m pstats {args.profile})")
+        if args.stats:
+            print()
+            print('\n'.join(metrics.summary()))
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+        if cache:
+            if args.cache_stats:
+                print_cache_stats(cache)
+            cache.close()
+        if qr:
+            qr.close()
+        http.close()
+        prober.close()
+        resolver.close()
 
 if __name__ == "__main__":
     try:
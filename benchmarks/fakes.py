@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Local stand-ins for the DNS, geolocation (ipapi.co), RDAP and WHOIS providers.
+
+Every server listens on 127.0.0.1 on a free port, answers deterministically
+and waits `latency` seconds before each reply, so benchmarks measure
+RT-MASK's own concurrency rather than the internet.
+"""
+
+import hashlib
+import ipaddress
+import json
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rtmask.core.aio import BackgroundLoop
+
+
+def address_for(name: str) -> str:
+    """Deterministic public IPv4 address for a name."""
+    digest = int.from_bytes(hashlib.sha256(name.lower().rstrip('.').encode()).digest()[:4], 'big')
+    while True:
+        address = ipaddress.IPv4Address(digest)
+        if address.is_global:
+            return str(address)
+        digest = (digest * 2654435761 + 1) & 0xffffffff
+
+
+class FakeDNSServer:
+    """UDP DNS server answering A queries with address_for() and PTR queries with host-<ip>.test."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.queries = 0
+        self.port = None
+        self._loop = BackgroundLoop('fake-dns')
+        self._transport = None
+
+    def __enter__(self) -> 'FakeDNSServer':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        import asyncio
+
+        server = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                server.queries += 1
+                reply = server._answer(data)
+                if reply is not None:
+                    asyncio.get_running_loop().call_later(server.latency, self.transport.sendto, reply, addr)
+
+        async def listen():
+            loop = asyncio.get_running_loop()
+            transport, _ = await loop.create_datagram_endpoint(Protocol, local_addr=('127.0.0.1', 0))
+            return transport
+
+        self._transport = self._loop.run(listen())
+        self.port = self._transport.get_extra_info('sockname')[1]
+
+    def _answer(self, data: bytes):
+        import dns.message
+        import dns.rcode
+        import dns.rdatatype
+        import dns.reversename
+        import dns.rrset
+
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return None
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        name = question.name.to_text()
+        if question.rdtype == dns.rdatatype.A:
+            response.answer.append(dns.rrset.from_text(question.name, 300, 'IN', 'A', address_for(name)))
+        elif question.rdtype == dns.rdatatype.PTR:
+            ip = dns.reversename.to_address(question.name)
+            response.answer.append(dns.rrset.from_text(question.name, 300, 'IN', 'PTR',
+                                                       f"host-{ip.replace('.', '-')}.test."))
+        else:
+            response.set_rcode(dns.rcode.NXDOMAIN)
+        return response.to_wire()
+
+    def stop(self):
+        if self._transport is not None:
+            self._loop.call_soon(self._transport.close)
+            self._transport = None
+        self._loop.close()
+
+
+class FakeGeoServer:
+    """HTTP server mimicking https://ipapi.co/<ip>/json/ with a /24 network per answer."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> 'FakeGeoServer':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                ip = self.path.strip('/').split('/')[0]
+                body = json.dumps({
+                    'ip': ip,
+                    'country_name': 'Testland',
+                    'city': f"City {ip.split('.')[0]}",
+                    'latitude': 1.5,
+                    'longitude': -2.5,
+                    'timezone': 'UTC',
+                    'network': str(ipaddress.IPv4Network(f"{ip}/24", strict=False)),
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-geo', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FakeRDAPServer:
+    """HTTP server acting as the RDAP bootstrap and the registry for every address and the .test TLD.
+
+    Address answers cover the /24 around the address; domain answers use
+    the same registration data as FakeWhoisServer.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> 'FakeRDAPServer':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _answer(self, path: str):
+        registry = [self.url + '/']
+        if path == '/ipv4.json':
+            return {'services': [[['0.0.0.0/0'], registry]]}
+        if path == '/dns.json':
+            return {'services': [[['test'], registry]]}
+        kind, _, query = path.strip('/').partition('/')
+        events = [{'eventAction': 'registration', 'eventDate': '2001-02-03T04:05:06Z'}]
+        if kind == 'ip':
+            network = ipaddress.IPv4Network(f"{query}/24", strict=False)
+            return {
+                'objectClassName': 'ip network',
+                'name': 'TEST-NET',
+                'startAddress': str(network.network_address),
+                'endAddress': str(network.broadcast_address),
+                'cidr0_cidrs': [{'v4prefix': str(network.network_address), 'length': 24}],
+                'status': ['active'],
+                'events': events,
+                'entities': [{'roles': ['registrant'],
+                              'vcardArray': ['vcard', [['fn', {}, 'text', 'Example Networks']]]}],
+            }
+        if kind == 'domain' and query.endswith('.test'):
+            return {
+                'objectClassName': 'domain',
+                'ldhName': query.upper(),
+                'status': ['client transfer prohibited'],
+                'events': events + [{'eventAction': 'expiration', 'eventDate': '2031-02-03T04:05:06Z'}],
+                'nameservers': [{'ldhName': 'NS1.EXAMPLE.TEST'}, {'ldhName': 'NS2.EXAMPLE.TEST'}],
+                'entities': [{'roles': ['registrar'],
+                              'vcardArray': ['vcard', [['fn', {}, 'text', 'Example Registrar, Inc.']]]}],
+            }
+        return None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                answer = server._answer(self.path)
+                body = json.dumps(answer or {'errorCode': 404, 'title': 'Not Found'}).encode()
+                self.send_response(200 if answer else 404)
+                self.send_header('Content-Type', 'application/rdap+json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='fake-rdap', daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FakeWhoisServer:
+    """TCP server speaking the WHOIS protocol (one query line, one text reply)."""
+
+    RESPONSE = (
+        "Domain Name: {query}\r\n"
+        "Registrar: Example Registrar, Inc.\r\n"
+        "Creation Date: 2001-02-03T04:05:06Z\r\n"
+        "Registry Expiry Date: 2031-02-03T04:05:06Z\r\n"
+        "Name Server: NS1.EXAMPLE.TEST\r\n"
+        "Name Server: NS2.EXAMPLE.TEST\r\n"
+        "Domain Status: clientTransferProhibited\r\n"
+    )
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.queries = 0
+        self._server = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def __enter__(self) -> 'FakeWhoisServer':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                query = self.rfile.readline().decode(errors='replace').strip()
+                server.queries += 1
+                time.sleep(server.latency)
+                self.wfile.write(server.RESPONSE.format(query=query.upper()).encode())
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='fake-whois', daemon=True).start()
+
+    def query(self, query: str, timeout: float = 10.0) -> str:
+        """Send one query and return the raw reply, like a port-43 client would."""
+        with socket.create_connection(self.address, timeout=timeout) as sock:
+            sock.sendall(f"{query}\r\n".encode())
+            chunks = []
+            while True:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return b''.join(chunks).decode(errors='replace')
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""RT-MASK benchmark suite.
+
+Measures conversion rate per CIDR size, end-to-end enrichment throughput
+against local stand-in DNS, geolocation and RDAP servers (see fakes.py)
+with injectable latency, writer speed per output format, peak memory of
+result containers and CLI startup. Results are written as JSON so two runs
+(e.g. two commits) can be compared:
+
+    python benchmarks/run.py --output before.json
+    python benchmarks/run.py --compare before.json
+
+Metrics ending in `_per_s` are better when higher; all others (times,
+bytes) are better when lower.
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import fakes  # noqa: E402
+import startup  # noqa: E402
+from rtmask.core.bulk import iter_cidr_batches  # noqa: E402
+from rtmask.core.geo import IPApiGeoProvider  # noqa: E402
+from rtmask.core.http import HTTPClient  # noqa: E402
+from rtmask.core.ip_converter import (GeoLocation, IPConversionResult, IPConverter,  # noqa: E402
+                                      NetworkInfo, WhoisInfo)
+from rtmask.core.rdap import RDAPClient  # noqa: E402
+from rtmask.core.resolver import AsyncResolver  # noqa: E402
+from rtmask.core.store import ResultStore  # noqa: E402
+from rtmask.utils.output_formatter import OutputFormatter  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+DEFAULT_LATENCY = 0.02
+DEFAULT_THRESHOLD = 0.10
+
+FULL = {
+    'cidrs': ['192.0.2.0/24', '10.0.0.0/20', '10.0.0.0/16', '10.0.0.0/12'],
+    'single_conversions': 100_000,
+    'enrich_targets': 2000,
+    'writer_rows': 20_000,
+    'writer_cidr': '10.0.0.0/16',
+    'memory_rows': 1 << 16,
+}
+QUICK = {
+    'cidrs': ['192.0.2.0/24', '10.0.0.0/20', '10.0.0.0/16'],
+    'single_conversions': 20_000,
+    'enrich_targets': 300,
+    'writer_rows': 2000,
+    'writer_cidr': '10.0.0.0/20',
+    'memory_rows': 1 << 14,
+}
+
+
+def timed(func: Callable[[], object], repeat: int) -> float:
+    """Median wall time of `repeat` calls, in seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def enriched_results(count: int) -> List[IPConversionResult]:
+    """Fully enriched results; hosts of one /24 share their geo and WHOIS records."""
+    converter = IPConverter(tempfile.gettempdir())
+    results = []
+    geo = whois = None
+    for index, ipv4 in enumerate(_hosts('11.0.0.0/8', count)):
+        if index % 254 == 0:
+            network = str(ipaddress.IPv4Network(f"{ipv4}/24", strict=False))
+            geo = GeoLocation('Testland', 'City', 1.5, -2.5, 'UTC', network)
+            whois = WhoisInfo('Example Registrar', '2001-02-03', '2031-02-03',
+                              ['ns1.example.test'], ['active'], network)
+        result = converter._convert(ipv4, None)
+        result.geolocation = geo
+        result.whois_info = whois
+        result.network_info = NetworkInfo(True, 12.5, f"host-{index}.test", [80, 443])
+        results.append(result)
+    return results
+
+
+def _hosts(cidr: str, count: int) -> List[str]:
+    hosts = []
+    for batch in iter_cidr_batches(cidr):
+        hosts.extend(batch.ipv4[:count - len(hosts)])
+        if len(hosts) >= count:
+            break
+    return hosts
+
+
+def bench_conversion(sizes: Dict, repeat: int) -> Dict[str, float]:
+    converter = IPConverter(tempfile.gettempdir())
+    metrics = {}
+
+    ips = _hosts('10.0.0.0/8', sizes['single_conversions'])
+    seconds = timed(lambda: [converter.ipv4_to_ipv6(ip) for ip in ips], repeat)
+    metrics['conversion.ipv4_to_ipv6.calls_per_s'] = len(ips) / seconds
+
+    # Build the lazily created lookup tables outside the measurements
+    next(converter.iter_cidr_batches('192.0.2.0/30')).ipv6
+    for cidr in sizes['cidrs']:
+        prefix = cidr.split('/')[1]
+
+        def run():
+            for batch in converter.iter_cidr_batches(cidr):
+                batch.ipv4, batch.ipv6, batch.url_nossl, batch.url_ssl
+        hosts = sum(len(batch) for batch in converter.iter_cidr_batches(cidr))
+        metrics[f'conversion.bulk./{prefix}.hosts_per_s'] = hosts / timed(run, repeat)
+
+    cidr = sizes['cidrs'][0]
+    seconds = timed(lambda: converter.process_cidr(cidr), repeat)
+    metrics[f"conversion.process_cidr./{cidr.split('/')[1]}.hosts_per_s"] = len(converter.process_cidr(cidr)) / seconds
+    return metrics
+
+
+def bench_enrichment(sizes: Dict, latency: float, workers: int) -> Dict[str, float]:
+    """Resolve, geolocate and WHOIS a list of domains through the batch executor.
+
+    Every tenth domain is in a TLD without an RDAP service, so its WHOIS
+    lookup takes the port-43 fallback.
+    """
+    targets = [f"host{i}.bench.{'example' if i % 10 == 9 else 'test'}" for i in range(sizes['enrich_targets'])]
+    with fakes.FakeDNSServer(latency) as dns, fakes.FakeGeoServer(latency) as geo, \
+            fakes.FakeRDAPServer(latency) as rdap, fakes.FakeWhoisServer(latency) as whois:
+        http = HTTPClient(pool_size=workers)
+        resolver = AsyncResolver(nameservers=['127.0.0.1'], port=dns.port)
+        referral = '{}:{}'.format(*whois.address)
+        converter = IPConverter(tempfile.gettempdir(), enrichments=['geo', 'whois'], http=http, resolver=resolver,
+                                rdap=RDAPClient(http, bootstrap_url=rdap.url, referral_server=referral))
+        converter.geo_providers = [IPApiGeoProvider(http, base_url=geo.url)]
+        try:
+            start = time.perf_counter()
+            count = sum(1 for _ in converter.process_many(targets, concurrency=workers))
+            seconds = time.perf_counter() - start
+        finally:
+            http.close()
+            resolver.close()
+        return {
+            'enrichment.targets_per_s': count / seconds,
+            'enrichment.dns_queries': dns.queries,
+            'enrichment.geo_requests': geo.requests,
+            'enrichment.whois_queries': rdap.requests,
+            'enrichment.whois_port43_queries': whois.queries,
+        }
+
+
+def bench_writers(sizes: Dict, repeat: int) -> Dict[str, float]:
+    metrics = {}
+    results = enriched_results(sizes['writer_rows'])
+    cidr = sizes['writer_cidr']
+    hosts = sum(len(batch) for batch in iter_cidr_batches(cidr))
+    with tempfile.TemporaryDirectory() as tmp:
+        formatter = OutputFormatter(tmp)
+        formatter.console.quiet = True
+        for fmt in ('json', 'jsonl', 'csv', 'html', 'rtm'):
+            seconds = timed(lambda: formatter.stream(results, fmt, f'enriched.{fmt}'), repeat)
+            metrics[f'writers.{fmt}.enriched_rows_per_s'] = len(results) / seconds
+            seconds = timed(lambda: formatter.stream(iter_cidr_batches(cidr), fmt, f'bulk.{fmt}'), repeat)
+            metrics[f'writers.{fmt}.bulk_rows_per_s'] = hosts / seconds
+    return metrics
+
+
+def _peak(build: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        kept = build()
+        peak = tracemalloc.get_traced_memory()[1]
+        del kept
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_memory(sizes: Dict) -> Dict[str, float]:
+    rows = sizes['memory_rows']
+    cidr = f"10.0.0.0/{32 - (rows - 1).bit_length()}"
+    results = enriched_results(rows)
+    metrics = {
+        'memory.store_plain.bytes_per_row': _peak(lambda: ResultStore(iter_cidr_batches(cidr))) / rows,
+        'memory.store_enriched.bytes_per_row': _peak(lambda: ResultStore(results)) / rows,
+        'memory.objects_plain.bytes_per_row': _peak(
+            lambda: [result for batch in iter_cidr_batches(cidr) for result in batch]) / rows,
+    }
+    if sys.platform != 'win32':
+        import resource
+        scale = 1 if sys.platform == 'darwin' else 1024
+        metrics['memory.process_max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return metrics
+
+
+def bench_startup(repeat: int) -> Dict[str, float]:
+    runs = max(5, repeat * 3)
+    baseline = startup.time_command([sys.executable, '-c', 'pass'], runs)
+    cli = startup.time_command([sys.executable, str(startup.SCRIPT), *startup.FAST_PATH_ARGS], runs)
+    return {'startup.overhead_ms': cli - baseline}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Print a comparison table and return the metrics that regressed past `threshold`."""
+    regressions = []
+    print(f"\n{'metric':<48} {'baseline':>14} {'current':>14} {'change':>8}")
+    for name in sorted(set(current) & set(baseline)):
+        old, new = baseline[name], current[name]
+        if not old:
+            continue
+        change = (new - old) / old
+        worse = -change if name.endswith('_per_s') else change
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<48} {old:>14.1f} {new:>14.1f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+SECTIONS = ('conversion', 'enrichment', 'writers', 'memory', 'startup')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help='Smaller inputs for a fast smoke run')
+    parser.add_argument('--only', choices=SECTIONS, action='append', help='Run only these sections')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per timing; the median is kept (default: 3)')
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY,
+                        help=f'Seconds each stand-in provider waits before answering (default: {DEFAULT_LATENCY})')
+    parser.add_argument('--workers', type=int, default=32, help='Batch executor concurrency (default: 32)')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare with a previous results file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Relative change counted as a regression (default: {DEFAULT_THRESHOLD})')
+    args = parser.parse_args()
+
+    sizes = QUICK if args.quick else FULL
+    sections = args.only or SECTIONS
+    metrics: Dict[str, float] = {}
+    for section in sections:
+        print(f"running {section} ...", flush=True)
+        if section == 'conversion':
+            metrics.update(bench_conversion(sizes, args.repeat))
+        elif section == 'enrichment':
+            metrics.update(bench_enrichment(sizes, args.latency, args.workers))
+        elif section == 'writers':
+            metrics.update(bench_writers(sizes, args.repeat))
+        elif section == 'memory':
+            metrics.update(bench_memory(sizes))
+        elif section == 'startup':
+            metrics.update(bench_startup(args.repeat))
+
+    for name, value in metrics.items():
+        print(f"  {name:<48} {value:>14.1f}")
+
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'quick': args.quick,
+        'latency': args.latency,
+        'workers': args.workers,
+        'metrics': metrics,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{revision}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + '\n')
+    print(f"results saved to {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())['metrics']
+        regressions = compare(metrics, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Check RT-MASK's CLI startup against its budget.
+
+Runs a plain single-address conversion many times and compares the median
+wall time with that of a bare interpreter, so the budget covers only what
+RT-MASK itself adds. Also checks that the fast path leaves the heavy
+optional dependencies unimported. Exits non-zero when either check fails.
+
+    python benchmarks/startup.py [--runs 20] [--budget-ms 100]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPT = ROOT / 'RT-MASK.py'
+
+# Milliseconds RT-MASK may add on top of interpreter startup
+STARTUP_BUDGET_MS = 100
+
+FAST_PATH_ARGS = ['-i', '192.0.2.1', '--plain', '--no-banner', '--no-cache']
+
+# Only imported by the stages or outputs that need them
+HEAVY_MODULES = ('asyncio', 'dns', 'geoip2', 'jinja2', 'qrcode', 'requests', 'rich', 'sqlite3')
+
+_IMPORT_PROBE = """
+import runpy, sys, json
+sys.argv = [sys.argv[1]] + sys.argv[2:]
+runpy.run_path(sys.argv[0], run_name='__main__')
+print(json.dumps(sorted({m.split('.')[0] for m in sys.modules})), file=sys.stderr)
+"""
+
+
+def time_command(cmd, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def heavy_imports():
+    proc = subprocess.run([sys.executable, '-c', _IMPORT_PROBE, str(SCRIPT), *FAST_PATH_ARGS],
+                          cwd=ROOT, capture_output=True, text=True, check=True)
+    loaded = set(json.loads(proc.stderr.strip().splitlines()[-1]))
+    return sorted(loaded.intersection(HEAVY_MODULES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20, help='Runs per measurement (default: 20)')
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                        help=f'Allowed overhead over a bare interpreter (default: {STARTUP_BUDGET_MS})')
+    args = parser.parse_args()
+
+    baseline = time_command([sys.executable, '-c', 'pass'], args.runs)
+    cli = time_command([sys.executable, str(SCRIPT), *FAST_PATH_ARGS], args.runs)
+    overhead = cli - baseline
+    loaded = heavy_imports()
+
+    print(f"interpreter: {baseline:.1f} ms  rt-mask: {cli:.1f} ms  "
+          f"overhead: {overhead:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if loaded:
+        print(f"heavy modules imported on the fast path: {', '.join(loaded)}")
+    ok = overhead <= args.budget_ms and not loaded
+    print('OK' if ok else 'FAILED')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import threading
+from typing import Any, Awaitable, Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class BackgroundLoop:
+    """An asyncio event loop running in a daemon thread.
+
+    Lets the thread-based parts of RT-MASK (the batch executor, the CLI)
+    hand coroutines to a single shared loop and block on their results.
+    The loop is started on first use; `setup` runs inside it once.
+    asyncio itself is only imported then, which keeps it off the CLI's
+    startup path for runs that never probe or resolve anything.
+    """
+
+    def __init__(self, name: str, setup: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.name = name
+        self._setup = setup
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> 'asyncio.AbstractEventLoop':
+        return self.start()
+
+    def start(self) -> 'asyncio.AbstractEventLoop':
+        """Start the loop (and run `setup`) unless it is running; return it."""
+        import asyncio
+
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+                if self._setup:
+                    asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                self._loop = loop
+        return self._loop
+
+    def run(self, coro: Awaitable[Any]) -> Any:
+        """Run a coroutine on the loop and block until it finishes."""
+        import asyncio
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def call_soon(self, callback: Callable[..., Any], *args):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import ipaddress
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+from .ip_converter import IPConversionResult
+
+# Hosts are held as unsigned 32-bit integers; 'I' is 4 bytes on every
+# mainstream platform, 'L' is the portable fallback.
+_TYPECODE = 'I' if array('I').itemsize >= 4 else 'L'
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Lookup tables so a row is built from a few list indexings and string
+# concatenations instead of ipaddress objects and format() calls.
+_OCTETS = [str(i) for i in range(256)]
+
+
+@lru_cache(maxsize=None)
+def _hextets() -> List[str]:
+    # Built on first use; creating 65536 strings costs more than
+    # everything else this module does at import time.
+    return [format(i, '04x') for i in range(1 << 16)]
+
+
+class CIDRBatch:
+    """A contiguous run of IPv4 hosts converted column-wise.
+
+    A batch only stores its integer bounds; the address array and the
+    IPv6/URL columns are derived on access, so holding every batch of a
+    /8 costs a few kilobytes.
+    """
+
+    __slots__ = ('start', 'stop')
+
+    def __init__(self, start: int, stop: int):
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __repr__(self) -> str:
+        return f"CIDRBatch({ipaddress.IPv4Address(self.start)}, {len(self)} hosts)"
+
+    @property
+    def addresses(self) -> array:
+        """Host addresses as packed unsigned 32-bit integers."""
+        return array(_TYPECODE, range(self.start, self.stop))
+
+    def _segments(self, bits: int) -> Iterator[Tuple[int, int, int]]:
+        """Yield (high, low_start, low_stop) runs sharing the same high bits."""
+        mask = (1 << bits) - 1
+        n = self.start
+        while n < self.stop:
+            high = n >> bits
+            end = min(self.stop, (high + 1) << bits)
+            yield high, n & mask, ((end - 1) & mask) + 1
+            n = end
+
+    @property
+    def ipv4(self) -> List[str]:
+        o = _OCTETS
+        out: List[str] = []
+        for high, lo, hi in self._segments(8):
+            prefix = f"{o[high >> 16]}.{o[(high >> 8) & 255]}.{o[high & 255]}."
+            out.extend([prefix + s for s in o[lo:hi]])
+        return out
+
+    def _ipv6_with(self, head: str, tail: str) -> List[str]:
+        h = _hextets()
+        out: List[str] = []
+        for high, lo, hi in self._segments(16):
+            prefix = f"{head}::ffff:{h[high]}:"
+            out.extend([prefix + s + tail for s in h[lo:hi]])
+        return out
+
+    @property
+    def ipv6(self) -> List[str]:
+        return self._ipv6_with('', '')
+
+    @property
+    def url_nossl(self) -> List[str]:
+        return self._ipv6_with('http://[', ']')
+
+    @property
+    def url_ssl(self) -> List[str]:
+        return self._ipv6_with('https://[', ']')
+
+    def columns(self) -> Dict[str, List[str]]:
+        """Return the batch as a dict of equally sized columns."""
+        return {
+            'ipv4': self.ipv4,
+            'ipv6': self.ipv6,
+            'url_nossl': self.url_nossl,
+            'url_ssl': self.url_ssl,
+        }
+
+    def __iter__(self) -> Iterator[IPConversionResult]:
+        """Yield one unenriched IPConversionResult per host."""
+        for ipv4, ipv6, url_nossl, url_ssl in zip(self.ipv4, self.ipv6, self.url_nossl, self.url_ssl):
+            yield IPConversionResult(
+                ipv4=ipv4,
+                ipv6=ipv6,
+                url_nossl=url_nossl,
+                url_ssl=url_ssl
+            )
+
+
+def host_range(cidr: str) -> range:
+    """Return the integer range covered by network.hosts() for a CIDR."""
+    network = ipaddress.IPv4Network(cidr, strict=False)
+    first = int(network.network_address)
+    last = int(network.broadcast_address)
+    # Mirror IPv4Network.hosts(): /31 and /32 have no network/broadcast
+    # addresses to exclude.
+    if network.prefixlen < 31:
+        first += 1
+        last -= 1
+    return range(first, last + 1)
+
+
+def iter_cidr_batches(cidr: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[CIDRBatch]:
+    """Split the hosts of a CIDR block into batches of at most chunk_size."""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    hosts = host_range(cidr)
+    for start in range(hosts.start, hosts.stop, chunk_size):
+        yield CIDRBatch(start, min(start + chunk_size, hosts.stop))
+
+
+def expand_results(results: Iterable[Union[IPConversionResult, CIDRBatch]]) -> Iterator[IPConversionResult]:
+    """Flatten a mix of results and batches (or result stores) into individual results."""
+    for item in results:
+        if isinstance(item, IPConversionResult):
+            yield item
+        else:
+            yield from item
+
+
+def count_results(results: Iterable[Union[IPConversionResult, CIDRBatch]]) -> int:
+    """Count rows in a mix of results and batches without expanding them."""
+    return sum(len(item) if isinstance(item, CIDRBatch) else 1 for item in results)
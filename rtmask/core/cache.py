@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from .resolver import DEFAULT_NEGATIVE_TTL
+
+# Seconds an entry stays fresh, per kind of lookup
+DEFAULT_TTLS = {
+    'dns': 60 * 60,
+    'ptr': 60 * 60,
+    'geo': 7 * 24 * 60 * 60,
+    'whois': 24 * 60 * 60,
+}
+
+DEFAULT_MAX_ENTRIES = 500_000
+
+# Fraction of the cache dropped at once when it grows past max_entries, so
+# eviction runs occasionally rather than on every insert.
+EVICT_FRACTION = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'rtmask'
+
+
+class EnrichmentCache:
+    """SQLite-backed cache for enrichment lookups.
+
+    Entries are keyed by (kind, key), e.g. ('geo', '8.8.8.8') or
+    ('dns', 'example.com'), and stored as JSON. Entries older than the TTL
+    for their kind are treated as misses. A lookup that found nothing is
+    stored as None and kept for `negative_ttl` seconds at most, so it is
+    retried soon but not by every run. Once the cache holds more than
+    `max_entries` rows the least recently used ones are evicted. Safe to
+    share between threads. The database is opened on first use, so runs
+    that never look anything up do not pay for it.
+    """
+
+    def __init__(self, cache_dir: Optional[Union[str, Path]] = None,
+                 ttls: Optional[Dict[str, float]] = None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.cache_dir / 'enrichment.sqlite3'
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._entries = 0
+
+    def _db(self):
+        """Return the connection, opening it first if needed (hold _lock)."""
+        if self._conn is None:
+            import sqlite3
+
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(_SCHEMA)
+            self._entries = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _fresh(self, kind: str, value: str, created: float, now: float) -> bool:
+        ttl = self.ttls.get(kind, float('inf'))
+        if value == 'null':
+            ttl = min(ttl, self.negative_ttl)
+        return now - created <= ttl
+
+    def get(self, kind: str, key: str) -> Tuple[bool, Any]:
+        """Return (hit, value) for a fresh entry, or (False, None)."""
+        now = time.time()
+        with self._lock:
+            row = self._db().execute(
+                'SELECT value, created FROM entries WHERE kind = ? AND key = ?', (kind, key)
+            ).fetchone()
+            if row is None or not self._fresh(kind, row[0], row[1], now):
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                return False, None
+            self._db().execute(
+                'UPDATE entries SET last_used = ? WHERE kind = ? AND key = ?', (now, kind, key)
+            )
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+        return True, json.loads(row[0])
+
+    def contains(self, kind: str, key: str) -> bool:
+        """Whether a fresh entry exists, without counting a hit or miss."""
+        with self._lock:
+            row = self._db().execute(
+                'SELECT value, created FROM entries WHERE kind = ? AND key = ?', (kind, key)
+            ).fetchone()
+        return row is not None and self._fresh(kind, row[0], row[1], time.time())
+
+    def scan(self, kind: str, prefix: str) -> Iterator[Tuple[str, Any]]:
+        """Yield (key, value) for the fresh entries of `kind` whose key starts with `prefix`."""
+        now = time.time()
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT key, value, created FROM entries WHERE kind = ? AND key LIKE ? ESCAPE '\\'",
+                (kind, prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+            ).fetchall()
+        for key, value, created in rows:
+            if self._fresh(kind, value, created, now):
+                yield key, json.loads(value)
+
+    def set(self, kind: str, key: str, value: Any):
+        """Store a JSON-serializable value, evicting old entries if needed."""
+        now = time.time()
+        with self._lock:
+            self._db().execute(
+                'INSERT OR REPLACE INTO entries (kind, key, value, created, last_used) VALUES (?, ?, ?, ?, ?)',
+                (kind, key, json.dumps(value), now, now)
+            )
+            # Replacements are counted too, so this is an upper bound;
+            # _evict() recounts before deleting anything.
+            self._entries += 1
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        count = self._db().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            self._entries = count
+            return
+        drop = excess + int(self.max_entries * EVICT_FRACTION)
+        self._db().execute(
+            'DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY last_used LIMIT ?)', (drop,)
+        )
+        self.evictions += drop
+        self._entries = count - drop
+
+    def clear(self):
+        with self._lock:
+            self._db().execute('DELETE FROM entries')
+            self._entries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process and the current size per kind."""
+        with self._lock:
+            sizes = dict(self._db().execute('SELECT kind, COUNT(*) FROM entries GROUP BY kind').fetchall())
+        kinds = sorted(set(sizes) | set(self.hits) | set(self.misses))
+        return {
+            'path': str(self.path),
+            'size_bytes': self.path.stat().st_size if self.path.exists() else 0,
+            'evictions': self.evictions,
+            'kinds': {
+                kind: {
+                    'entries': sizes.get(kind, 0),
+                    'hits': self.hits.get(kind, 0),
+                    'misses': self.misses.get(kind, 0),
+                    'ttl': self.ttls.get(kind),
+                } for kind in kinds
+            },
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
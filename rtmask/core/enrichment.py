@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .ip_converter import IPConverter, IPConversionResult
+
+
+@dataclass(frozen=True)
+class EnrichmentStage:
+    """A named lookup that fills one field of an IPConversionResult.
+
+    Stages only read the base conversion (ipv4, domain, URLs) and never
+    depend on each other, so they can be run in any order or concurrently.
+    `concurrency` is the minimum number of parallel workers the batch
+    executor gives the stage, for stages that mostly wait on sockets.
+    """
+    name: str
+    field: str
+    func: Callable[['IPConverter', 'IPConversionResult'], Any]
+    concurrency: Optional[int] = None
+
+    def run(self, converter: 'IPConverter', result: 'IPConversionResult') -> Any:
+        """Compute the stage value without modifying the result."""
+        with converter.metrics.timer(self.name):
+            return self.func(converter, result)
+
+    def apply(self, converter: 'IPConverter', result: 'IPConversionResult') -> Any:
+        """Compute the stage value and store it on the result."""
+        value = self.run(converter, result)
+        setattr(result, self.field, value)
+        return value
+
+    def is_done(self, result: 'IPConversionResult') -> bool:
+        return getattr(result, self.field) is not None
+
+
+STAGES: Dict[str, EnrichmentStage] = {}
+
+
+def register_stage(name: str, field: str, concurrency: Optional[int] = None):
+    """Register a function as the enrichment stage `name` filling `field`."""
+    def decorator(func):
+        STAGES[name] = EnrichmentStage(name=name, field=field, func=func, concurrency=concurrency)
+        return func
+    return decorator
+
+
+def get_stages(names: Iterable[str]) -> List[EnrichmentStage]:
+    """Look up stages by name, preserving order and dropping duplicates."""
+    stages = []
+    for name in names:
+        if name not in STAGES:
+            raise ValueError(f"Unknown enrichment stage: {name} (available: {', '.join(sorted(STAGES))})")
+        if STAGES[name] not in stages:
+            stages.append(STAGES[name])
+    return stages
+
+
+@register_stage('geo', 'geolocation')
+def _geo_stage(converter: 'IPConverter', result: 'IPConversionResult'):
+    return converter.get_geolocation(result.ipv4)
+
+
+@register_stage('whois', 'whois_info')
+def _whois_stage(converter: 'IPConverter', result: 'IPConversionResult'):
+    return converter.get_whois_info(result.domain or result.ipv4)
+
+
+# Probes are asynchronous and cheap to wait on, so a whole /24 can be in
+# flight at once and finish within a single probe timeout.
+@register_stage('network', 'network_info', concurrency=256)
+def _network_stage(converter: 'IPConverter', result: 'IPConversionResult'):
+    return converter.check_network_info(result.ipv4)
+
+
+# Rendering happens on the QR renderer's process pool; stage threads only
+# wait for it, so keep enough of them to keep every worker busy.
+@register_stage('qr', 'qr_code_path', concurrency=64)
+def _qr_stage(converter: 'IPConverter', result: 'IPConversionResult'):
+    return converter.generate_qr_code(result.url_ssl, result.ipv4)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from .enrichment import EnrichmentStage
+
+if TYPE_CHECKING:
+    from .ip_converter import IPConverter, IPConversionResult
+
+DEFAULT_CONCURRENCY = 8
+
+# How many targets may be in flight per worker before the oldest one has
+# to be collected; keeps memory bounded for large inputs.
+WINDOW_PER_WORKER = 4
+
+
+class _Pending:
+    """Bookkeeping for one target moving through the executor."""
+
+    __slots__ = ('target', 'base', 'started', 'scheduled', 'stage_futures')
+
+    def __init__(self, target: str):
+        self.target = target
+        self.base: Optional[Future] = None
+        self.started: Optional[float] = None
+        self.scheduled = threading.Event()
+        self.stage_futures: List[Tuple[EnrichmentStage, 'IPConversionResult', Future]] = []
+
+
+class BatchExecutor:
+    """Run conversions and enrichment stages for many targets concurrently.
+
+    Base conversions (including domain resolution) run on a pool of
+    `concurrency` threads. Every enrichment stage gets its own pool, sized
+    by `stage_limits[name]` or `concurrency` (raised to the stage's own
+    minimum), so a slow provider cannot starve the others.
+
+    Results are yielded in input order. A target whose stages have not
+    finished `timeout` seconds after it started is yielded with those
+    fields left empty; one whose conversion has not finished by then
+    (e.g. a hung resolver) is dropped, so it cannot stall the targets
+    behind it.
+
+    `carry_over(target, results)`, if given, is called with the base
+    conversions of each target before its stages are scheduled; stages
+    whose field it has filled in are skipped.
+    """
+
+    def __init__(self, converter: 'IPConverter', concurrency: int = DEFAULT_CONCURRENCY,
+                 stages: Optional[List[EnrichmentStage]] = None,
+                 stage_limits: Optional[Dict[str, int]] = None,
+                 timeout: Optional[float] = None,
+                 carry_over: Optional[Callable[[str, List['IPConversionResult']], None]] = None):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if timeout is not None and not timeout > 0:
+            raise ValueError("timeout must be above 0")
+        self.converter = converter
+        self.concurrency = concurrency
+        self.stages = converter.stages if stages is None else stages
+        self.stage_limits = stage_limits or {}
+        self.timeout = timeout
+        self.carry_over = carry_over
+
+    def map(self, targets: Iterable[str]) -> Iterator[List['IPConversionResult']]:
+        """Process targets, yielding the list of results for each target in order."""
+        convert_pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix='rtmask-convert')
+        stage_pools = {
+            stage.name: ThreadPoolExecutor(self._stage_limit(stage), thread_name_prefix=f'rtmask-{stage.name}')
+            for stage in self.stages
+        }
+        window: deque = deque()
+        window_size = max([self.concurrency] + [self._stage_limit(stage) for stage in self.stages]) * WINDOW_PER_WORKER
+        try:
+            for target in targets:
+                window.append(self._submit(target, convert_pool, stage_pools))
+                if len(window) >= window_size:
+                    yield self._collect(window.popleft())
+            while window:
+                yield self._collect(window.popleft())
+        finally:
+            for pool in [convert_pool, *stage_pools.values()]:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def _stage_limit(self, stage: EnrichmentStage) -> int:
+        if stage.name in self.stage_limits:
+            return self.stage_limits[stage.name]
+        return max(self.concurrency, stage.concurrency or 0)
+
+    def _submit(self, target: str, convert_pool: ThreadPoolExecutor,
+                stage_pools: Dict[str, ThreadPoolExecutor]) -> _Pending:
+        pending = _Pending(target)
+
+        def convert():
+            pending.started = time.monotonic()
+            results = self.converter.process_target(target, enrich=False)
+            if self.carry_over is not None:
+                self.carry_over(target, results)
+            return results
+
+        def schedule_stages(future: Future):
+            try:
+                results = [] if future.cancelled() or future.exception() else future.result()
+                for result in results:
+                    for stage in self.stages:
+                        if stage.is_done(result):
+                            continue
+                        pending.stage_futures.append(
+                            (stage, result, stage_pools[stage.name].submit(self._run_stage, stage, result)))
+            except RuntimeError:
+                # Pools are shut down when the consumer stops early
+                pass
+            finally:
+                pending.scheduled.set()
+
+        pending.base = convert_pool.submit(convert)
+        pending.base.add_done_callback(schedule_stages)
+        return pending
+
+    def _run_stage(self, stage: EnrichmentStage, result: 'IPConversionResult') -> Any:
+        try:
+            return stage.run(self.converter, result)
+        except Exception as e:
+            self.converter.logger.error(f"Failed to run {stage.name} stage for {result.ipv4}: {str(e)}")
+            return None
+
+    def _remaining(self, pending: _Pending) -> Optional[float]:
+        if self.timeout is None:
+            return None
+        if pending.started is None:
+            # Still queued behind other conversions
+            return self.timeout
+        return max(0.0, pending.started + self.timeout - time.monotonic())
+
+    def _collect(self, pending: _Pending) -> List['IPConversionResult']:
+        try:
+            results = pending.base.result(self._remaining(pending))
+        except FutureTimeoutError:
+            pending.base.cancel()
+            self.converter.metrics.count('timeouts', 'dns')
+            self.converter.logger.warning(f"Timed out processing {pending.target} after {self.timeout}s")
+            return []
+        except Exception as e:
+            self.converter.logger.error(f"Failed to process {pending.target}: {str(e)}")
+            return []
+        if not results:
+            return []
+
+        pending.scheduled.wait(self._remaining(pending))
+        for stage, result, future in list(pending.stage_futures):
+            try:
+                # Values are assigned here rather than in the worker so a
+                # stage that misses the deadline cannot change a result
+                # that has already been handed out.
+                setattr(result, stage.field, future.result(self._remaining(pending)))
+            except FutureTimeoutError:
+                future.cancel()
+                self.converter.metrics.count('timeouts', stage.name)
+                self.converter.logger.warning(
+                    f"Timed out running {stage.name} stage for {result.ipv4} after {self.timeout}s")
+        return results
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .http import HTTPClient
+    from .ip_converter import GeoLocation
+
+IPAPI_URL = 'https://ipapi.co'
+
+# Readers are opened once per process and shared by every provider and
+# thread; the database is memory-mapped, so lookups do no file I/O.
+_READERS: Dict[str, object] = {}
+_READERS_LOCK = threading.Lock()
+
+
+def open_reader(path: Union[str, Path]):
+    """Return the process-wide memory-mapped geoip2 reader for a .mmdb file."""
+    import geoip2.database
+
+    key = str(Path(path).expanduser().resolve())
+    with _READERS_LOCK:
+        if key not in _READERS:
+            try:
+                # C extension with mmap when it is installed
+                reader = geoip2.database.Reader(key, mode=geoip2.database.MODE_MMAP_EXT)
+            except ValueError:
+                reader = geoip2.database.Reader(key, mode=geoip2.database.MODE_MMAP)
+            _READERS[key] = reader
+        return _READERS[key]
+
+
+class GeoProvider:
+    """Source of geolocation data for a single IPv4 address."""
+
+    name = 'base'
+
+    def lookup(self, ip: str) -> Optional['GeoLocation']:
+        raise NotImplementedError
+
+
+class MaxMindGeoProvider(GeoProvider):
+    """Offline lookups against a local MaxMind (GeoLite2/GeoIP2) database."""
+
+    name = 'maxmind'
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.reader = open_reader(db_path)
+        self._has_city = 'City' in self.reader.metadata().database_type
+
+    def lookup(self, ip: str) -> Optional['GeoLocation']:
+        from geoip2.errors import AddressNotFoundError
+        from .ip_converter import GeoLocation
+
+        try:
+            record = self.reader.city(ip) if self._has_city else self.reader.country(ip)
+        except AddressNotFoundError:
+            return None
+        city = getattr(record, 'city', None)
+        location = getattr(record, 'location', None)
+        return GeoLocation(
+            country=record.country.name or 'Unknown',
+            city=(city.name if city else None) or 'Unknown',
+            latitude=float(location.latitude or 0) if location else 0.0,
+            longitude=float(location.longitude or 0) if location else 0.0,
+            timezone=(location.time_zone if location else None) or 'Unknown',
+            network=str(record.traits.network) if record.traits.network else None
+        )
+
+
+class IPApiGeoProvider(GeoProvider):
+    """Online lookups against https://ipapi.co (or a compatible `base_url`)."""
+
+    name = 'ipapi'
+
+    def __init__(self, http: 'HTTPClient', base_url: str = IPAPI_URL):
+        self.http = http
+        self.base_url = base_url.rstrip('/')
+
+    def lookup(self, ip: str) -> Optional['GeoLocation']:
+        from .ip_converter import GeoLocation
+
+        response = self.http.get(f"{self.base_url}/{ip}/json/")
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if data.get('error'):
+            return None
+        return GeoLocation(
+            country=data.get('country_name', 'Unknown'),
+            city=data.get('city', 'Unknown'),
+            latitude=float(data.get('latitude', 0)),
+            longitude=float(data.get('longitude', 0)),
+            timezone=data.get('timezone', 'Unknown'),
+            network=data.get('network')
+        )
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple, TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from .metrics import Metrics
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 15.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 30.0
+DEFAULT_POOL_SIZE = 32
+
+# Requests per second allowed per host. ipapi.co's free tier allows about
+# 1000 requests a day with short bursts, so keep well under a request a
+# second by default.
+DEFAULT_RATE_LIMITS: Dict[str, float] = {
+    'ipapi.co': 1.0,
+}
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class HTTPClient:
+    """Shared HTTP layer for remote enrichment providers.
+
+    Wraps one requests.Session with a connection pool sized for the batch
+    executor, applies connect/read timeouts to every request, throttles
+    each host through its own token bucket and retries connection errors,
+    429 and 5xx responses with jittered exponential backoff (honouring a
+    numeric Retry-After header). Retries are also counted on `metrics`,
+    against the stage that made the request.
+    """
+
+    def __init__(self, rate_limits: Optional[Dict[str, float]] = None,
+                 timeout: Tuple[float, float] = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX,
+                 pool_size: int = DEFAULT_POOL_SIZE, metrics: Optional['Metrics'] = None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.retries = 0
+        self.metrics = metrics
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled requests session, created (and requests imported) on first use."""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = 'RT-MASK'
+                self._session = session
+            return self._session
+
+    def _bucket(self, host: str) -> Optional[TokenBucket]:
+        rate = self.rate_limits.get(host)
+        if rate is None:
+            return None
+        with self._buckets_lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(rate)
+            return self._buckets[host]
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        # Full jitter: spread retries from many workers over the window
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, **kwargs):
+        """GET a URL, retrying transient failures; returns the final response."""
+        import requests
+
+        bucket = self._bucket(urlsplit(url).hostname or '')
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            if bucket:
+                bucket.acquire()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response.headers.get('Retry-After'))
+            attempt += 1
+            self.retries += 1
+            if self.metrics:
+                self.metrics.count('retries')
+            time.sleep(delay)
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
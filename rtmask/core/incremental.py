@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from .bulk import CIDRBatch
+from .cache import DEFAULT_TTLS
+from .enrichment import EnrichmentStage
+from .ip_converter import IPConversionResult
+
+# Seconds after which an enrichment from an earlier run is looked up again
+DEFAULT_MAX_AGES = {
+    'geo': DEFAULT_TTLS['geo'],
+    'whois': DEFAULT_TTLS['whois'],
+    'network': 60 * 60,
+}
+
+# Values compared for the change report; latencies and lookup times differ
+# on every run, and the IPv6 form and URLs follow from the address
+_COMPARED = {
+    'geolocation': ('country', 'city', 'latitude', 'longitude', 'timezone', 'network'),
+    'whois_info': ('registrar', 'creation_date', 'expiration_date', 'name_servers', 'status', 'network'),
+    'network_info': ('is_reachable', 'reverse_dns', 'open_ports'),
+}
+
+
+def target_key(result: IPConversionResult) -> str:
+    """The input entry a result was produced for: its domain, or its address."""
+    return result.domain.lower() if result.domain else result.ipv4
+
+
+def _values(result: IPConversionResult) -> Dict[str, Any]:
+    values = {'ipv4': result.ipv4, 'qr_code_path': result.qr_code_path}
+    for field, names in _COMPARED.items():
+        record = getattr(result, field)
+        for name in names:
+            values[f"{field}.{name}"] = getattr(record, name) if record is not None else None
+    return values
+
+
+def diff(before: IPConversionResult, after: IPConversionResult) -> Dict[str, List[Any]]:
+    """{field: [before, after]} for every compared value that differs."""
+    old, new = _values(before), _values(after)
+    return {name: [old[name], new[name]] for name in new if old[name] != new[name]}
+
+
+class IncrementalRun:
+    """Re-enrich only what changed since an earlier run.
+
+    The earlier run's results are indexed by target (domain or address).
+    Every target of the new run still gets a fresh base conversion, so a
+    domain is resolved again (through the DNS cache), but carry_over()
+    copies each enrichment of the earlier result for the same address
+    whose lookup is younger than the stage's maximum age. The batch
+    executor skips stages whose field is already filled, so lookups are
+    only made for new targets, new addresses and stale records. Records
+    without a lookup time are as old as the earlier results file.
+
+    track() passes the merged results through, comparing each with its
+    earlier counterpart, and changes() lists what was added, changed and
+    removed once the run is over.
+    """
+
+    def __init__(self, previous: Iterable[IPConversionResult], stages: List[EnrichmentStage],
+                 max_ages: Optional[Dict[str, float]] = None, previous_time: Optional[float] = None,
+                 now: Optional[float] = None):
+        self.stages = stages
+        self.max_ages = {**DEFAULT_MAX_AGES, **(max_ages or {})}
+        self.now = time.time() if now is None else now
+        self.previous_time = self.now if previous_time is None else previous_time
+        self.previous: Dict[str, List[IPConversionResult]] = {}
+        for result in previous:
+            self.previous.setdefault(target_key(result), []).append(result)
+        self.targets = 0
+        self.carried = 0
+        self.refreshed: Dict[str, int] = {stage.name: 0 for stage in stages}
+        self._changes: List[Dict[str, Any]] = []
+        self._matched: Set[Tuple[str, str]] = set()
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], stages: List[EnrichmentStage],
+                  max_ages: Optional[Dict[str, float]] = None) -> 'IncrementalRun':
+        """Load the results of an earlier run from a JSON, JSON Lines or .rtm file."""
+        from ..utils.merge import read_results
+
+        path = Path(path)
+        return cls(read_results(path), stages, max_ages, previous_time=path.stat().st_mtime)
+
+    def _fresh(self, stage: EnrichmentStage, record: Any) -> bool:
+        if record is None:
+            return False
+        if stage.name == 'qr':
+            return Path(record).exists()
+        if stage.name not in self.max_ages:
+            return False
+        checked_at = getattr(record, 'checked_at', None)
+        age = self.now - (self.previous_time if checked_at is None else checked_at)
+        return age <= self.max_ages[stage.name]
+
+    def carry_over(self, target: str, results: List[IPConversionResult]):
+        """Fill the fresh enrichments of `results` in from the earlier run (executor hook)."""
+        earlier = {result.ipv4: result for result in self.previous.get(target_key(results[0]), [])} if results else {}
+        stale = {stage.name: 0 for stage in self.stages}
+        carried = 0
+        for result in results:
+            before = earlier.get(result.ipv4)
+            fresh = 0
+            for stage in self.stages:
+                record = getattr(before, stage.field) if before is not None else None
+                if self._fresh(stage, record):
+                    setattr(result, stage.field, record)
+                    fresh += 1
+                else:
+                    stale[stage.name] += 1
+            carried += fresh == len(self.stages)
+        with self._lock:
+            self.targets += 1
+            self.carried += carried
+            for name, count in stale.items():
+                self.refreshed[name] += count
+
+    def track(self, results: Iterable[Union[IPConversionResult, CIDRBatch]]
+              ) -> Iterator[Union[IPConversionResult, CIDRBatch]]:
+        """Pass results through, recording how each differs from the earlier run."""
+        for item in results:
+            yield item
+            if isinstance(item, CIDRBatch):
+                continue
+            key = target_key(item)
+            self._seen.add(key)
+            earlier = self.previous.get(key)
+            if not earlier:
+                self._changes.append({'change': 'added', 'target': key, 'ipv4': item.ipv4})
+                continue
+            # Compare with the earlier result for the same address, else
+            # with one this target no longer resolves to
+            before = next((r for r in earlier if r.ipv4 == item.ipv4), None)
+            if before is None:
+                before = next((r for r in earlier if (key, r.ipv4) not in self._matched), None)
+            if before is None:
+                self._changes.append({'change': 'added', 'target': key, 'ipv4': item.ipv4})
+                continue
+            self._matched.add((key, before.ipv4))
+            fields = diff(before, item)
+            if fields:
+                self._changes.append({'change': 'changed', 'target': key, 'ipv4': item.ipv4, 'fields': fields})
+
+    def changes(self) -> List[Dict[str, Any]]:
+        """The change report: added and changed results, then earlier results no longer produced."""
+        removed = [{'change': 'removed', 'target': key, 'ipv4': result.ipv4}
+                   for key, earlier in self.previous.items() for result in earlier
+                   if key not in self._seen or (key, result.ipv4) not in self._matched]
+        return self._changes + removed
+
+    def report(self) -> List[str]:
+        """Lines summarizing the work saved and the changes found."""
+        counts = {'added': 0, 'changed': 0, 'removed': 0}
+        for change in self.changes():
+            counts[change['change']] += 1
+        refreshed = ', '.join(f"{name} {count}" for name, count in self.refreshed.items())
+        return [
+            f"Incremental: {self.targets} targets, {self.carried} results reused as they were; "
+            f"stages re-run: {refreshed or 'none'}",
+            f"             {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed",
+        ]
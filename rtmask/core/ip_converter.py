@@ -1,17 +1,30 @@
 #!/usr/bin/env python3
 
 import ipaddress
-import socket
-import dns.resolver
-import whois
-import requests
-import json
-from dataclasses import dataclass
-from typing import Optional, List, Dict, Union
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional, List, Dict, Union, Iterable, Iterator, TYPE_CHECKING
 from pathlib import Path
 import logging
-import qrcode
-from datetime import datetime
+from .enrichment import EnrichmentStage, get_stages
+from .executor import BatchExecutor, DEFAULT_CONCURRENCY
+from .cache import EnrichmentCache
+from .metrics import Metrics
+from .prefix_index import PrefixIndex, default_block
+from .geo import GeoProvider, IPApiGeoProvider, MaxMindGeoProvider
+from .http import HTTPClient
+from .prober import ReachabilityProber
+from .rdap import RDAPClient
+from .resolver import AsyncResolver
+
+if TYPE_CHECKING:
+    from .bulk import CIDRBatch
+    from .qr import QRRenderer
+    from .store import ResultStore
+
+# Cache key prefix of geolocation and WHOIS records stored per network block
+BLOCK_KEY_PREFIX = 'block:'
 
 @dataclass
 class GeoLocation:
@@ -20,6 +33,8 @@ class GeoLocation:
     latitude: float
     longitude: float
     timezone: str
+    network: Optional[str] = None
+    checked_at: Optional[float] = None
 
 @dataclass
 class WhoisInfo:
@@ -28,6 +43,8 @@ class WhoisInfo:
     expiration_date: Optional[str]
     name_servers: List[str]
     status: List[str]
+    network: Optional[str] = None
+    checked_at: Optional[float] = None
 
 @dataclass
 class NetworkInfo:
@@ -35,6 +52,7 @@ class NetworkInfo:
     latency_ms: Optional[float]
     reverse_dns: Optional[str]
     open_ports: List[int]
+    checked_at: Optional[float] = None
 
 @dataclass
 class IPConversionResult:
@@ -48,11 +66,43 @@ class IPConversionResult:
     network_info: Optional[NetworkInfo] = None
     qr_code_path: Optional[str] = None
 
+def result_from_dict(data: Dict[str, Any]) -> IPConversionResult:
+    """Rebuild a result from its dictionary form (JSON output or dataclasses.asdict)."""
+    result = IPConversionResult(**data)
+    if result.geolocation is not None:
+        result.geolocation = GeoLocation(**result.geolocation)
+    if result.whois_info is not None:
+        result.whois_info = WhoisInfo(**result.whois_info)
+    if result.network_info is not None:
+        result.network_info = NetworkInfo(**result.network_info)
+    return result
+
 class IPConverter:
-    def __init__(self, output_dir: Optional[str] = None):
+    def __init__(self, output_dir: Optional[str] = None, enrichments: Iterable[str] = (),
+                 cache: Optional[EnrichmentCache] = None, geo_db: Optional[str] = None,
+                 http: Optional[HTTPClient] = None, prober: Optional[ReachabilityProber] = None,
+                 resolver: Optional[AsyncResolver] = None, all_records: bool = False,
+                 qr: Optional['QRRenderer'] = None, metrics: Optional[Metrics] = None,
+                 rdap: Optional[RDAPClient] = None):
         self.logger = self._setup_logging()
         self.output_dir = Path(output_dir) if output_dir else Path.cwd()
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.stages = get_stages(enrichments)
+        self.cache = cache
+        self.block_index = {'geo': PrefixIndex(), 'whois': PrefixIndex()}
+        self._blocks_loaded = set()
+        self._blocks_lock = threading.Lock()
+        self.http = http or HTTPClient()
+        self.prober = prober or ReachabilityProber()
+        self.resolver = resolver or AsyncResolver()
+        # The RDAP bootstrap tables are kept next to the cache, or in memory with --no-cache
+        self.rdap = rdap or RDAPClient(self.http, bootstrap_dir=cache.cache_dir if cache else None)
+        self.all_records = all_records
+        self._qr = qr
+        self.metrics = metrics or Metrics()
+        self.geo_providers: List[GeoProvider] = [IPApiGeoProvider(self.http)]
+        if geo_db:
+            self.geo_providers.insert(0, MaxMindGeoProvider(geo_db))
 
     @staticmethod
     def _setup_logging() -> logging.Logger:
@@ -64,106 +114,172 @@ class IPConverter:
         logger.addHandler(handler)
         return logger
 
+    def _cached(self, kind: str, key: str, fetch: Callable[[], Any], cls: Optional[type] = None) -> Any:
+        """Return a cached lookup, or run fetch() and cache its result (None briefly)."""
+        if self.cache is None:
+            return fetch()
+        hit, value = self.cache.get(kind, key)
+        if hit:
+            self.metrics.count('cache_hits', kind)
+            return cls(**value) if cls and value is not None else value
+        value = fetch()
+        self.cache.set(kind, key, asdict(value) if cls and value is not None else value)
+        return value
+
+    def _load_blocks(self, kind: str, cls: type):
+        """Index the blocks cached by earlier runs (once per kind)."""
+        if self.cache is None or kind in self._blocks_loaded:
+            return
+        with self._blocks_lock:
+            if kind in self._blocks_loaded:
+                return
+            for key, value in self.cache.scan(kind, BLOCK_KEY_PREFIX):
+                if value is not None:
+                    self.block_index[kind].add(key[len(BLOCK_KEY_PREFIX):], cls(**value))
+            self._blocks_loaded.add(kind)
+
+    def _by_block(self, kind: str, ip: str, fetch: Callable[[], Any], cls: type) -> Any:
+        """Answer an IP lookup from a known network block, or fetch and index it.
+
+        Hosts in the same block share geolocation and registration data, so
+        a range scan needs one external lookup per block instead of per host.
+        Blocks are also cached under `block:<network>` keys, which are
+        loaded into the index before the first lookup, so later runs reuse
+        them for hosts they have never seen. Non-global addresses (private,
+        reserved, ...) are never looked up.
+        """
+        if not ipaddress.IPv4Address(ip).is_global:
+            return None
+        self._load_blocks(kind, cls)
+        index = self.block_index[kind]
+        found, record = index.lookup(ip)
+        if found:
+            self.metrics.count('cache_hits', kind)
+            return record
+        with index.block_lock(ip):
+            # Another worker may have indexed the block while we waited
+            found, record = index.lookup(ip)
+            if found:
+                self.metrics.count('cache_hits', kind)
+                return record
+            record = fetch()
+            if record is not None:
+                network = str(ipaddress.IPv4Network(getattr(record, 'network', None) or default_block(ip),
+                                                    strict=False))
+                index.add(network, record)
+                if self.cache is not None:
+                    self.cache.set(kind, BLOCK_KEY_PREFIX + network, asdict(record))
+            return record
+
     def resolve_domain(self, domain: str) -> Optional[str]:
         """Resolve domain name to IPv4 address."""
-        try:
-            answers = dns.resolver.resolve(domain, 'A')
-            return str(answers[0])
-        except Exception as e:
-            self.logger.error(f"Failed to resolve domain {domain}: {str(e)}")
-            return None
+        addresses = self.resolve_domain_all(domain)
+        return addresses[0] if addresses else None
+
+    def resolve_domain_all(self, domain: str) -> List[str]:
+        """Resolve domain name to all of its IPv4 addresses."""
+        addresses = self._cached('dns', domain.lower(), lambda: self._resolve_domain(domain)) or []
+        # Entries written by older versions hold a single address
+        return [addresses] if isinstance(addresses, str) else addresses
+
+    def _resolve_domain(self, domain: str) -> Optional[List[str]]:
+        with self.metrics.timer('dns'):
+            try:
+                answers = self.resolver.resolve(domain, 'A')
+                if not answers:
+                    self.metrics.count('errors')
+                    self.logger.error(f"Failed to resolve domain {domain}: no A records")
+                    return None
+                return answers
+            except Exception as e:
+                self.metrics.count('errors')
+                self.logger.error(f"Failed to resolve domain {domain}: {str(e)}")
+                return None
+
+    def prefetch_domains(self, domains: Iterable[str]):
+        """Resolve many domains concurrently so later lookups are answered from cache."""
+        pending = [domain for domain in domains
+                   if not self._is_ip(domain) and (self.cache is None or not self.cache.contains('dns', domain.lower()))]
+        if pending:
+            self.resolver.resolve_many(pending)
 
     def get_geolocation(self, ip: str) -> Optional[GeoLocation]:
         """Get geolocation information for an IP address."""
-        try:
-            response = requests.get(f"https://ipapi.co/{ip}/json/")
-            if response.status_code == 200:
-                data = response.json()
-                return GeoLocation(
-                    country=data.get('country_name', 'Unknown'),
-                    city=data.get('city', 'Unknown'),
-                    latitude=float(data.get('latitude', 0)),
-                    longitude=float(data.get('longitude', 0)),
-                    timezone=data.get('timezone', 'Unknown')
-                )
-        except Exception as e:
-            self.logger.error(f"Failed to get geolocation for {ip}: {str(e)}")
+        return self._by_block('geo', ip, lambda: self._cached('geo', ip, lambda: self._fetch_geolocation(ip), GeoLocation),
+                              GeoLocation)
+
+    def _fetch_geolocation(self, ip: str) -> Optional[GeoLocation]:
+        # Providers are tried in order; the local database, when configured,
+        # comes first and the HTTP service only answers what it misses.
+        for provider in self.geo_providers:
+            try:
+                geolocation = provider.lookup(ip)
+                if geolocation:
+                    # Time of the lookup; cached copies keep it, so it is the age of the data
+                    geolocation.checked_at = time.time()
+                    return geolocation
+            except Exception as e:
+                self.metrics.count('errors', 'geo')
+                self.logger.error(f"Failed to get geolocation for {ip} from {provider.name}: {str(e)}")
         return None
 
     def get_whois_info(self, domain_or_ip: str) -> Optional[WhoisInfo]:
         """Get WHOIS information for a domain or IP."""
+        fetch = lambda: self._cached('whois', domain_or_ip.lower(), lambda: self._fetch_whois_info(domain_or_ip), WhoisInfo)
+        if self._is_ip(domain_or_ip):
+            return self._by_block('whois', domain_or_ip, fetch, WhoisInfo)
+        return fetch()
+
+    def _fetch_whois_info(self, domain_or_ip: str) -> Optional[WhoisInfo]:
         try:
-            w = whois.whois(domain_or_ip)
-            return WhoisInfo(
-                registrar=w.registrar,
-                creation_date=str(w.creation_date[0]) if isinstance(w.creation_date, list) else str(w.creation_date),
-                expiration_date=str(w.expiration_date[0]) if isinstance(w.expiration_date, list) else str(w.expiration_date),
-                name_servers=w.name_servers if w.name_servers else [],
-                status=w.status if w.status else []
-            )
+            whois_info = self.rdap.lookup(domain_or_ip)
+            if whois_info:
+                whois_info.checked_at = time.time()
+            return whois_info
         except Exception as e:
+            self.metrics.count('errors', 'whois')
             self.logger.error(f"Failed to get WHOIS info for {domain_or_ip}: {str(e)}")
             return None
 
     def check_network_info(self, ip: str) -> NetworkInfo:
-        """Get basic network information about an IP."""
-        import platform
-        import subprocess
-        from socket import gethostbyaddr
-        
-        # Check if host is reachable
-        param = '-n' if platform.system().lower() == 'windows' else '-c'
-        command = ['ping', param, '1', ip]
-        is_reachable = subprocess.call(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) == 0
-        
-        # Get latency if reachable
-        latency_ms = None
-        if is_reachable:
-            try:
-                output = subprocess.check_output(['ping', param, '1', ip])
-                if platform.system().lower() == 'windows':
-                    latency_ms = float(output.decode().split('Average = ')[-1].split('ms')[0])
-                else:
-                    latency_ms = float(output.decode().split('time=')[-1].split(' ms')[0])
-            except:
-                pass
-
-        # Try reverse DNS lookup
-        try:
-            reverse_dns = gethostbyaddr(ip)[0]
-        except:
-            reverse_dns = None
+        """Get reachability, latency, open ports and reverse DNS for an IP."""
+        probe = self.prober.probe(ip)
+
+        # Reverse DNS goes through the same resolver and caches as forward lookups
+        reverse_dns = self._cached('ptr', ip, lambda: self.resolver.reverse(ip))
 
         return NetworkInfo(
-            is_reachable=is_reachable,
-            latency_ms=latency_ms,
+            is_reachable=probe.is_reachable,
+            latency_ms=probe.latency_ms,
             reverse_dns=reverse_dns,
-            open_ports=[]  # Could implement basic port scanning here
+            open_ports=probe.open_ports,
+            checked_at=time.time()
         )
 
     def generate_qr_code(self, url: str, ip: str) -> str:
         """Generate QR code for a URL."""
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        qr_path = self.output_dir / f"qr_{ip.replace('.', '_')}.png"
-        img.save(qr_path)
-        return str(qr_path)
+        return self.qr.render(url, f"qr_{ip.replace('.', '_')}.png")
+
+    @property
+    def qr(self) -> 'QRRenderer':
+        """The QR renderer; created on first use, rendering in-process."""
+        if self._qr is None:
+            from .qr import QRRenderer
+            self._qr = QRRenderer(self.output_dir, workers=0)
+        return self._qr
 
     def ipv4_to_ipv6(self, ipv4: str) -> str:
         """Convert IPv4 to IPv6 address."""
         try:
             ipv4_obj = ipaddress.IPv4Address(ipv4)
-            ipv6_hex = format(int(ipv4_obj), '032x')
+            ipv6_hex = format(int(ipv4_obj), '08x')
             return f"::ffff:{ipv6_hex[0:4]}:{ipv6_hex[4:8]}"
         except Exception as e:
             self.logger.error(f"Failed to convert {ipv4} to IPv6: {str(e)}")
             raise
 
-    def process_ip(self, ip_or_domain: str, generate_qr: bool = False) -> Optional[IPConversionResult]:
-        """Process an IP address or domain name with all available information."""
+    def process_ip(self, ip_or_domain: str, generate_qr: bool = False, enrich: bool = True) -> Optional[IPConversionResult]:
+        """Process an IP address or domain name with the selected enrichments."""
         try:
             # Check if input is a domain
             ipv4 = ip_or_domain
@@ -175,30 +291,11 @@ class IPConverter:
                     return None
                 ipv4 = resolved_ip
 
-            # Convert to IPv6
-            ipv6 = self.ipv4_to_ipv6(ipv4)
-            
-            # Generate URLs
-            url_nossl = f"http://[{ipv6}]"
-            url_ssl = f"https://[{ipv6}]"
-
-            # Generate QR code if requested
-            qr_code_path = None
-            if generate_qr:
-                qr_code_path = self.generate_qr_code(url_ssl, ipv4)
-
-            # Gather additional information
-            result = IPConversionResult(
-                ipv4=ipv4,
-                ipv6=ipv6,
-                url_nossl=url_nossl,
-                url_ssl=url_ssl,
-                domain=domain,
-                geolocation=self.get_geolocation(ipv4),
-                whois_info=self.get_whois_info(domain or ipv4),
-                network_info=self.check_network_info(ipv4),
-                qr_code_path=qr_code_path
-            )
+            result = self._convert(ipv4, domain)
+
+            # Only the selected enrichment stages touch the network
+            if enrich:
+                self.enrich(result, self._stages_for(generate_qr))
 
             return result
 
@@ -206,6 +303,85 @@ class IPConverter:
             self.logger.error(f"Failed to process {ip_or_domain}: {str(e)}")
             return None
 
+    def process_target(self, ip_or_domain: str, generate_qr: bool = False, enrich: bool = True) -> List[IPConversionResult]:
+        """Process an IP or domain; with all_records set, a domain gives one result per A record."""
+        if not self.all_records or self._is_ip(ip_or_domain):
+            result = self.process_ip(ip_or_domain, generate_qr, enrich)
+            return [result] if result else []
+        try:
+            results = [self._convert(ipv4, ip_or_domain) for ipv4 in self.resolve_domain_all(ip_or_domain)]
+            if enrich:
+                for result in results:
+                    self.enrich(result, self._stages_for(generate_qr))
+            return results
+        except Exception as e:
+            self.logger.error(f"Failed to process {ip_or_domain}: {str(e)}")
+            return []
+
+    def _convert(self, ipv4: str, domain: Optional[str] = None) -> IPConversionResult:
+        # Convert to IPv6
+        ipv6 = self.ipv4_to_ipv6(ipv4)
+        
+        # Generate URLs
+        url_nossl = f"http://[{ipv6}]"
+        url_ssl = f"https://[{ipv6}]"
+
+        return IPConversionResult(
+            ipv4=ipv4,
+            ipv6=ipv6,
+            url_nossl=url_nossl,
+            url_ssl=url_ssl,
+            domain=domain
+        )
+
+    def _stages_for(self, generate_qr: bool) -> List[EnrichmentStage]:
+        return self.stages + get_stages(['qr']) if generate_qr else self.stages
+
+    def process_many(self, targets: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY,
+                     generate_qr: bool = False, timeout: Optional[float] = None,
+                     stage_limits: Optional[Dict[str, int]] = None,
+                     stages: Optional[List[EnrichmentStage]] = None,
+                     carry_over: Optional[Callable[[str, List[IPConversionResult]], None]] = None
+                     ) -> Iterator[IPConversionResult]:
+        """Process many IPs or domains concurrently, yielding results in input order."""
+        results = self.map_targets(targets, concurrency, generate_qr, timeout, stage_limits, stages, carry_over)
+        return (result for target_results in results for result in target_results)
+
+    def map_targets(self, targets: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY,
+                    generate_qr: bool = False, timeout: Optional[float] = None,
+                    stage_limits: Optional[Dict[str, int]] = None,
+                    stages: Optional[List[EnrichmentStage]] = None,
+                    carry_over: Optional[Callable[[str, List[IPConversionResult]], None]] = None
+                    ) -> Iterator[List[IPConversionResult]]:
+        """Like process_many, but yield the list of results of each target in input order.
+
+        `stages` replaces the converter's own enrichments (and the QR stage
+        selected by generate_qr) for this call. `carry_over(target, results)`
+        may fill in fields of the base conversions, e.g. from an earlier
+        run; stages whose field it fills are not run.
+        """
+        executor = BatchExecutor(self, concurrency=concurrency,
+                                 stages=self._stages_for(generate_qr) if stages is None else stages,
+                                 stage_limits=stage_limits, timeout=timeout, carry_over=carry_over)
+        return executor.map(targets)
+
+    def enrich(self, result: IPConversionResult, stages: Optional[List[EnrichmentStage]] = None) -> IPConversionResult:
+        """Fill in the fields of a result whose stages have not run yet."""
+        for stage in self.stages if stages is None else stages:
+            if not stage.is_done(result):
+                self.run_stage(stage, result)
+        return result
+
+    def run_stage(self, stage: Union[str, EnrichmentStage], result: IPConversionResult):
+        """Run a single enrichment stage on a result and store its value."""
+        if isinstance(stage, str):
+            stage = get_stages([stage])[0]
+        try:
+            return stage.apply(self, result)
+        except Exception as e:
+            self.logger.error(f"Failed to run {stage.name} stage for {result.ipv4}: {str(e)}")
+            return None
+
     @staticmethod
     def _is_ip(addr: str) -> bool:
         try:
@@ -214,46 +390,31 @@ class IPConverter:
         except ValueError:
             return False
 
-    def process_cidr(self, cidr: str, generate_qr: bool = False) -> List[IPConversionResult]:
-        """Process all IPs in a CIDR range."""
-        results = []
+    def process_cidr(self, cidr: str, generate_qr: bool = False,
+                     concurrency: int = DEFAULT_CONCURRENCY) -> 'ResultStore':
+        """Process all IPs in a CIDR range into a compact ResultStore."""
+        from .store import ResultStore
+        results = ResultStore()
         try:
-            network = ipaddress.IPv4Network(cidr, strict=False)
-            for ip in network.hosts():
-                result = self.process_ip(str(ip), generate_qr)
-                if result:
-                    results.append(result)
+            hosts = (ipv4 for batch in self.iter_cidr_batches(cidr) for ipv4 in batch.ipv4)
+            results.extend(self.process_many(hosts, concurrency, generate_qr))
         except Exception as e:
             self.logger.error(f"Failed to process CIDR {cidr}: {str(e)}")
         return results
 
+    def convert_cidr(self, cidr: str, chunk_size: Optional[int] = None) -> List['CIDRBatch']:
+        """Convert all IPs in a CIDR range in bulk, without enrichment."""
+        return list(self.iter_cidr_batches(cidr, chunk_size))
+
+    def iter_cidr_batches(self, cidr: str, chunk_size: Optional[int] = None) -> Iterator['CIDRBatch']:
+        """Lazily yield bulk-converted batches for a CIDR range."""
+        from .bulk import DEFAULT_CHUNK_SIZE, iter_cidr_batches
+        try:
+            yield from iter_cidr_batches(cidr, chunk_size or DEFAULT_CHUNK_SIZE)
+        except Exception as e:
+            self.logger.error(f"Failed to process CIDR {cidr}: {str(e)}")
+
     def to_dict(self, result: IPConversionResult) -> Dict:
         """Convert IPConversionResult to dictionary."""
-        return {
-            'ipv4': result.ipv4,
-            'ipv6': result.ipv6,
-            'url_nossl': result.url_nossl,
-            'url_ssl': result.url_ssl,
-            'domain': result.domain,
-            'geolocation': {
-                'country': result.geolocation.country,
-                'city': result.geolocation.city,
-                'latitude': result.geolocation.latitude,
-                'longitude': result.geolocation.longitude,
-                'timezone': result.geolocation.timezone
-            } if result.geolocation else None,
-            'whois_info': {
-                'registrar': result.whois_info.registrar,
-                'creation_date': result.whois_info.creation_date,
-                'expiration_date': result.whois_info.expiration_date,
-                'name_servers': result.whois_info.name_servers,
-                'status': result.whois_info.status
-            } if result.whois_info else None,
-            'network_info': {
-                'is_reachable': result.network_info.is_reachable,
-                'latency_ms': result.network_info.latency_ms,
-                'reverse_dns': result.network_info.reverse_dns,
-                'open_ports': result.network_info.open_ports
-            } if result.network_info else None,
-            'qr_code_path': result.qr_code_path
-        }
+        from ..utils.writers import result_to_dict
+        return result_to_dict(result)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import itertools
+import json
+import os
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+from .bulk import CIDRBatch
+from .ip_converter import IPConversionResult, result_from_dict
+
+JOB_FILE = 'job.json'
+JOURNAL_FILE = 'journal.jsonl'
+
+# Seconds between flushes of the journal to the OS; a crash loses at most
+# this much finished work, and a Ctrl-C or exception loses none.
+FLUSH_INTERVAL = 1.0
+
+
+def _fingerprint(path: Union[str, Path]) -> Dict[str, Any]:
+    stat = os.stat(path)
+    return {'path': str(Path(path).resolve()), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+class JobJournal:
+    """Append-only record of the finished work of a long-running job.
+
+    A job directory holds `job.json` (the options the job was started with
+    and a fingerprint of its input files) and `journal.jsonl`, with one line
+    per finished unit of work in input order: a bulk-converted CIDRBatch is
+    stored as its address range, an enriched target as its results. On
+    resume, replay() yields the journaled results again and skip() drops the
+    units they came from, so only the remaining work is done.
+
+    A line is only trusted if it is complete and continues the sequence, so
+    a journal cut short by a crash is truncated back to its last good line.
+    """
+
+    def __init__(self, job_dir: Union[str, Path], config: Dict[str, Any]):
+        self.job_dir = Path(job_dir)
+        self.config = config
+        self.completed = 0
+        self._good_bytes = 0
+        self._replayed = False
+        self._file = None
+        self._last_flush = time.monotonic()
+
+    @property
+    def journal_path(self) -> Path:
+        return self.job_dir / JOURNAL_FILE
+
+    @property
+    def complete(self) -> bool:
+        return self.config.get('status') == 'complete'
+
+    @classmethod
+    def create(cls, job_dir: Union[str, Path], options: Dict[str, Any],
+               inputs: Iterable[Union[str, Path]] = ()) -> 'JobJournal':
+        """Start a new job in `job_dir`, which must not already hold a journal."""
+        job_dir = Path(job_dir)
+        if (job_dir / JOURNAL_FILE).exists():
+            raise ValueError(f"{job_dir} already holds a job; continue it with --resume {job_dir}")
+        job_dir.mkdir(parents=True, exist_ok=True)
+        journal = cls(job_dir, {
+            'status': 'running',
+            'created': time.time(),
+            'options': options,
+            'inputs': [_fingerprint(path) for path in inputs],
+        })
+        journal._save_config()
+        journal.journal_path.touch()
+        journal._replayed = True
+        return journal
+
+    @classmethod
+    def open(cls, job_dir: Union[str, Path]) -> 'JobJournal':
+        """Open an existing job, checking that its input files are unchanged."""
+        job_dir = Path(job_dir)
+        try:
+            with open(job_dir / JOB_FILE) as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"No resumable job in {job_dir}: {str(e)}")
+        for saved in config.get('inputs', []):
+            try:
+                current = _fingerprint(saved['path'])
+            except OSError:
+                raise ValueError(f"Input file of the job is missing: {saved['path']}")
+            if current != saved:
+                raise ValueError(f"Input file changed since the job started: {saved['path']}")
+        return cls(job_dir, config)
+
+    def replay(self) -> Iterator[Union[IPConversionResult, CIDRBatch]]:
+        """Yield the results of every journaled unit, counting them in `completed`."""
+        self.completed = 0
+        self._good_bytes = 0
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            self._replayed = True
+            return
+        with f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("incomplete line")
+                    record = json.loads(line)
+                    if record['n'] != self.completed:
+                        raise ValueError("out of sequence")
+                except (ValueError, KeyError, TypeError):
+                    break
+                self.completed += 1
+                self._good_bytes += len(line)
+                if 'batch' in record:
+                    yield CIDRBatch(*record['batch'])
+                else:
+                    yield from map(result_from_dict, record['results'])
+        self._replayed = True
+
+    def skip(self, units: Iterable[Any]) -> Iterator[Any]:
+        """Drop the units already covered by the journal."""
+        return itertools.islice(units, self.completed, None)
+
+    def record(self, unit: Union[CIDRBatch, List[IPConversionResult]]):
+        """Append one finished unit: a bulk batch or the results of one target."""
+        if isinstance(unit, CIDRBatch):
+            record = {'n': self.completed, 'batch': [unit.start, unit.stop]}
+        else:
+            record = {'n': self.completed, 'results': [asdict(result) for result in unit]}
+        self._journal().write(json.dumps(record, separators=(',', ':')) + '\n')
+        self.completed += 1
+        now = time.monotonic()
+        if now - self._last_flush >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._last_flush = now
+
+    def _journal(self):
+        if self._file is None:
+            if not self._replayed:
+                # Count the finished units without keeping their results
+                for _ in self.replay():
+                    pass
+            # Drop a partly written last line before appending after it
+            with open(self.journal_path, 'ab') as f:
+                f.truncate(self._good_bytes)
+            self._file = open(self.journal_path, 'a')
+        return self._file
+
+    def finish(self):
+        """Mark the job complete; resuming it then only replays the journal."""
+        self.close()
+        self.config['status'] = 'complete'
+        self.config['finished'] = time.time()
+        self._save_config()
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _save_config(self):
+        path = self.job_dir / JOB_FILE
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.config, f, indent=2)
+        os.replace(tmp, path)
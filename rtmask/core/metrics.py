@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last
+# bucket catches everything slower.
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+COUNTERS = ('calls', 'errors', 'cache_hits', 'retries', 'timeouts')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with count, sum, min and max."""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, ms: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the given fraction of observations."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(float(bound), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'buckets_ms': list(LATENCY_BUCKETS_MS),
+            'counts': list(self.counts),
+            'count': self.count,
+            'sum_ms': self.total,
+            'min_ms': self.min,
+            'max_ms': self.max,
+        }
+
+
+class StageMetrics:
+    """Counters and a latency histogram for one stage."""
+
+    __slots__ = ('name', 'calls', 'errors', 'cache_hits', 'retries', 'timeouts', 'latency')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.latency = Histogram()
+
+    def to_dict(self) -> Dict[str, Any]:
+        stats = {counter: getattr(self, counter) for counter in COUNTERS}
+        stats['seconds'] = self.latency.total / 1000
+        stats['p50_ms'] = self.latency.percentile(0.5)
+        stats['p95_ms'] = self.latency.percentile(0.95)
+        stats['latency'] = self.latency.to_dict()
+        return stats
+
+
+class Metrics:
+    """Per-stage timers and counters shared by every thread of a run.
+
+    Stages are named after the work they time: 'dns', the enrichment
+    stages ('geo', 'whois', 'network', 'qr') and 'write'. Code running
+    inside timer() can call count() without a stage name (the HTTP client
+    does this for retries) and the count goes to the enclosing stage.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self._stages: Dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+        self._current = threading.local()
+
+    def stage(self, name: str) -> StageMetrics:
+        stage = self._stages.get(name)
+        if stage is None:
+            with self._lock:
+                stage = self._stages.setdefault(name, StageMetrics(name))
+        return stage
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[StageMetrics]:
+        """Time a block as one call of `name`; an exception counts as an error."""
+        stage = self.stage(name)
+        outer = getattr(self._current, 'name', None)
+        self._current.name = name
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield stage
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self._current.name = outer
+            with self._lock:
+                stage.calls += 1
+                stage.errors += failed
+                stage.latency.observe(elapsed)
+
+    def count(self, counter: str, name: Optional[str] = None, amount: int = 1):
+        """Add to a counter of stage `name`, or of the stage being timed in this thread."""
+        name = name or getattr(self._current, 'name', None) or 'other'
+        stage = self.stage(name)
+        with self._lock:
+            setattr(stage, counter, getattr(stage, counter) + amount)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {name: stage.to_dict() for name, stage in sorted(self._stages.items())}
+        return {
+            'timestamp': time.time(),
+            'elapsed_seconds': time.monotonic() - self.started,
+            'stages': stages,
+        }
+
+    def summary(self) -> List[str]:
+        """Lines of a plain-text table with one row per stage."""
+        lines = [f"{'stage':<10}{'calls':>9}{'errors':>8}{'hits':>8}{'retries':>9}{'timeouts':>10}"
+                 f"{'total s':>10}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>10}"]
+        for name, stats in self.snapshot()['stages'].items():
+            latency = stats['latency']
+            mean = latency['sum_ms'] / latency['count'] if latency['count'] else None
+            lines.append(
+                f"{name:<10}{stats['calls']:>9}{stats['errors']:>8}{stats['cache_hits']:>8}"
+                f"{stats['retries']:>9}{stats['timeouts']:>10}{stats['seconds']:>10.2f}"
+                f"{_ms(mean):>10}{_ms(stats['p50_ms']):>9}{_ms(stats['p95_ms']):>9}{_ms(latency['max_ms']):>10}"
+            )
+        return lines
+
+    def write(self, path: Union[str, Path]):
+        """Write the metrics as JSON, or in Prometheus text format for a `.prom` path."""
+        path = Path(path)
+        if path.suffix == '.prom':
+            path.write_text(self.prometheus())
+        else:
+            path.write_text(json.dumps(self.snapshot(), indent=2) + '\n')
+
+    def prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format (e.g. for a textfile collector)."""
+        snapshot = self.snapshot()
+        lines = []
+        for counter in COUNTERS:
+            lines.append(f"# TYPE rtmask_stage_{counter}_total counter")
+            for name, stats in snapshot['stages'].items():
+                lines.append(f'rtmask_stage_{counter}_total{{stage="{name}"}} {stats[counter]}')
+        lines.append("# TYPE rtmask_stage_latency_ms histogram")
+        for name, stats in snapshot['stages'].items():
+            latency = stats['latency']
+            cumulative = 0
+            for bound, count in zip(latency['buckets_ms'] + ['+Inf'], latency['counts']):
+                cumulative += count
+                lines.append(f'rtmask_stage_latency_ms_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'rtmask_stage_latency_ms_sum{{stage="{name}"}} {latency["sum_ms"]}')
+            lines.append(f'rtmask_stage_latency_ms_count{{stage="{name}"}} {latency["count"]}')
+        lines.append("# TYPE rtmask_elapsed_seconds gauge")
+        lines.append(f"rtmask_elapsed_seconds {snapshot['elapsed_seconds']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _ms(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value:.1f}"
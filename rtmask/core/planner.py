@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+import bisect
+import ipaddress
+from array import array
+from dataclasses import replace
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
+
+from .bulk import DEFAULT_CHUNK_SIZE, _TYPECODE, CIDRBatch, host_range
+from .ip_converter import IPConversionResult
+
+if TYPE_CHECKING:
+    from .ip_converter import IPConverter
+
+# Interval ends are exclusive and may be 2**32, which needs 64 bits
+_STOP_TYPECODE = 'q'
+
+
+class IntervalSet:
+    """Sorted, disjoint integer intervals [start, stop) held in two arrays.
+
+    Overlapping and adjacent intervals are merged, so a set built from a
+    /16 and every /24 inside it is one interval. Membership is a binary
+    search; storage is 12 bytes per interval whatever its size.
+    """
+
+    def __init__(self):
+        self.starts = array(_TYPECODE)
+        self.stops = array(_STOP_TYPECODE)
+
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[Tuple[int, int]]) -> 'IntervalSet':
+        # Sort (start, length - 1) packed into one integer rather than
+        # tuples, to keep the peak memory of a large input small
+        keys = array('Q', ((start << 32) | (stop - start - 1) for start, stop in ranges if stop > start))
+        intervals = cls()
+        for key in sorted(keys):
+            start = key >> 32
+            stop = start + (key & 0xffffffff) + 1
+            if intervals.stops and start <= intervals.stops[-1]:
+                if stop > intervals.stops[-1]:
+                    intervals.stops[-1] = stop
+            else:
+                intervals.starts.append(start)
+                intervals.stops.append(stop)
+        return intervals
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __contains__(self, value: int) -> bool:
+        index = bisect.bisect_right(self.starts, value) - 1
+        return index >= 0 and value < self.stops[index]
+
+    @property
+    def size(self) -> int:
+        """Number of integers covered."""
+        return sum(self.stops) - sum(self.starts)
+
+    def batches(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[CIDRBatch]:
+        for start, stop in zip(self.starts, self.stops):
+            for first in range(start, stop, chunk_size):
+                yield CIDRBatch(first, min(first + chunk_size, stop))
+
+
+def _address(value: str) -> Optional[int]:
+    try:
+        return int(ipaddress.IPv4Address(value))
+    except ValueError:
+        return None
+
+
+class InputPlan:
+    """Deduplicated work for a stream of input entries.
+
+    build() reads the entries once. CIDR ranges and single addresses go
+    into one IntervalSet, which merges overlapping and adjacent networks
+    and drops addresses that a range (or an earlier line) already covers.
+    Domains are resolved in bulk and grouped by address: only the first
+    domain of a group becomes a unit of work, and the others get a copy of
+    its result with their own name. A domain whose address is already
+    covered by the ranges costs no work at all; its row is copied from the
+    address's result.
+
+    units() yields the work in a fixed order (the merged ranges in address
+    order as CIDR batches, then one domain per group), so it can be
+    sharded and journaled like raw input; expand() turns the results of
+    that work back into one row per domain. With all_records, domains are
+    not grouped, since each of them may expand to several addresses.
+    """
+
+    def __init__(self, converter: 'IPConverter', all_records: bool = False):
+        self.converter = converter
+        self.all_records = all_records
+        self.ranges = IntervalSet()
+        self.groups: Dict[object, List[str]] = {}
+        self.covered: Dict[str, List[str]] = {}
+        self.entries = 0
+        self.networks = 0
+        self.addresses = 0
+        self.domains = 0
+        self.hosts_requested = 0
+        self.invalid: List[str] = []
+
+    @classmethod
+    def build(cls, converter: 'IPConverter', entries: Iterable[Union[str, CIDRBatch]],
+              all_records: bool = False) -> 'InputPlan':
+        plan = cls(converter, all_records)
+        plan._read(entries)
+        return plan
+
+    def _read(self, entries: Iterable[Union[str, CIDRBatch]]):
+        starts = array(_TYPECODE)
+        stops = array(_STOP_TYPECODE)
+        domains: List[str] = []
+        for entry in entries:
+            self.entries += 1
+            if isinstance(entry, CIDRBatch):  # Part of a range split by --shard
+                start, stop = entry.start, entry.stop
+                self.networks += 1
+            elif '/' in entry:
+                try:
+                    hosts = host_range(entry)
+                except ValueError:
+                    self.invalid.append(entry)
+                    continue
+                start, stop = hosts.start, hosts.stop
+                self.networks += 1
+            else:
+                address = _address(entry)
+                if address is None:
+                    domains.append(entry)
+                    continue
+                start, stop = address, address + 1
+                self.addresses += 1
+            starts.append(start)
+            stops.append(stop)
+            self.hosts_requested += stop - start
+        self.ranges = IntervalSet.from_ranges(zip(starts, stops))
+        del starts, stops
+        self._group(domains)
+
+    def _group(self, domains: List[str]):
+        self.domains = len(domains)
+        if self.all_records:
+            for index, domain in enumerate(domains):
+                self.groups[index] = [domain]
+            return
+        self.converter.prefetch_domains(domains)
+        for domain in domains:
+            ipv4 = self.converter.resolve_domain(domain)
+            address = _address(ipv4) if ipv4 else None
+            if address is not None and address in self.ranges:
+                self.covered.setdefault(ipv4, []).append(domain)
+            else:
+                # Unresolved domains stay separate and fail as usual
+                self.groups.setdefault(ipv4 or object(), []).append(domain)
+
+    def units(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Union[str, CIDRBatch]]:
+        yield from self.invalid
+        yield from self.ranges.batches(chunk_size)
+        for domains in self.groups.values():
+            yield domains[0]
+
+    def expand(self, results: Iterable[Union[IPConversionResult, CIDRBatch]]
+               ) -> Iterator[Union[IPConversionResult, CIDRBatch]]:
+        """Pass results through, adding a row for every domain that shared a unit."""
+        others = {domains[0]: domains[1:] for domains in self.groups.values() if len(domains) > 1}
+        captured: Dict[str, IPConversionResult] = {}
+        for item in results:
+            yield item
+            if isinstance(item, CIDRBatch):
+                continue
+            if item.domain is None:
+                if item.ipv4 in self.covered:
+                    captured[item.ipv4] = item
+            else:
+                for domain in others.get(item.domain, ()):
+                    yield replace(item, domain=domain)
+        for ipv4, domains in self.covered.items():
+            for domain in domains:
+                if ipv4 in captured:
+                    yield replace(captured[ipv4], domain=domain)
+                else:
+                    # Plain conversions (or a failed lookup) are simply redone
+                    yield from self.converter.process_target(domain)
+
+    @property
+    def units_planned(self) -> int:
+        return self.ranges.size + len(self.groups) + len(self.invalid)
+
+    def report(self) -> List[str]:
+        """Lines describing how much work deduplication removed."""
+        requested = self.hosts_requested + self.domains + len(self.invalid)
+        eliminated = requested - self.units_planned
+        share = eliminated / requested * 100 if requested else 0.0
+        covered = sum(len(domains) for domains in self.covered.values())
+        return [
+            f"Plan: {self.entries} entries -> {self.networks} networks and {self.addresses} addresses "
+            f"merged into {len(self.ranges)} ranges ({self.ranges.size} hosts of {self.hosts_requested})",
+            f"      {self.domains} domains -> {len(self.groups)} lookups ({covered} covered by the ranges)",
+            f"      {self.units_planned} targets to process instead of {requested} "
+            f"({eliminated} duplicates eliminated, {share:.1f}%)",
+        ]
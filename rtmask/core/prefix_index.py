@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import ipaddress
+import threading
+from typing import Any, Dict, List, Tuple, Union
+
+# Block size assumed when a provider does not say which network an answer
+# covers; hosts in the same /24 nearly always share owner and location.
+DEFAULT_BLOCK_PREFIX = 24
+
+_LOCK_STRIPES = 256
+
+
+def default_block(ip: str, prefixlen: int = DEFAULT_BLOCK_PREFIX) -> str:
+    """Return the CIDR of the default-sized block containing ip."""
+    return str(ipaddress.IPv4Network(f"{ip}/{prefixlen}", strict=False))
+
+
+class PrefixIndex:
+    """Index of IPv4 network blocks answering longest-prefix-match lookups.
+
+    Blocks are kept in one hash table per prefix length, keyed by the
+    network address as an integer, so a lookup costs one mask and one dict
+    probe per distinct prefix length present (a handful in practice),
+    independent of how many blocks are indexed. Records may be None to
+    remember that a block has no data.
+    """
+
+    def __init__(self):
+        self._blocks: Dict[int, Dict[int, Any]] = {}
+        self._lengths: List[int] = []
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+    def __len__(self) -> int:
+        return sum(len(blocks) for blocks in self._blocks.values())
+
+    def add(self, network: Union[str, ipaddress.IPv4Network], record: Any):
+        """Associate a record with every address in `network`."""
+        network = ipaddress.IPv4Network(network, strict=False)
+        with self._lock:
+            if network.prefixlen not in self._blocks:
+                self._blocks[network.prefixlen] = {}
+                # Most specific first so lookups return the narrowest block
+                self._lengths = sorted(self._blocks, reverse=True)
+            self._blocks[network.prefixlen][int(network.network_address)] = record
+
+    def lookup(self, ip: Union[str, int]) -> Tuple[bool, Any]:
+        """Return (found, record) for the most specific block containing ip."""
+        addr = ip if isinstance(ip, int) else int(ipaddress.IPv4Address(ip))
+        for prefixlen in self._lengths:
+            mask = (0xffffffff << (32 - prefixlen)) & 0xffffffff
+            blocks = self._blocks[prefixlen]
+            key = addr & mask
+            if key in blocks:
+                return True, blocks[key]
+        return False, None
+
+    def block_lock(self, ip: str) -> threading.Lock:
+        """Lock shared by lookups for the same default-sized block.
+
+        Holding it while fetching lets concurrent workers for neighbouring
+        hosts wait for one answer instead of all querying the provider.
+        """
+        addr = int(ipaddress.IPv4Address(ip)) >> (32 - DEFAULT_BLOCK_PREFIX)
+        return self._stripes[hash(addr) % _LOCK_STRIPES]
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import itertools
+import socket
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from .aio import BackgroundLoop
+
+if TYPE_CHECKING:
+    import asyncio
+
+DEFAULT_PORTS = (22, 80, 443)
+DEFAULT_PROBE_TIMEOUT = 1.0
+# Sockets open at once across all targets; keeps well below the usual
+# 1024 file descriptor limit.
+DEFAULT_PROBE_CONCURRENCY = 512
+MAX_PORTS = 1024
+
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+
+
+@dataclass
+class ProbeResult:
+    is_reachable: bool
+    latency_ms: Optional[float]
+    open_ports: List[int] = field(default_factory=list)
+
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+class _ICMPPinger:
+    """Echo requests over one unprivileged ICMP datagram socket.
+
+    Replies are demultiplexed by (address, sequence) on the event loop, so
+    any number of pings can be outstanding at once. Raises OSError on
+    construction when the platform does not allow ICMP datagram sockets
+    (on Linux, see net.ipv4.ping_group_range).
+    """
+
+    def __init__(self, loop: 'asyncio.AbstractEventLoop'):
+        self.loop = loop
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        self.sock.setblocking(False)
+        self._seq = itertools.count()
+        self._waiters: Dict[Tuple[str, int], asyncio.Future] = {}
+        loop.add_reader(self.sock.fileno(), self._on_readable)
+
+    async def ping(self, ip: str, timeout: float) -> Optional[float]:
+        import asyncio
+
+        seq = next(self._seq) & 0xffff
+        # Linux replaces the identifier with the socket's own; it is only
+        # meaningful on platforms that pass the header through unchanged.
+        header = struct.pack('!BBHHH', _ICMP_ECHO_REQUEST, 0, 0, 0, seq)
+        payload = struct.pack('!d', time.time())
+        packet = struct.pack('!BBHHH', _ICMP_ECHO_REQUEST, 0, _checksum(header + payload), 0, seq) + payload
+
+        waiter = self.loop.create_future()
+        self._waiters[(ip, seq)] = waiter
+        start = time.perf_counter()
+        try:
+            self.sock.sendto(packet, (ip, 0))
+            await asyncio.wait_for(waiter, timeout)
+            return (time.perf_counter() - start) * 1000
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self._waiters.pop((ip, seq), None)
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            # macOS includes the IP header, Linux does not
+            if data and data[0] >> 4 == 4 and len(data) >= 20:
+                data = data[(data[0] & 0x0f) * 4:]
+            if len(data) < 8 or data[0] != _ICMP_ECHO_REPLY:
+                continue
+            seq = struct.unpack('!H', data[6:8])[0]
+            waiter = self._waiters.get((addr[0], seq))
+            if waiter and not waiter.done():
+                waiter.set_result(None)
+
+    def close(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+
+class ReachabilityProber:
+    """In-process reachability and port checks driven by one event loop.
+
+    Each target gets an ICMP echo (when unprivileged ICMP sockets are
+    available) and a TCP connect to every port in `ports`, all in
+    parallel. A refused connection still proves the host is up, so TCP
+    probes double as the reachability fallback. Latency is the ICMP
+    round trip, or the fastest TCP handshake when ICMP is unavailable.
+
+    The event loop runs in a background thread, so the blocking probe()
+    and probe_many() can be called from the batch executor's workers.
+    """
+
+    def __init__(self, ports: Sequence[int] = DEFAULT_PORTS, timeout: float = DEFAULT_PROBE_TIMEOUT,
+                 concurrency: int = DEFAULT_PROBE_CONCURRENCY, use_icmp: bool = True):
+        if len(ports) > MAX_PORTS:
+            raise ValueError(f"At most {MAX_PORTS} ports can be probed per target")
+        if any(not 0 < port < 65536 for port in ports):
+            raise ValueError("Ports must be between 1 and 65535")
+        self.ports = tuple(ports)
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.use_icmp = use_icmp
+        self._loop = BackgroundLoop('rtmask-prober', setup=self._setup)
+        self._pinger: Optional[_ICMPPinger] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _setup(self):
+        import asyncio
+
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self.use_icmp:
+            try:
+                self._pinger = _ICMPPinger(asyncio.get_running_loop())
+            except OSError:
+                self._pinger = None
+
+    @property
+    def icmp_available(self) -> bool:
+        # ICMP support is detected by the loop's setup
+        self._loop.start()
+        return self._pinger is not None
+
+    def probe(self, ip: str) -> ProbeResult:
+        """Probe one target, blocking until its probes finish or time out."""
+        return self._loop.run(self.probe_async(ip))
+
+    def probe_many(self, ips: Iterable[str]) -> List[ProbeResult]:
+        """Probe many targets concurrently; results match the input order."""
+        async def run(targets):
+            import asyncio
+
+            return await asyncio.gather(*(self.probe_async(ip) for ip in targets))
+        return self._loop.run(run(list(ips)))
+
+    async def probe_async(self, ip: str) -> ProbeResult:
+        import asyncio
+
+        icmp = self._ping(ip) if self._pinger else None
+        tcp = [self._connect(ip, port) for port in self.ports]
+        outcomes = await asyncio.gather(*([icmp] if icmp else []), *tcp)
+        rtt = outcomes[0] if icmp else None
+        port_outcomes = outcomes[1:] if icmp else outcomes
+
+        open_ports = [port for port, (state, _) in zip(self.ports, port_outcomes) if state == 'open']
+        answered = [elapsed for state, elapsed in port_outcomes if state in ('open', 'closed')]
+        if rtt is None and answered:
+            rtt = min(answered)
+        return ProbeResult(
+            is_reachable=rtt is not None,
+            latency_ms=rtt,
+            open_ports=open_ports
+        )
+
+    async def _ping(self, ip: str) -> Optional[float]:
+        async with self._semaphore:
+            return await self._pinger.ping(ip, self.timeout)
+
+    async def _connect(self, ip: str, port: int) -> Tuple[str, Optional[float]]:
+        """Return ('open' | 'closed' | 'filtered', handshake time in ms)."""
+        import asyncio
+
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), self.timeout)
+            except ConnectionRefusedError:
+                return 'closed', (time.perf_counter() - start) * 1000
+            except (OSError, asyncio.TimeoutError):
+                return 'filtered', None
+            elapsed = (time.perf_counter() - start) * 1000
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return 'open', elapsed
+
+    def close(self):
+        if self._pinger:
+            self._loop.call_soon(self._pinger.close)
+            self._pinger = None
+        self._loop.close()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+import hashlib
+import io
+import json
+import os
+import threading
+import warnings
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+QR_VERSION = 1
+QR_BOX_SIZE = 10
+QR_BORDER = 5
+
+# Tiles per side of one sprite sheet. Codes start at QR_VERSION and grow to
+# fit their URL; the URLs of mapped addresses need version 2 (350 pixels),
+# so a sheet is about 5600 pixels square and a few hundred kilobytes as a
+# 1-bit PNG.
+SPRITE_COLUMNS = 16
+
+MANIFEST_NAME = 'qr_manifest.json'
+
+
+def content_hash(url: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> str:
+    """Hash of everything that determines a QR image, used to skip re-rendering."""
+    return hashlib.sha256(f"{QR_VERSION}|{box_size}|{border}|{url}".encode()).hexdigest()
+
+
+def render_png(url: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER,
+               path: Optional[str] = None) -> Optional[bytes]:
+    """Render a QR code for a URL as PNG; write it to `path`, or return the bytes.
+
+    A module-level function so it can run in worker processes.
+    """
+    import qrcode
+
+    qr = qrcode.QRCode(version=QR_VERSION, box_size=box_size, border=border)
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    if path:
+        img.save(path)
+        return None
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class _SpriteSheets:
+    """Packs equally sized QR tiles into numbered sheet images plus a JSON index.
+
+    The index of an earlier run is loaded, so its tiles are kept and new
+    sheets are numbered after the last existing one.
+    """
+
+    def __init__(self, path: Path, columns: int = SPRITE_COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.index: Dict[str, Dict[str, Union[str, int]]] = self._load_index()
+        self._sheets: Dict[int, Tuple[object, str, int]] = {}
+        numbers = [sheet.stem[len(path.stem) + 1:] for sheet in path.parent.glob(f"{path.stem}_*{path.suffix}")]
+        self._count = max((int(number) + 1 for number in numbers if number.isdigit()), default=0)
+
+    @property
+    def index_path(self) -> Path:
+        return self.path.with_suffix('.json')
+
+    def _load_index(self) -> Dict[str, Dict[str, Union[str, int]]]:
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Tiles whose sheet is gone are rendered again
+        return {name: tile for name, tile in index.items() if (self.path.parent / tile['sheet']).exists()}
+
+    def holds(self, name: str, digest: str) -> bool:
+        tile = self.index.get(name)
+        return tile is not None and tile.get('digest') == digest
+
+    def add(self, name: str, png: bytes, digest: str) -> str:
+        from PIL import Image
+
+        tile = Image.open(io.BytesIO(png)).convert('1')
+        size = tile.size[0]
+        if size not in self._sheets:
+            self._new_sheet(size)
+        sheet, sheet_name, used = self._sheets[size]
+        x, y = (used % self.columns) * size, (used // self.columns) * size
+        sheet.paste(tile, (x, y))
+        self.index[name] = {'sheet': sheet_name, 'x': x, 'y': y, 'size': size, 'digest': digest}
+        used += 1
+        if used == self.columns * self.columns:
+            self._save(size)
+        else:
+            self._sheets[size] = (sheet, sheet_name, used)
+        return self.location(name)
+
+    def location(self, name: str) -> str:
+        tile = self.index[name]
+        return f"{self.path.parent / tile['sheet']}#xywh={tile['x']},{tile['y']},{tile['size']},{tile['size']}"
+
+    def _new_sheet(self, size: int):
+        from PIL import Image
+
+        sheet_name = f"{self.path.stem}_{self._count:04d}{self.path.suffix}"
+        self._count += 1
+        side = size * self.columns
+        self._sheets[size] = (Image.new('1', (side, side), 1), sheet_name, 0)
+
+    def _save(self, size: int):
+        sheet, sheet_name, used = self._sheets.pop(size)
+        # Crop the unused rows of a partly filled sheet
+        rows = -(-used // self.columns)
+        sheet.crop((0, 0, sheet.size[0], rows * size)).save(self.path.parent / sheet_name, optimize=True)
+
+    def close(self):
+        for size in list(self._sheets):
+            self._save(size)
+        with open(self.index_path, 'w') as f:
+            json.dump(self.index, f, indent=2)
+
+
+class QRRenderer:
+    """Renders QR codes on a process pool and stores them as files or in an archive.
+
+    With no archive every code is a PNG in `output_dir`. A manifest of
+    content hashes is kept next to them, so a later run skips codes whose
+    image already exists with the same content. With an `archive` path
+    ending in `.zip` all codes go into one ZIP file. A later run appends
+    to it and skips codes already stored with the same content; replaced
+    entries are dropped when it closes. Any other suffix (e.g. `.png`)
+    packs the codes into sprite sheets with a JSON index, and the
+    returned paths carry an `#xywh=` fragment locating the tile. A later
+    run keeps the sheets, skips the codes its index holds with the same
+    content and puts the rest on new sheets.
+
+    Identical URLs are rendered once: concurrent requests wait for the
+    same render, and later ones are answered by the manifest or archive.
+    With `workers` below 2 (the default on a single-CPU machine) codes
+    are rendered in the calling thread, since one worker process would
+    only add overhead.
+    """
+
+    def __init__(self, output_dir: Union[str, Path], archive: Optional[Union[str, Path]] = None,
+                 workers: Optional[int] = None, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER):
+        self.output_dir = Path(output_dir)
+        self.archive = self.output_dir / archive if archive else None
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.box_size = box_size
+        self.border = border
+        self.rendered = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._zipped: Dict[str, str] = {}
+        self._replaced = False
+        self._sprites: Optional[_SpriteSheets] = None
+        self._manifest: Optional[Dict[str, str]] = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.output_dir / MANIFEST_NAME
+
+    def render(self, url: str, name: str) -> str:
+        """Render the code for `url` as `name` and return where it was stored."""
+        digest = content_hash(url, self.box_size, self.border)
+        with self._lock:
+            future = self._inflight.get(digest)
+            owner = future is None
+            if owner:
+                future = self._inflight[digest] = Future()
+                future.add_done_callback(lambda _: self._done(digest))
+        if not owner:
+            return future.result()
+        try:
+            path = self._store(url, name, digest)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+
+    def _done(self, digest: str):
+        # Later requests for the same code are answered by the manifest or archive
+        with self._lock:
+            self._inflight.pop(digest, None)
+
+    def _store(self, url: str, name: str, digest: str) -> str:
+        if self.archive is None:
+            path = self.output_dir / name
+            with self._lock:
+                manifest = self._load_manifest()
+                if path.exists() and manifest.get(name) == digest:
+                    self.skipped += 1
+                    return str(path)
+            self._run(url, str(path))
+            with self._lock:
+                manifest[name] = digest
+                self.rendered += 1
+            return str(path)
+
+        is_zip = self.archive.suffix.lower() == '.zip'
+        with self._lock:
+            if is_zip:
+                self._open_zip()
+                if self._zipped.get(name) == digest:
+                    self.skipped += 1
+                    return f"{self.archive}#{name}"
+            else:
+                if self._sprites is None:
+                    self._sprites = _SpriteSheets(self.archive)
+                if self._sprites.holds(name, digest):
+                    self.skipped += 1
+                    return self._sprites.location(name)
+        png = self._run(url)
+        with self._lock:
+            self.rendered += 1
+            if is_zip:
+                info = zipfile.ZipInfo(name)
+                info.comment = digest.encode()
+                replaced = name in self._zipped
+                self._replaced |= replaced
+                self._zipped[name] = digest
+                # PNG data is already deflated. A replaced entry stays until
+                # close() compacts the archive; readers use the last one.
+                with warnings.catch_warnings():
+                    if replaced:
+                        warnings.simplefilter('ignore', UserWarning)
+                    self._zip.writestr(info, png)
+                return f"{self.archive}#{name}"
+            return self._sprites.add(name, png, digest)
+
+    def _open_zip(self):
+        if self._zip is not None:
+            return
+        self._zip = zipfile.ZipFile(self.archive, 'a', zipfile.ZIP_STORED)
+        self._zipped = {info.filename: info.comment.decode() for info in self._zip.infolist()}
+
+    def _run(self, url: str, path: Optional[str] = None) -> Optional[bytes]:
+        if self.workers < 2:
+            return render_png(url, self.box_size, self.border, path)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            pool = self._pool
+        return pool.submit(render_png, url, self.box_size, self.border, path).result()
+
+    def _load_manifest(self) -> Dict[str, str]:
+        if self._manifest is None:
+            try:
+                with open(self.manifest_path) as f:
+                    self._manifest = json.load(f)
+            except (OSError, ValueError):
+                self._manifest = {}
+        return self._manifest
+
+    def close(self):
+        """Finish archives, save the manifest and stop the worker processes."""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+                if self._replaced:
+                    _compact_zip(self.archive)
+                    self._replaced = False
+            if self._sprites is not None:
+                self._sprites.close()
+                self._sprites = None
+            if self._manifest is not None:
+                with open(self.manifest_path, 'w') as f:
+                    json.dump(self._manifest, f, indent=2)
+
+
+def _compact_zip(path: Path):
+    """Rewrite a ZIP file keeping only the last entry of each name."""
+    latest: Dict[str, zipfile.ZipInfo] = {}
+    tmp = path.with_name(path.name + '.tmp')
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as target:
+        for info in source.infolist():
+            latest[info.filename] = info
+        for info in latest.values():
+            target.writestr(info, source.read(info))
+    os.replace(tmp, path)
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+import ipaddress
+import json
+import re
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union, TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from .prefix_index import PrefixIndex
+
+if TYPE_CHECKING:
+    from .http import HTTPClient
+    from .ip_converter import WhoisInfo
+
+IANA_BOOTSTRAP_URL = 'https://data.iana.org/rdap'
+
+# Registries publish RDAP bootstrap files that change a few times a year
+BOOTSTRAP_MAX_AGE = 7 * 24 * 60 * 60
+
+# Used when the bootstrap table cannot be fetched; redirects to the registry
+FALLBACK_RDAP_URL = 'https://rdap.org/'
+
+REFERRAL_SERVER = 'whois.iana.org'
+WHOIS_PORT = 43
+DEFAULT_WHOIS_TIMEOUT = 10.0
+
+# Port-43 servers of the regional registries, by the host of their RDAP service
+RIR_WHOIS_SERVERS = {
+    'rdap.afrinic.net': 'whois.afrinic.net',
+    'rdap.apnic.net': 'whois.apnic.net',
+    'rdap.arin.net': 'whois.arin.net',
+    'rdap.db.ripe.net': 'whois.ripe.net',
+    'rdap.lacnic.net': 'whois.lacnic.net',
+}
+
+# Port-43 keys, lowercased, in order of preference
+_WHOIS_FIELDS = {
+    'registrar': ('registrar', 'sponsoring registrar', 'orgname', 'org-name', 'owner', 'netname'),
+    'creation_date': ('creation date', 'created', 'regdate', 'registered', 'registration time'),
+    'expiration_date': ('registry expiry date', 'registrar registration expiration date',
+                        'expiration date', 'expiry date', 'expires', 'paid-till'),
+    'name_servers': ('name server', 'nserver'),
+    'status': ('domain status', 'status'),
+    'network': ('cidr', 'inetnum', 'netrange', 'route'),
+}
+
+
+def _is_ipv4(value: str) -> bool:
+    try:
+        ipaddress.IPv4Address(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _covering_network(ip: Optional[str], networks: Iterable[ipaddress.IPv4Network]) -> Optional[str]:
+    """The network containing ip (the first one without an ip), as a CIDR string."""
+    networks = list(networks)
+    if not networks:
+        return None
+    if ip is not None:
+        address = ipaddress.IPv4Address(ip)
+        networks = [network for network in networks if address in network] or networks
+    return str(networks[0])
+
+
+def _range_networks(value: str) -> List[ipaddress.IPv4Network]:
+    """Parse '1.2.3.0/24', '1.2.3.0 - 1.2.3.255' or comma-separated CIDRs."""
+    networks = []
+    try:
+        if '-' in value:
+            first, last = (part.strip() for part in value.split('-', 1))
+            networks.extend(ipaddress.summarize_address_range(ipaddress.IPv4Address(first),
+                                                              ipaddress.IPv4Address(last)))
+        else:
+            networks.extend(ipaddress.IPv4Network(part.strip(), strict=False)
+                            for part in value.split(',') if part.strip())
+    except ValueError:
+        pass
+    return networks
+
+
+def normalize_status(value: str) -> str:
+    """A registration status in RDAP form, whichever protocol reported it.
+
+    EPP codes from port 43 such as 'clientTransferProhibited' become
+    'client transfer prohibited', and 'ok' becomes 'active' (RFC 8056).
+    """
+    status = re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', value.strip()).lower()
+    return 'active' if status == 'ok' else status
+
+
+def _vcard_name(entity: Dict[str, Any]) -> Optional[str]:
+    vcard = entity.get('vcardArray')
+    if not isinstance(vcard, list) or len(vcard) < 2:
+        return None
+    for item in vcard[1]:
+        if item[0] == 'fn' and item[3]:
+            return item[3]
+    return None
+
+
+def _entity_name(entities: List[Dict[str, Any]], role: str) -> Optional[str]:
+    """Name of the first entity with `role`, searching nested entities too."""
+    for entity in entities:
+        if role in entity.get('roles', ()):
+            name = _vcard_name(entity)
+            if name:
+                return name
+        name = _entity_name(entity.get('entities', []), role)
+        if name:
+            return name
+    return None
+
+
+def parse_rdap(data: Dict[str, Any], ip: Optional[str] = None) -> 'WhoisInfo':
+    """Convert an RDAP domain or IP network object to WhoisInfo."""
+    from .ip_converter import WhoisInfo
+
+    entities = data.get('entities', [])
+    events = {event.get('eventAction'): event.get('eventDate') for event in data.get('events', [])}
+    networks = [ipaddress.IPv4Network(f"{cidr['v4prefix']}/{cidr['length']}")
+                for cidr in data.get('cidr0_cidrs', []) if 'v4prefix' in cidr]
+    if not networks and data.get('startAddress') and data.get('endAddress'):
+        networks = _range_networks(f"{data['startAddress']} - {data['endAddress']}")
+    return WhoisInfo(
+        registrar=_entity_name(entities, 'registrar') or _entity_name(entities, 'registrant') or data.get('name'),
+        creation_date=events.get('registration'),
+        expiration_date=events.get('expiration'),
+        name_servers=[ns['ldhName'].lower() for ns in data.get('nameservers', []) if ns.get('ldhName')],
+        status=list(dict.fromkeys(normalize_status(value) for value in data.get('status', []))),
+        network=_covering_network(ip, networks)
+    )
+
+
+def parse_whois(text: str, ip: Optional[str] = None) -> Optional['WhoisInfo']:
+    """Convert a port-43 reply to WhoisInfo; None if it has no known fields."""
+    from .ip_converter import WhoisInfo
+
+    fields: Dict[str, List[str]] = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(':')
+        value = value.strip()
+        if sep and value and not key.startswith(('%', '#', '>')):
+            fields.setdefault(key.strip().lower(), []).append(value)
+
+    def values(name: str) -> List[str]:
+        for key in _WHOIS_FIELDS[name]:
+            if key in fields:
+                return fields[key]
+        return []
+
+    def first(name: str) -> Optional[str]:
+        found = values(name)
+        return found[0] if found else None
+
+    if not any(key in fields for keys in _WHOIS_FIELDS.values() for key in keys):
+        return None
+    name_servers = [value.split()[0].lower().rstrip('.') for value in values('name_servers')]
+    return WhoisInfo(
+        registrar=first('registrar'),
+        creation_date=first('creation_date'),
+        expiration_date=first('expiration_date'),
+        name_servers=list(dict.fromkeys(name_servers)),
+        # Values may be followed by an explanatory URL
+        status=list(dict.fromkeys(normalize_status(value.split()[0]) for value in values('status'))),
+        network=_covering_network(ip, (network for value in values('network')
+                                       for network in _range_networks(value)))
+    )
+
+
+def _host_port(server: str) -> Tuple[str, int]:
+    host, sep, port = server.rpartition(':')
+    return (host, int(port)) if sep and port.isdigit() else (server, WHOIS_PORT)
+
+
+class RDAPClient:
+    """Registration data for IPv4 addresses and domains over RDAP.
+
+    Queries are routed to the registry responsible for them (the RIR
+    holding an address block, the registry of a TLD) using the IANA
+    bootstrap tables. The tables are downloaded once, kept in
+    `bootstrap_dir` and refreshed after `max_age` seconds; without a
+    directory they are only held in memory. Requests go through the shared
+    HTTPClient, so every registry is served from a pooled keep-alive
+    connection, with the client's timeouts, retries and rate limits.
+
+    Answers for addresses carry the registered network, so the caller can
+    reuse them for every address in it. When a TLD has no RDAP service or
+    the registry's service fails, the query falls back to port-43 WHOIS:
+    the RIR's server for addresses, or the server IANA refers to for a
+    TLD (`referral_server`, HOST or HOST:PORT).
+
+    Pointing `bootstrap_url` and `referral_server` at local stand-ins (see
+    benchmarks/fakes.py) runs the client without touching the internet.
+    """
+
+    def __init__(self, http: 'HTTPClient', bootstrap_dir: Optional[Union[str, Path]] = None,
+                 bootstrap_url: str = IANA_BOOTSTRAP_URL, max_age: float = BOOTSTRAP_MAX_AGE,
+                 referral_server: str = REFERRAL_SERVER, whois_timeout: float = DEFAULT_WHOIS_TIMEOUT):
+        self.http = http
+        self.bootstrap_dir = Path(bootstrap_dir) if bootstrap_dir else None
+        self.bootstrap_url = bootstrap_url.rstrip('/')
+        self.max_age = max_age
+        self.referral_server = referral_server
+        self.whois_timeout = whois_timeout
+        self.rdap_queries = 0
+        self.whois_queries = 0
+        self._ipv4: Optional[PrefixIndex] = None
+        self._dns: Optional[Dict[str, str]] = None
+        self._referrals: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, query: str) -> Optional['WhoisInfo']:
+        """Registration data for an IPv4 address or a domain; None if nothing is registered."""
+        ip = query if _is_ipv4(query) else None
+        query = query if ip else query.lower().rstrip('.')
+        base_url = self.ipv4_service(ip) if ip else self.domain_service(query)
+        if base_url is not None:
+            try:
+                return self._rdap(base_url, query, ip)
+            except Exception:
+                # Some registries only answer port 43 reliably
+                server = self._whois_server(query, ip, base_url)
+                if server is None:
+                    raise
+                return parse_whois(self._whois(server, query), ip)
+        server = self._whois_server(query, ip)
+        return parse_whois(self._whois(server, query), ip) if server else None
+
+    def _rdap(self, base_url: str, query: str, ip: Optional[str]) -> Optional['WhoisInfo']:
+        self.rdap_queries += 1
+        response = self.http.get(f"{base_url}{'ip' if ip else 'domain'}/{query}",
+                                 headers={'Accept': 'application/rdap+json'})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return parse_rdap(response.json(), ip)
+
+    def ipv4_service(self, ip: str) -> Optional[str]:
+        """Base URL of the RDAP service for an address."""
+        with self._lock:
+            if self._ipv4 is None:
+                self._ipv4 = PrefixIndex()
+                for prefixes, url in self._bootstrap('ipv4'):
+                    for prefix in prefixes:
+                        self._ipv4.add(prefix, url)
+        found, url = self._ipv4.lookup(ip)
+        return url if found else FALLBACK_RDAP_URL
+
+    def domain_service(self, domain: str) -> Optional[str]:
+        """Base URL of the RDAP service for a domain's TLD; None if it has none."""
+        with self._lock:
+            if self._dns is None:
+                self._dns = {tld.lower(): url for tlds, url in self._bootstrap('dns') for tld in tlds}
+        if not self._dns:
+            return FALLBACK_RDAP_URL
+        labels = domain.split('.')
+        for i in range(1, len(labels)):
+            url = self._dns.get('.'.join(labels[i:]))
+            if url:
+                return url
+        return None
+
+    def _bootstrap(self, kind: str) -> List[Tuple[List[str], str]]:
+        """(entries, base URL) pairs of an IANA bootstrap file ('ipv4' or 'dns')."""
+        path = self.bootstrap_dir / f"rdap-{kind}.json" if self.bootstrap_dir else None
+        data = None
+        if path and path.exists() and time.time() - path.stat().st_mtime < self.max_age:
+            data = json.loads(path.read_text())
+        if data is None:
+            try:
+                response = self.http.get(f"{self.bootstrap_url}/{kind}.json")
+                response.raise_for_status()
+                data = response.json()
+                if path:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    path.write_text(json.dumps(data))
+            except Exception:
+                # A stale table beats none
+                data = json.loads(path.read_text()) if path and path.exists() else {'services': []}
+        services = []
+        for entries, urls in data.get('services', []):
+            https = [url for url in urls if url.startswith('https:')]
+            url = (https or urls)[0]
+            services.append((entries, url if url.endswith('/') else url + '/'))
+        return services
+
+    def _whois_server(self, query: str, ip: Optional[str], base_url: Optional[str] = None) -> Optional[str]:
+        """Port-43 server for a query: the RIR's for an address, IANA's referral for a TLD."""
+        if base_url is not None and urlsplit(base_url).hostname in RIR_WHOIS_SERVERS:
+            return RIR_WHOIS_SERVERS[urlsplit(base_url).hostname]
+        key = ip.split('.')[0] if ip else query.rsplit('.', 1)[-1]
+        with self._lock:
+            if key not in self._referrals:
+                referral = None
+                for line in self._whois(self.referral_server, key if not ip else ip).splitlines():
+                    name, sep, value = line.partition(':')
+                    if sep and name.strip().lower() in ('refer', 'whois') and value.strip():
+                        referral = value.strip()
+                        break
+                # Without a referral the referral server answers the query itself
+                self._referrals[key] = referral or self.referral_server
+            return self._referrals[key]
+
+    def _whois(self, server: str, query: str) -> str:
+        self.whois_queries += 1
+        with socket.create_connection(_host_port(server), timeout=self.whois_timeout) as sock:
+            sock.sendall(f"{query}\r\n".encode())
+            chunks = []
+            while True:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return b''.join(chunks).decode(errors='replace')
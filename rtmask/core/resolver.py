@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import time
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+from .aio import BackgroundLoop
+
+if TYPE_CHECKING:
+    import asyncio
+
+DEFAULT_DNS_CONCURRENCY = 256
+DEFAULT_DNS_TIMEOUT = 3.0
+# Seconds to remember that a name does not exist or has no records
+DEFAULT_NEGATIVE_TTL = 300
+DEFAULT_MAX_CACHE_ENTRIES = 100_000
+
+
+class AsyncResolver:
+    """Batched DNS lookups on dnspython's asyncio resolver.
+
+    Queries run on one background event loop with at most `concurrency`
+    in flight. Answers are cached in memory until their DNS TTL expires;
+    NXDOMAIN and empty answers are cached for `negative_ttl` seconds.
+    Concurrent lookups of the same name share one query. Reverse (PTR)
+    lookups go through the same engine and cache. `nameservers` (and
+    `port`) replace the system resolver configuration.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_DNS_CONCURRENCY, timeout: float = DEFAULT_DNS_TIMEOUT,
+                 negative_ttl: float = DEFAULT_NEGATIVE_TTL, max_entries: int = DEFAULT_MAX_CACHE_ENTRIES,
+                 nameservers: Optional[List[str]] = None, port: int = 53):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.nameservers = nameservers
+        self.port = port
+        self.queries = 0
+        self.cache_hits = 0
+        self._cache: Dict[Tuple[str, str], Tuple[float, List[str]]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._loop = BackgroundLoop('rtmask-resolver', setup=self._setup)
+
+    async def _setup(self):
+        import asyncio
+        import dns.asyncresolver
+
+        self._resolver = dns.asyncresolver.Resolver(configure=not self.nameservers)
+        if self.nameservers:
+            self._resolver.nameservers = list(self.nameservers)
+            self._resolver.port = self.port
+        self._resolver.lifetime = self.timeout
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    def resolve(self, name: str, rdtype: str = 'A') -> List[str]:
+        """Return every record of `rdtype` for a name (empty if none exist)."""
+        return self._loop.run(self.resolve_async(name, rdtype))
+
+    def resolve_many(self, names: Iterable[str], rdtype: str = 'A') -> List[List[str]]:
+        """Resolve many names concurrently; failures come back as empty lists."""
+        async def run(batch):
+            import asyncio
+
+            answers = await asyncio.gather(*(self.resolve_async(name, rdtype) for name in batch),
+                                           return_exceptions=True)
+            return [[] if isinstance(answer, BaseException) else answer for answer in answers]
+        return self._loop.run(run(list(names)))
+
+    def reverse(self, ip: str) -> Optional[str]:
+        """Return the PTR name for an address, without the trailing dot."""
+        import dns.reversename
+
+        try:
+            names = self.resolve(dns.reversename.from_address(ip).to_text(), 'PTR')
+        except Exception:
+            return None
+        return names[0].rstrip('.') if names else None
+
+    async def resolve_async(self, name: str, rdtype: str = 'A') -> List[str]:
+        import asyncio
+
+        key = (name.lower().rstrip('.'), rdtype)
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.cache_hits += 1
+            return cached[1]
+        if key in self._inflight:
+            return await asyncio.shield(self._inflight[key])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            answers, ttl = await self._query(key[0], rdtype)
+            self._store(key, answers, ttl)
+            future.set_result(answers)
+            return answers
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _query(self, name: str, rdtype: str) -> Tuple[List[str], float]:
+        import dns.resolver
+
+        async with self._semaphore:
+            self.queries += 1
+            try:
+                answer = await self._resolver.resolve(name, rdtype)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                return [], self.negative_ttl
+        return [rdata.to_text() for rdata in answer], answer.rrset.ttl
+
+    def _store(self, key: Tuple[str, str], answers: List[str], ttl: float):
+        if len(self._cache) >= self.max_entries:
+            # Drop expired entries first, then the oldest insertions
+            now = time.monotonic()
+            for stale in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                del self._cache[stale]
+            while len(self._cache) >= self.max_entries:
+                del self._cache[next(iter(self._cache))]
+        self._cache[key] = (time.monotonic() + ttl, answers)
+
+    def close(self):
+        self._loop.close()
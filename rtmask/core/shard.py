@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+from typing import Iterable, Iterator, Tuple, Union
+
+from .bulk import DEFAULT_CHUNK_SIZE, CIDRBatch, host_range
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse 'K/N' (shard K of N, counting from 1)."""
+    index, sep, count = value.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f"expected K/N, e.g. 3/16, not {value!r}")
+    if not sep or not 1 <= index <= count:
+        raise ValueError(f"expected K/N with 1 <= K <= N, not {value!r}")
+    return index, count
+
+
+def entry_size(entry: str) -> int:
+    """Number of targets an input entry expands to (1 for an IP, domain or bad CIDR)."""
+    if '/' not in entry:
+        return 1
+    try:
+        return len(host_range(entry))
+    except ValueError:
+        return 1
+
+
+def count_targets(entries: Iterable[str]) -> int:
+    return sum(entry_size(entry) for entry in entries)
+
+
+def shard_bounds(total: int, index: int, count: int) -> Tuple[int, int]:
+    """Positions [start, stop) of the targets that belong to shard `index` of `count`."""
+    return total * (index - 1) // count, total * index // count
+
+
+def shard_units(entries: Iterable[str], index: int, count: int, total: int,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Union[str, CIDRBatch]]:
+    """Yield the entries of one shard, and CIDRBatch parts of entries it splits.
+
+    Targets are numbered in input order, with every host of a CIDR entry
+    counting as one target, and shard K of N gets the K-th of N equal,
+    contiguous slices of that sequence. The partition depends only on the
+    input, so shards can run on different machines, and concatenating the
+    shard outputs in shard order gives the same rows in the same order as
+    an unsharded run. CIDR entries are split by integer range without
+    expanding the hosts outside the shard.
+    """
+    start, stop = shard_bounds(total, index, count)
+    position = 0
+    for entry in entries:
+        if position >= stop:
+            break
+        size = entry_size(entry)
+        if start <= position and position + size <= stop:
+            yield entry
+        elif position + size > start:
+            hosts = host_range(entry)[max(start - position, 0):min(stop - position, size)]
+            for first in range(hosts.start, hosts.stop, chunk_size):
+                yield CIDRBatch(first, min(first + chunk_size, hosts.stop))
+        position += size
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+import math
+import socket
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .bulk import DEFAULT_CHUNK_SIZE, CIDRBatch, _TYPECODE
+from .ip_converter import IPConversionResult, NetworkInfo
+
+# Row value of an interned column that holds no value
+_NONE = -1
+
+_INTERNED_FIELDS = ('domain', 'geolocation', 'whois_info', 'qr_code_path')
+
+
+class _Interner:
+    """Distinct values of one column, each stored once.
+
+    Values are matched by identity first (hosts of one network block share
+    the very same record object) and then by value, so equal records that
+    came from the cache or from separate lookups still collapse into one.
+    """
+
+    __slots__ = ('values', '_by_id', '_by_key')
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self._by_id: Dict[int, int] = {}
+        self._by_key: Dict[Any, int] = {}
+
+    def index(self, value: Any) -> int:
+        if value is None:
+            return _NONE
+        if isinstance(value, (str, tuple)):
+            # Hashed directly; an id entry would only add to the cost of a
+            # column of distinct names such as reverse DNS
+            index = self._by_key.get(value)
+            if index is None:
+                index = self._by_key[value] = len(self.values)
+                self.values.append(value)
+            return index
+        # Only stored values are keyed by id, which keeps the ids valid
+        index = self._by_id.get(id(value))
+        if index is not None:
+            return index
+        key = repr(value)
+        index = self._by_key.get(key)
+        if index is None:
+            index = len(self.values)
+            self.values.append(value)
+            self._by_id[id(value)] = index
+            self._by_key[key] = index
+        return index
+
+    def get(self, index: int) -> Any:
+        return None if index == _NONE else self.values[index]
+
+
+class ResultStore:
+    """Compact, append-only container for many conversion results.
+
+    Addresses are held as packed integers and the IPv6 address and URLs are
+    derived when a row is read. Domains, geolocation and WHOIS records and
+    QR code paths are interned, so every host of a network block points at
+    one shared record. Network checks are split into columns (reachable,
+    latency, interned reverse DNS name and port list). Enrichment columns
+    are only allocated once a row actually has a value, so a plain
+    conversion costs four bytes per host. A fully enriched host costs 37
+    bytes of columns plus the distinct values it adds, which in practice
+    are mostly reverse DNS names.
+
+    Rows are materialized one at a time on access; records shared between
+    rows are the same objects, so modifying one modifies it for every row.
+    """
+
+    def __init__(self, results: Iterable[Union[IPConversionResult, CIDRBatch]] = ()):
+        self._addresses = array(_TYPECODE)
+        self._columns: Dict[str, array] = {}
+        self._interned: Dict[str, _Interner] = {}
+        self._reachable: Optional[array] = None
+        self._latency: Optional[array] = None
+        self._checked: Optional[array] = None
+        self.extend(results)
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def __getitem__(self, index: int) -> IPConversionResult:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ResultStore index out of range")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[IPConversionResult]:
+        for index in range(len(self)):
+            yield self._row(index)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the per-row arrays (interned records not included)."""
+        arrays = [self._addresses, *self._columns.values(), self._reachable, self._latency, self._checked]
+        return sum(a.itemsize * len(a) for a in arrays if a is not None)
+
+    def records(self, field: str) -> List[Any]:
+        """The distinct values stored for an interned field."""
+        interner = self._interned.get(field)
+        return list(interner.values) if interner else []
+
+    def append(self, result: IPConversionResult):
+        row = len(self._addresses)
+        self._addresses.append(int.from_bytes(socket.inet_aton(result.ipv4), 'big'))
+        for field in _INTERNED_FIELDS:
+            self._set(field, row, getattr(result, field))
+        self._set_network(row, result.network_info)
+
+    def extend(self, items: Iterable[Union[IPConversionResult, CIDRBatch]]):
+        for item in items:
+            if isinstance(item, CIDRBatch):
+                self._extend_range(item.start, item.stop)
+            elif isinstance(item, ResultStore):
+                for result in item:
+                    self.append(result)
+            else:
+                self.append(item)
+
+    def iter_items(self) -> Iterator[Union[IPConversionResult, CIDRBatch]]:
+        """Yield runs of consecutive unenriched hosts as CIDRBatch, other rows as results.
+
+        Writers have fast paths for batches, so a store holding a bulk
+        conversion is written without building an object per host. Runs
+        are split into batches of at most DEFAULT_CHUNK_SIZE hosts.
+        """
+        addresses = self._addresses
+        plain = self._plain_rows()
+        run_start = None
+        for index, address in enumerate(addresses):
+            if run_start is not None and (not plain[index] or address != addresses[index - 1] + 1
+                                          or index - run_start >= DEFAULT_CHUNK_SIZE):
+                yield CIDRBatch(addresses[run_start], addresses[index - 1] + 1)
+                run_start = None
+            if not plain[index]:
+                yield self._row(index)
+            elif run_start is None:
+                run_start = index
+        if run_start is not None:
+            yield CIDRBatch(addresses[run_start], addresses[-1] + 1)
+
+    def _extend_range(self, start: int, stop: int):
+        row = len(self._addresses)
+        self._addresses.extend(range(start, stop))
+        self._pad(row, stop - start)
+
+    def _pad(self, row: int, count: int):
+        for column in self._columns.values():
+            column.extend(array(column.typecode, [_NONE]) * count)
+        if self._reachable is not None:
+            self._reachable.extend(array('b', [_NONE]) * count)
+            self._latency.extend(array('d', [math.nan]) * count)
+            self._checked.extend(array('d', [math.nan]) * count)
+
+    def _column(self, field: str, row: int) -> array:
+        """Return the index column for a field, creating it for `row` rows."""
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = array('i', [_NONE]) * row
+            self._interned[field] = _Interner()
+        return column
+
+    def _set(self, field: str, row: int, value: Any):
+        column = self._columns.get(field)
+        if value is None:
+            if column is not None:
+                column.append(_NONE)
+            return
+        if column is None:
+            column = self._column(field, row)
+        column.append(self._interned[field].index(value))
+
+    def _set_network(self, row: int, info: Optional[NetworkInfo]):
+        if info is None and self._reachable is None:
+            return
+        if self._reachable is None:
+            self._reachable = array('b', [_NONE]) * row
+            self._latency = array('d', [math.nan]) * row
+            self._checked = array('d', [math.nan]) * row
+            for field in ('reverse_dns', 'open_ports'):
+                self._column(field, row)
+        if info is None:
+            self._reachable.append(_NONE)
+            self._latency.append(math.nan)
+            self._checked.append(math.nan)
+            self._columns['reverse_dns'].append(_NONE)
+            self._columns['open_ports'].append(_NONE)
+            return
+        self._reachable.append(1 if info.is_reachable else 0)
+        self._latency.append(math.nan if info.latency_ms is None else info.latency_ms)
+        self._checked.append(math.nan if info.checked_at is None else info.checked_at)
+        self._columns['reverse_dns'].append(self._interned['reverse_dns'].index(info.reverse_dns))
+        self._columns['open_ports'].append(self._interned['open_ports'].index(tuple(info.open_ports)))
+
+    def _plain_rows(self) -> bytearray:
+        """1 for every row without a domain or any enrichment, else 0."""
+        plain = bytearray(b'\x01') * len(self)
+        columns = [self._columns[field] for field in _INTERNED_FIELDS if field in self._columns]
+        if self._reachable is not None:
+            columns.append(self._reachable)
+        for column in columns:
+            for index, value in enumerate(column):
+                if value != _NONE:
+                    plain[index] = 0
+        return plain
+
+    def _value(self, field: str, index: int) -> Any:
+        column = self._columns.get(field)
+        return None if column is None else self._interned[field].get(column[index])
+
+    def _network(self, index: int) -> Optional[NetworkInfo]:
+        if self._reachable is None or self._reachable[index] == _NONE:
+            return None
+        latency = self._latency[index]
+        checked = self._checked[index]
+        return NetworkInfo(
+            is_reachable=bool(self._reachable[index]),
+            latency_ms=None if math.isnan(latency) else latency,
+            reverse_dns=self._value('reverse_dns', index),
+            open_ports=list(self._value('open_ports', index) or ()),
+            checked_at=None if math.isnan(checked) else checked
+        )
+
+    def _row(self, index: int) -> IPConversionResult:
+        ipv4, ipv6 = _addresses(self._addresses[index])
+        return IPConversionResult(
+            ipv4=ipv4,
+            ipv6=ipv6,
+            url_nossl=f"http://[{ipv6}]",
+            url_ssl=f"https://[{ipv6}]",
+            domain=self._value('domain', index),
+            geolocation=self._value('geolocation', index),
+            whois_info=self._value('whois_info', index),
+            network_info=self._network(index),
+            qr_code_path=self._value('qr_code_path', index)
+        )
+
+
+def _addresses(n: int) -> Tuple[str, str]:
+    """Return the dotted IPv4 and IPv4-mapped IPv6 forms of an integer address."""
+    ipv4 = f"{n >> 24}.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+    return ipv4, f"::ffff:{n >> 16:04x}:{n & 0xffff:04x}"
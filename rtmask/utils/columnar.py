@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+
+# Packed columnar result files (.rtm)
+#
+#   file   = MAGIC, group*, footer, footer_length (u64), MAGIC
+#   group  = one packed array per column present in the group, each
+#            starting at a multiple of 8 bytes
+#   footer = UTF-8 JSON: {"format", "version", "rows", "columns": {name: type},
+#            "groups": [{"rows", "columns": {name: offset}}],
+#            "dictionaries": {name: [value, ...]}}
+#
+# All numbers are little-endian. Types are u32, i32, i8 and f64. Addresses
+# are IPv4 addresses as u32; the IPv6 form and the URLs are derived from
+# them when rows are read. Domains, geolocation and WHOIS records, reverse
+# DNS names, open port lists and QR code paths are dictionary-encoded: the
+# column holds an i32 index into the field's dictionary in the footer (the
+# records in their JSON output form), -1 for no value. `reachable` is i8
+# (1, 0, -1 for not checked); `latency_ms` and `network_checked_at` (Unix
+# time of the network check) are f64 (NaN for none). A
+# column missing from a group holds no value for any of its rows, so a
+# plain conversion costs four bytes per host.
+
+import json
+import math
+import mmap
+import socket
+import sys
+from array import array
+from bisect import bisect_right
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from ..core.bulk import CIDRBatch
+from ..core.ip_converter import GeoLocation, IPConversionResult, NetworkInfo, WhoisInfo
+from ..core.metrics import Metrics
+from ..core.store import _NONE, _Interner, _addresses
+from .writers import DEFAULT_FLUSH_EVERY, ResultWriter
+
+MAGIC = b'RTMCOL01'
+FORMAT_VERSION = 1
+
+# Rows buffered in memory before a group is written
+DEFAULT_GROUP_ROWS = 1 << 16
+
+_ALIGN = 8
+_LENGTH_BYTES = 8
+
+_TYPECODES = {'u32': 'I', 'i32': 'i', 'i8': 'b', 'f64': 'd'}
+
+COLUMNS = {
+    'address': 'u32',
+    'domain': 'i32',
+    'geolocation': 'i32',
+    'whois_info': 'i32',
+    'reachable': 'i8',
+    'latency_ms': 'f64',
+    'network_checked_at': 'f64',
+    'reverse_dns': 'i32',
+    'open_ports': 'i32',
+    'qr_code_path': 'i32',
+}
+
+DICTIONARY_FIELDS = ('domain', 'geolocation', 'whois_info', 'reverse_dns', 'open_ports', 'qr_code_path')
+
+_RECORD_TYPES = {'geolocation': GeoLocation, 'whois_info': WhoisInfo}
+
+
+def _missing(column: str):
+    return math.nan if COLUMNS[column] == 'f64' else _NONE
+
+
+class ColumnarWriter(ResultWriter):
+    """Results as a packed columnar file; see the layout at the top of this module.
+
+    Rows are buffered as arrays and written a group of `group_rows` at a
+    time, so memory depends on the group size and the number of distinct
+    dictionary values, not on the number of rows. The footer is written on
+    close.
+    """
+
+    def __init__(self, path: Union[str, Path], group_rows: int = DEFAULT_GROUP_ROWS,
+                 flush_every: int = DEFAULT_FLUSH_EVERY, metrics: Optional[Metrics] = None):
+        super().__init__(path, flush_every, metrics)
+        self.group_rows = group_rows
+        self._dictionaries = {field: _Interner() for field in DICTIONARY_FIELDS}
+        self._groups: List[Dict[str, Any]] = []
+        self._offset = 0
+        self._reset()
+
+    def _reset(self):
+        self._rows = 0
+        self._columns: Dict[str, array] = {'address': array(_TYPECODES['u32'])}
+
+    def open(self):
+        self._file = self.path.open('wb')
+        self._write_header()
+
+    def _write_header(self):
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+
+    def _column(self, name: str) -> array:
+        """The buffer for a column, created and padded on first use in a group."""
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = array(_TYPECODES[COLUMNS[name]], [_missing(name)]) * self._rows
+        return column
+
+    def _write_result(self, result: IPConversionResult):
+        values = {field: getattr(result, field) for field in ('domain', 'geolocation', 'whois_info', 'qr_code_path')}
+        info = result.network_info
+        if info is not None:
+            values['reachable'] = 1 if info.is_reachable else 0
+            values['latency_ms'] = math.nan if info.latency_ms is None else info.latency_ms
+            values['network_checked_at'] = math.nan if info.checked_at is None else info.checked_at
+            values['reverse_dns'] = info.reverse_dns
+            values['open_ports'] = tuple(info.open_ports)
+        for name, value in values.items():
+            if value is None:
+                continue
+            if name in self._dictionaries:
+                value = self._dictionaries[name].index(value)
+            self._column(name).append(value)
+        self._columns['address'].append(int.from_bytes(socket.inet_aton(result.ipv4), 'big'))
+        self._rows += 1
+        # Columns this row has no value for
+        for name, column in self._columns.items():
+            if len(column) < self._rows:
+                column.append(_missing(name))
+        if self._rows >= self.group_rows:
+            self._write_group()
+
+    def _write_batch(self, batch: CIDRBatch):
+        start = batch.start
+        while start < batch.stop:
+            stop = min(batch.stop, start + self.group_rows - self._rows)
+            self._columns['address'].extend(range(start, stop))
+            for name, column in self._columns.items():
+                if name != 'address':
+                    column.extend(array(column.typecode, [_missing(name)]) * (stop - start))
+            self._rows += stop - start
+            if self._rows >= self.group_rows:
+                self._write_group()
+            start = stop
+
+    def _write_group(self):
+        if not self._rows:
+            return
+        offsets = {}
+        for name in COLUMNS:
+            column = self._columns.get(name)
+            if column is None:
+                continue
+            if sys.byteorder != 'little':
+                column.byteswap()
+            offsets[name] = self._offset
+            data = column.tobytes()
+            self._file.write(data)
+            padding = -len(data) % _ALIGN
+            self._file.write(b'\0' * padding)
+            self._offset += len(data) + padding
+        self._groups.append({'rows': self._rows, 'columns': offsets})
+        self._reset()
+
+    def _write_footer(self):
+        self._write_group()
+        dictionaries = {}
+        for field, interner in self._dictionaries.items():
+            values = interner.values
+            if field in _RECORD_TYPES:
+                values = [asdict(value) for value in values]
+            dictionaries[field] = values
+        footer = json.dumps({
+            'format': 'rtmask-columnar',
+            'version': FORMAT_VERSION,
+            'rows': self.count,
+            'columns': COLUMNS,
+            'groups': self._groups,
+            'dictionaries': dictionaries,
+        }, separators=(',', ':')).encode()
+        self._file.write(footer)
+        self._file.write(len(footer).to_bytes(_LENGTH_BYTES, 'little'))
+        self._file.write(MAGIC)
+
+
+class ColumnarReader:
+    """Memory-mapped reader for .rtm files.
+
+    Opening a file reads only its footer; columns are typed views of the
+    mapped file, so scanning them does no parsing and pages are loaded by
+    the OS as they are touched. where() evaluates a condition once per
+    dictionary value and then only compares integers.
+
+        with ColumnarReader('sweep.rtm') as reader:
+            for row in reader.where('geolocation', lambda geo: geo.country == 'Germany'):
+                print(reader[row].ipv4)
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{self.path} is not an RT-MASK columnar file")
+        self._views: Dict[tuple, Union[memoryview, array]] = {}
+        try:
+            self._read_footer()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self) -> 'ColumnarReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_footer(self):
+        data = self._map
+        tail = len(MAGIC) + _LENGTH_BYTES
+        if len(data) < len(MAGIC) + tail or data[:len(MAGIC)] != MAGIC or data[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"{self.path} is not a complete RT-MASK columnar file")
+        length = int.from_bytes(data[-tail:-len(MAGIC)], 'little')
+        footer = json.loads(data[-tail - length:-tail])
+        if footer.get('version') != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has unsupported version {footer.get('version')}")
+        self.rows = footer['rows']
+        self.columns = footer['columns']
+        self._groups = footer['groups']
+        self._starts = []
+        position = 0
+        for group in self._groups:
+            self._starts.append(position)
+            position += group['rows']
+        self._dictionaries: Dict[str, List[Any]] = {}
+        self._raw_dictionaries = footer['dictionaries']
+
+    def close(self):
+        for view in self._views.values():
+            if isinstance(view, memoryview):
+                view.release()
+        self._views = {}
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def dictionary(self, field: str) -> List[Any]:
+        """The distinct values of a dictionary-encoded field, in index order."""
+        if field not in self._dictionaries:
+            values = self._raw_dictionaries.get(field, [])
+            if field in _RECORD_TYPES:
+                values = [_RECORD_TYPES[field](**value) for value in values]
+            elif field == 'open_ports':
+                values = [list(value) for value in values]
+            self._dictionaries[field] = values
+        return self._dictionaries[field]
+
+    def _group_column(self, group: int, name: str) -> Optional[Union[memoryview, array]]:
+        """A typed view of one column of one group; None if the group has no values for it."""
+        offset = self._groups[group]['columns'].get(name)
+        if offset is None:
+            return None
+        view = self._views.get((group, name))
+        if view is None:
+            typecode = _TYPECODES[self.columns[name]]
+            data = memoryview(self._map)[offset:offset + array(typecode).itemsize * self._groups[group]['rows']]
+            if sys.byteorder == 'little':
+                view = data.cast(typecode)
+            else:
+                view = array(typecode, data.tobytes())
+                view.byteswap()
+            data.release()
+            self._views[group, name] = view
+        return view
+
+    def column(self, name: str) -> Iterator[Union[int, float]]:
+        """Raw values of a column in row order (dictionary indexes for dictionary fields)."""
+        if name not in self.columns:
+            raise ValueError(f"Unknown column: {name}")
+        for group in range(len(self._groups)):
+            values = self._group_column(group, name)
+            if values is None:
+                missing = _missing(name)
+                for _ in range(self._groups[group]['rows']):
+                    yield missing
+            else:
+                yield from values
+
+    def where(self, field: str, predicate: Callable[[Any], bool]) -> Iterator[int]:
+        """Indexes of the rows whose `field` value satisfies predicate (rows without a value never do)."""
+        if field not in DICTIONARY_FIELDS:
+            raise ValueError(f"where() works on dictionary fields: {', '.join(DICTIONARY_FIELDS)}")
+        wanted = {index for index, value in enumerate(self.dictionary(field)) if predicate(value)}
+        if not wanted:
+            return
+        for group, start in enumerate(self._starts):
+            values = self._group_column(group, field)
+            if values is None:
+                continue
+            for row, value in enumerate(values):
+                if value in wanted:
+                    yield start + row
+
+    def __getitem__(self, index: int) -> IPConversionResult:
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError("ColumnarReader index out of range")
+        group = bisect_right(self._starts, index) - 1
+        return self._row({name: self._group_column(group, name) for name in self._groups[group]['columns']},
+                         index - self._starts[group])
+
+    def __iter__(self) -> Iterator[IPConversionResult]:
+        for group in range(len(self._groups)):
+            columns = {name: self._group_column(group, name) for name in self._groups[group]['columns']}
+            for row in range(self._groups[group]['rows']):
+                yield self._row(columns, row)
+
+    def _row(self, columns: Dict[str, Any], row: int) -> IPConversionResult:
+        def value(field: str) -> Any:
+            column = columns.get(field)
+            index = _NONE if column is None else column[row]
+            return None if index == _NONE else self.dictionary(field)[index]
+
+        network_info = None
+        reachable = columns.get('reachable')
+        if reachable is not None and reachable[row] != _NONE:
+            latency = columns['latency_ms'][row]
+            checked = columns['network_checked_at'][row] if 'network_checked_at' in columns else math.nan
+            network_info = NetworkInfo(
+                is_reachable=bool(reachable[row]),
+                latency_ms=None if math.isnan(latency) else latency,
+                reverse_dns=value('reverse_dns'),
+                open_ports=list(value('open_ports') or ()),
+                checked_at=None if math.isnan(checked) else checked
+            )
+        ipv4, ipv6 = _addresses(columns['address'][row])
+        return IPConversionResult(
+            ipv4=ipv4,
+            ipv6=ipv6,
+            url_nossl=f"http://[{ipv6}]",
+            url_ssl=f"https://[{ipv6}]",
+            domain=value('domain'),
+            geolocation=value('geolocation'),
+            whois_info=value('whois_info'),
+            network_info=network_info,
+            qr_code_path=value('qr_code_path')
+        )
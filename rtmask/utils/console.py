@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+import logging
+import sys
+import threading
+import time
+from typing import IO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..core.bulk import CIDRBatch
+from ..core.ip_converter import IPConversionResult
+from ..core.metrics import Metrics
+
+# Seconds between redraws of the progress line and flushes of the table
+DEFAULT_REFRESH_INTERVAL = 0.1
+
+# Lines buffered by the table before it flushes regardless of the interval
+DEFAULT_MAX_BUFFERED = 10000
+
+# Stages whose errors are not worth a place on the progress line
+_QUIET_STAGES = ('write', 'other')
+
+
+def _location(r: IPConversionResult) -> str:
+    return f"{r.geolocation.city}, {r.geolocation.country}" if r.geolocation else ''
+
+
+def _reachable(r: IPConversionResult) -> str:
+    if not r.network_info:
+        return ''
+    return 'yes' if r.network_info.is_reachable else 'no'
+
+
+def _latency(r: IPConversionResult) -> str:
+    return f"{r.network_info.latency_ms:.2f} ms" if r.network_info and r.network_info.latency_ms else ''
+
+
+def _registrar(r: IPConversionResult) -> str:
+    return r.whois_info.registrar or '' if r.whois_info else ''
+
+
+# (header, width, value) of every column; enrichment columns are only
+# shown when their stage was requested
+BASE_COLUMNS = [
+    ('IPv4', 15, lambda r: r.ipv4),
+    ('IPv6', 16, lambda r: r.ipv6),
+    ('Domain', 28, lambda r: r.domain or ''),
+]
+ENRICHMENT_COLUMNS = {
+    'geo': [('Location', 26, _location)],
+    'network': [('Reachable', 9, _reachable), ('Latency', 10, _latency)],
+    'whois': [('Registrar', 28, _registrar)],
+}
+
+
+def _fit(value: str, width: int) -> str:
+    return value if len(value) <= width else value[:width - 1] + '~'
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def count_rows(item: Union[IPConversionResult, CIDRBatch]) -> int:
+    return 1 if isinstance(item, IPConversionResult) else len(item)
+
+
+class ProgressBar:
+    """A live progress line on stderr: rows done, rate, ETA and stage errors.
+
+    A background thread redraws the line every `interval` seconds, so the
+    rate, ETA and the error counts read from `metrics` keep moving while
+    slow enrichments hold results back. Anything else printed while the
+    bar is shown goes through write(), which clears the line first and
+    draws it again afterwards. While the bar is shown, sys.stderr and the
+    log handlers of the RT-MASK logger print through write() as well.
+    Without a `total` the line shows the count and rate only.
+    """
+
+    def __init__(self, total: Optional[int] = None, metrics: Optional[Metrics] = None,
+                 stream: Optional[IO[str]] = None, interval: float = DEFAULT_REFRESH_INTERVAL,
+                 width: int = 30):
+        self.total = total
+        self.metrics = metrics
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.width = width
+        self.done = 0
+        self.started = time.monotonic()
+        self._lock = threading.RLock()
+        self._shown = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._handlers: List[Tuple[logging.StreamHandler, IO[str]]] = []
+        self._stderr: Optional[IO[str]] = None
+
+    def __enter__(self) -> 'ProgressBar':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self):
+        self.started = time.monotonic()
+        # Messages and log records are printed above the bar instead of through it
+        if self.stream is sys.stderr:
+            self._stderr, sys.stderr = sys.stderr, _Above(self)
+        for handler in logging.getLogger('RT-MASK').handlers:
+            if isinstance(handler, logging.StreamHandler) and handler.stream is self.stream:
+                self._handlers.append((handler, handler.setStream(_Above(self))))
+        self._thread = threading.Thread(target=self._refresh, name='rtmask-progress', daemon=True)
+        self._thread.start()
+
+    def _refresh(self):
+        while not self._stop.wait(self.interval):
+            self.draw()
+
+    def track(self, results: Iterable[Union[IPConversionResult, CIDRBatch]], close: bool = False
+              ) -> Iterator[Union[IPConversionResult, CIDRBatch]]:
+        """Pass results through, counting their rows; with `close`, close the bar after the last one."""
+        for item in results:
+            self.done += count_rows(item)
+            yield item
+        if close:
+            self.close()
+
+    def errors(self) -> str:
+        """Error and timeout counts of the stages that had any, e.g. 'errors geo 3, whois 1'."""
+        if self.metrics is None:
+            return ''
+        stages = {name: stats for name, stats in self.metrics.snapshot()['stages'].items()
+                  if name not in _QUIET_STAGES}
+        parts = []
+        for counter in ('errors', 'timeouts'):
+            counts = ', '.join(f"{name} {stats[counter]}" for name, stats in stages.items() if stats[counter])
+            if counts:
+                parts.append(f"{counter} {counts}")
+        return '; '.join(parts)
+
+    def render(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        if self.total:
+            fraction = min(self.done / self.total, 1.0)
+            filled = int(fraction * self.width)
+            line = (f"[{'#' * filled}{'.' * (self.width - filled)}] {self.done}/{self.total} "
+                    f"{fraction * 100:5.1f}% {rate:,.0f}/s")
+            remaining = self.total - self.done
+            if rate and remaining > 0:
+                line += f" ETA {_duration(remaining / rate)}"
+        else:
+            line = f"{self.done} results {rate:,.0f}/s"
+        line += f" elapsed {_duration(elapsed)}"
+        errors = self.errors()
+        return f"{line} | {errors}" if errors else line
+
+    def draw(self):
+        with self._lock:
+            self.stream.write('\r\033[K' + self.render())
+            self.stream.flush()
+            self._shown = True
+
+    def clear(self):
+        with self._lock:
+            if self._shown:
+                self.stream.write('\r\033[K')
+                self.stream.flush()
+                self._shown = False
+
+    def write(self, text: str, stream: Optional[IO[str]] = None):
+        """Print `text` to `stream` (stdout by default) without tearing the bar."""
+        with self._lock:
+            self.clear()
+            stream = stream or sys.stdout
+            stream.write(text)
+            stream.flush()
+
+    def close(self):
+        """Stop the refresh thread and leave the final state of the bar on its own line."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        for handler, stream in self._handlers:
+            handler.setStream(stream)
+        self._handlers = []
+        if self._stderr is not None:
+            sys.stderr, self._stderr = self._stderr, None
+        with self._lock:
+            self.draw()
+            self.stream.write('\n')
+            self.stream.flush()
+            self._shown = False
+
+
+class _Above:
+    """File-like stream that prints above a progress bar (stands in for stderr)."""
+
+    def __init__(self, progress: ProgressBar):
+        self.progress = progress
+
+    def write(self, text: str):
+        self.progress.write(text, self.progress.stream)
+
+    def flush(self):
+        pass
+
+    def __getattr__(self, name: str):
+        return getattr(self.progress.stream, name)
+
+
+class ConsoleTable:
+    """Print results as one streaming, column-aligned table.
+
+    The header is printed once, and every result becomes a single line of
+    fixed-width columns (long values are cut and end in '~'), so the
+    table can be printed before its last row is known. CIDR batches are
+    formatted from their address columns without creating a result
+    object per host. Lines are buffered and written in one call at most
+    every `interval` seconds (or every `max_buffered` lines), which keeps
+    the terminal from becoming the bottleneck of a large run. Columns for
+    the geo, network and whois enrichments are shown when requested.
+    """
+
+    def __init__(self, enrichments: Iterable[str] = (), stream: Optional[IO[str]] = None,
+                 progress: Optional[ProgressBar] = None, interval: float = DEFAULT_REFRESH_INTERVAL,
+                 max_buffered: int = DEFAULT_MAX_BUFFERED, metrics: Optional[Metrics] = None):
+        self.stream = stream or sys.stdout
+        self.progress = progress
+        self.interval = interval
+        self.max_buffered = max_buffered
+        self.metrics = metrics
+        self.columns = list(BASE_COLUMNS)
+        for name in enrichments:
+            self.columns.extend(ENRICHMENT_COLUMNS.get(name, []))
+        self.count = 0
+        self._lines: List[str] = []
+        self._flushed = time.monotonic()
+        self._header = False
+
+    def __enter__(self) -> 'ConsoleTable':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _line(self, values: Iterable[str]) -> str:
+        return '  '.join(_fit(value, width).ljust(width)
+                         for value, (_, width, _) in zip(values, self.columns)).rstrip()
+
+    def write(self, item: Union[IPConversionResult, CIDRBatch]):
+        if not self._header:
+            rule = '-' * (sum(width for _, width, _ in self.columns) + 2 * (len(self.columns) - 1))
+            self._lines += [self._line(name for name, _, _ in self.columns), rule]
+            self._header = True
+        if isinstance(item, CIDRBatch):
+            # Hosts of a batch have no domain or enrichments
+            self._lines.extend(f"{ipv4:<15}  {ipv6}" for ipv4, ipv6 in zip(item.ipv4, item.ipv6))
+        else:
+            self._lines.append(self._line(value(item) for _, _, value in self.columns))
+        self.count += count_rows(item)
+        if len(self._lines) >= self.max_buffered or time.monotonic() - self._flushed >= self.interval:
+            self.flush()
+
+    def write_many(self, results: Iterable[Union[IPConversionResult, CIDRBatch]]) -> int:
+        for item in results:
+            self.write(item)
+        return self.count
+
+    def flush(self):
+        self._flushed = time.monotonic()
+        if not self._lines:
+            return
+        text = '\n'.join(self._lines) + '\n'
+        self._lines = []
+        if self.metrics:
+            with self.metrics.timer('write'):
+                self._emit(text)
+        else:
+            self._emit(text)
+
+    def _emit(self, text: str):
+        if self.progress:
+            self.progress.write(text, self.stream)
+        else:
+            self.stream.write(text)
+            self.stream.flush()
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, List, TextIO, Union
+
+from ..core.ip_converter import IPConversionResult, result_from_dict
+
+# Formats whose files can be joined byte for byte (CSV after dropping the
+# header of every file but the first)
+CONCATENABLE = ('jsonl', 'csv')
+
+
+def shard_order(paths: Iterable[Union[str, Path]]) -> List[Path]:
+    """Sort paths with numbers compared by value, so shard-10 follows shard-9."""
+    def key(path: Path):
+        return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', str(path))]
+    return sorted((Path(path) for path in paths), key=key)
+
+
+def read_results(path: Union[str, Path]) -> Iterator[IPConversionResult]:
+    """Read back the results of a JSON, JSON Lines or columnar output file."""
+    path = Path(path)
+    if path.suffix == '.rtm':
+        from .columnar import ColumnarReader
+        with ColumnarReader(path) as reader:
+            yield from reader
+    elif path.suffix == '.jsonl':
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    yield result_from_dict(json.loads(line))
+    elif path.suffix == '.json':
+        with open(path) as f:
+            data = json.load(f)
+        for item in data if isinstance(data, list) else [data]:
+            yield result_from_dict(item)
+    elif path.suffix == '.csv':
+        raise ValueError(f"Cannot read results from {path}; CSV shard outputs can only be merged into a CSV output")
+    else:
+        raise ValueError(f"Cannot read results from {path}; write shard outputs as .jsonl, .json or .rtm")
+
+
+def concatenate(paths: Iterable[Union[str, Path]], output: Union[str, Path], fmt: str) -> int:
+    """Join JSON Lines or CSV files into one without parsing them; return the row count."""
+    rows = 0
+    with open(output, 'w', newline='') as out:
+        for i, path in enumerate(paths):
+            with open(path, newline='') as f:
+                if fmt == 'csv':
+                    header = f.readline()
+                    if i == 0:
+                        out.write(header)
+                    # A quoted field may span lines, so rows are counted by the CSV reader
+                    rows += sum(1 for _ in csv.reader(_copy_lines(f, out)))
+                else:
+                    for line in _copy_lines(f, out):
+                        rows += bool(line.strip())
+    return rows
+
+
+def _copy_lines(lines: Iterable[str], out: TextIO) -> Iterator[str]:
+    for line in lines:
+        out.write(line)
+        yield line
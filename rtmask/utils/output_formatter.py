@@ -1,26 +1,58 @@
 #!/usr/bin/env python3
 
-import json
-from typing import List, Union
+from typing import Iterable, List, Optional, Union, TYPE_CHECKING
 from pathlib import Path
-from datetime import datetime
-from jinja2 import Environment, FileSystemLoader
-from rich.console import Console
-from rich.table import Table
 from ..core.ip_converter import IPConversionResult
+from ..core.bulk import CIDRBatch
+from ..core.metrics import Metrics
+from .merge import CONCATENABLE, concatenate, read_results, shard_order
+from .writers import DEFAULT_PAGE_SIZE, HTMLWriter, PagedHTMLWriter, ResultWriter, WRITERS, result_to_dict
+
+if TYPE_CHECKING:
+    from jinja2 import Environment
+    from rich.console import Console
+
+_SAVED_LABELS = {
+    'json': 'Results',
+    'jsonl': 'Results',
+    'html': 'HTML report',
+    'html-pages': 'HTML report',
+    'csv': 'CSV file',
+    'rtm': 'Columnar file',
+}
 
 class OutputFormatter:
-    def __init__(self, output_dir: str = None):
+    def __init__(self, output_dir: str = None, metrics: Optional[Metrics] = None,
+                 page_size: int = DEFAULT_PAGE_SIZE):
         self.output_dir = Path(output_dir) if output_dir else Path.cwd()
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.console = Console()
-        
-        # Setup Jinja2 environment
-        template_dir = Path(__file__).parent.parent / 'templates'
-        self.jinja_env = Environment(loader=FileSystemLoader(str(template_dir)))
+        self.metrics = metrics
+        self.page_size = page_size
+        # rich and Jinja2 are only imported by the outputs that use them
+        self._console = None
+        self._jinja_env = None
+
+    @property
+    def console(self) -> 'Console':
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console()
+        return self._console
+
+    @property
+    def jinja_env(self) -> 'Environment':
+        if self._jinja_env is None:
+            from jinja2 import Environment, FileSystemLoader
+
+            template_dir = Path(__file__).parent.parent / 'templates'
+            self._jinja_env = Environment(loader=FileSystemLoader(str(template_dir)), autoescape=True)
+        return self._jinja_env
 
     def print_result(self, result: IPConversionResult):
         """Print a single result to console with rich formatting."""
+        from rich.table import Table
+
         # Create main table
         table = Table(title=f"IP Conversion Result {'(' + result.domain + ')' if result.domain else ''}")
         
@@ -63,93 +95,78 @@ class OutputFormatter:
         self.console.print(table)
         self.console.print()
 
-    def save_json(self, results: Union[IPConversionResult, List[IPConversionResult]], filename: str):
+    def print_plain(self, result: IPConversionResult):
+        """Print a result as one tab-separated line, without rich."""
+        print('\t'.join([result.ipv4, result.ipv6, result.url_nossl, result.url_ssl, result.domain or '']))
+
+    def open_writer(self, fmt: str, filename: str) -> ResultWriter:
+        """Create an incremental writer for `fmt` ('json', 'jsonl', 'csv', 'html', 'html-pages' or 'rtm')."""
+        output_file = self.output_dir / filename
+        if fmt == 'html':
+            return HTMLWriter(output_file, self.jinja_env, metrics=self.metrics)
+        if fmt == 'html-pages':
+            return PagedHTMLWriter(output_file, self.jinja_env, self.page_size, metrics=self.metrics)
+        if fmt == 'rtm':
+            from .columnar import ColumnarWriter
+            return ColumnarWriter(output_file, metrics=self.metrics)
+        if fmt not in WRITERS:
+            raise ValueError(f"Unsupported output format: {fmt}")
+        return WRITERS[fmt](output_file, metrics=self.metrics)
+
+    def stream(self, results: Iterable[Union[IPConversionResult, CIDRBatch]], fmt: str, filename: str) -> int:
+        """Write results to disk as they are produced and return the row count.
+
+        The file is closed properly even if producing results is
+        interrupted, so a partial run still leaves a readable file.
+        """
+        writer = self.open_writer(fmt, filename)
+        try:
+            with writer:
+                writer.write_many(results)
+        finally:
+            self.console.print(f"{_SAVED_LABELS.get(fmt, 'Results')} saved to [cyan]{writer.path}[/cyan]")
+        return writer.count
+
+    def merge(self, paths: Iterable[Union[str, Path]], fmt: str, filename: str) -> int:
+        """Combine shard outputs, in shard order, into one file and return the row count.
+
+        JSON Lines and CSV shards are joined as they are when the output has
+        the same format; otherwise the shards must be JSON or JSON Lines and
+        their results are written through the writer for `fmt`.
+        """
+        paths = shard_order(paths)
+        if fmt in CONCATENABLE and all(path.suffix == f'.{fmt}' for path in paths):
+            output_file = self.output_dir / filename
+            count = concatenate(paths, output_file, fmt)
+            self.console.print(f"{_SAVED_LABELS.get(fmt, 'Results')} saved to [cyan]{output_file}[/cyan]")
+            return count
+        return self.stream((result for path in paths for result in read_results(path)), fmt, filename)
+
+    def save_json(self, results: Union[IPConversionResult, List[Union[IPConversionResult, CIDRBatch]]], filename: str):
         """Save results to a JSON file."""
         if isinstance(results, IPConversionResult):
             results = [results]
-        
-        output_file = self.output_dir / filename
-        with output_file.open('w') as f:
-            json.dump([self._result_to_dict(r) for r in results], f, indent=2)
-        
-        self.console.print(f"Results saved to [cyan]{output_file}[/cyan]")
+        self.stream(results, 'json', filename)
+
+    def save_jsonl(self, results: Union[IPConversionResult, List[Union[IPConversionResult, CIDRBatch]]], filename: str):
+        """Save results to a JSON Lines file."""
+        if isinstance(results, IPConversionResult):
+            results = [results]
+        self.stream(results, 'jsonl', filename)
 
-    def save_html(self, results: Union[IPConversionResult, List[IPConversionResult]], filename: str):
+    def save_html(self, results: Union[IPConversionResult, List[Union[IPConversionResult, CIDRBatch]]], filename: str):
         """Save results to an HTML file with a modern, responsive design."""
         if isinstance(results, IPConversionResult):
             results = [results]
-        
-        template = self.jinja_env.get_template('report.html')
-        html_content = template.render(
-            results=results,
-            generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            total_results=len(results)
-        )
-        
-        output_file = self.output_dir / filename
-        output_file.write_text(html_content)
-        
-        self.console.print(f"HTML report saved to [cyan]{output_file}[/cyan]")
+        self.stream(results, 'html', filename)
 
-    def save_csv(self, results: Union[IPConversionResult, List[IPConversionResult]], filename: str):
+    def save_csv(self, results: Union[IPConversionResult, List[Union[IPConversionResult, CIDRBatch]]], filename: str):
         """Save results to a CSV file."""
         if isinstance(results, IPConversionResult):
             results = [results]
-        
-        output_file = self.output_dir / filename
-        with output_file.open('w') as f:
-            # Write header
-            f.write("IPv4,IPv6,URL (no SSL),URL (SSL),Domain,Country,City,Latitude,Longitude,Timezone,Reachable,Latency (ms),Reverse DNS\n")
-            
-            # Write data
-            for r in results:
-                row = [
-                    r.ipv4,
-                    r.ipv6,
-                    r.url_nossl,
-                    r.url_ssl,
-                    r.domain or '',
-                    r.geolocation.country if r.geolocation else '',
-                    r.geolocation.city if r.geolocation else '',
-                    str(r.geolocation.latitude) if r.geolocation else '',
-                    str(r.geolocation.longitude) if r.geolocation else '',
-                    r.geolocation.timezone if r.geolocation else '',
-                    str(r.network_info.is_reachable) if r.network_info else '',
-                    str(r.network_info.latency_ms) if r.network_info and r.network_info.latency_ms else '',
-                    r.network_info.reverse_dns if r.network_info and r.network_info.reverse_dns else ''
-                ]
-                f.write(','.join(f'"{str(x)}"' for x in row) + '\n')
-        
-        self.console.print(f"CSV file saved to [cyan]{output_file}[/cyan]")
+        self.stream(results, 'csv', filename)
 
     @staticmethod
     def _result_to_dict(result: IPConversionResult) -> dict:
         """Convert an IPConversionResult to a dictionary."""
-        return {
-            'ipv4': result.ipv4,
-            'ipv6': result.ipv6,
-            'url_nossl': result.url_nossl,
-            'url_ssl': result.url_ssl,
-            'domain': result.domain,
-            'geolocation': {
-                'country': result.geolocation.country,
-                'city': result.geolocation.city,
-                'latitude': result.geolocation.latitude,
-                'longitude': result.geolocation.longitude,
-                'timezone': result.geolocation.timezone
-            } if result.geolocation else None,
-            'network_info': {
-                'is_reachable': result.network_info.is_reachable,
-                'latency_ms': result.network_info.latency_ms,
-                'reverse_dns': result.network_info.reverse_dns,
-                'open_ports': result.network_info.open_ports
-            } if result.network_info else None,
-            'whois_info': {
-                'registrar': result.whois_info.registrar,
-                'creation_date': result.whois_info.creation_date,
-                'expiration_date': result.whois_info.expiration_date,
-                'name_servers': result.whois_info.name_servers,
-                'status': result.whois_info.status
-            } if result.whois_info else None,
-            'qr_code_path': result.qr_code_path
-        }
+        return result_to_dict(result)
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from ..core.cache import EnrichmentCache
+from ..core.enrichment import get_stages
+from ..core.executor import DEFAULT_CONCURRENCY
+from ..core.ip_converter import IPConverter
+from ..core.shard import count_targets
+from .writers import result_to_dict
+
+DEFAULT_ADDRESS = '127.0.0.1:8750'
+
+# Limits per request; larger jobs belong in a batch run with -f
+MAX_BODY_BYTES = 16 << 20
+MAX_HOSTS = 1 << 16
+
+
+class ServiceError(Exception):
+    """A request the service rejects, answered with `status` and a JSON error."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_address(value: str) -> Union[Tuple[str, int], str]:
+    """Parse 'HOST:PORT' (or ':PORT') into a TCP address, 'unix:PATH' into a socket path."""
+    if value.startswith('unix:'):
+        return value[len('unix:'):]
+    host, sep, port = value.rpartition(':')
+    if not sep or not port.isdigit():
+        raise ValueError(f"expected HOST:PORT or unix:PATH, not {value!r}")
+    return host.strip('[]') or '127.0.0.1', int(port)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class RTMaskService:
+    """Long-running JSON API over one warm IPConverter.
+
+    The converter, and with it the enrichment cache, the in-memory DNS and
+    network-block indexes, the HTTP connection pool and the event loops of
+    the prober and resolver, is created once and shared by every request,
+    so repeated lookups are answered from memory. Requests are handled on
+    their own threads.
+
+    Endpoints:
+      POST /convert  {"targets": [...], "enrich": ["geo", ...], "qr": false}
+      GET  /convert?target=...&enrich=geo,whois
+      GET  /health   liveness and uptime
+      GET  /stats    per-stage metrics and cache statistics as JSON
+      GET  /metrics  the same metrics in Prometheus text format
+
+    Targets may be IPv4 addresses, domains and CIDR ranges; a request may
+    expand to at most `max_hosts` hosts. Without "enrich" the enrichments
+    the service was started with are used; an empty list gives a plain
+    conversion, which takes the bulk path for ranges.
+    """
+
+    def __init__(self, converter: IPConverter, concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: Optional[float] = None, cache: Optional[EnrichmentCache] = None,
+                 max_hosts: int = MAX_HOSTS):
+        self.converter = converter
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cache = cache
+        self.max_hosts = max_hosts
+        self.started = time.time()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def convert(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle one /convert request body and return the response body."""
+        start = time.perf_counter()
+        targets = request.get('targets', [request['target']] if 'target' in request else None)
+        if not isinstance(targets, list) or not all(isinstance(t, str) and t.strip() for t in targets):
+            raise ServiceError("expected \"targets\": a list of IPs, domains or CIDR ranges")
+        targets = [target.strip() for target in targets]
+        hosts = count_targets(targets)
+        if hosts > self.max_hosts:
+            raise ServiceError(f"request expands to {hosts} hosts; the limit is {self.max_hosts}", 413)
+
+        names = request.get('enrich')
+        if names is not None and (not isinstance(names, list) or not all(isinstance(n, str) for n in names)):
+            raise ServiceError("expected \"enrich\": a list of stage names, e.g. [\"geo\", \"whois\"]")
+        try:
+            stages = self.converter.stages if names is None else get_stages(names)
+        except (TypeError, ValueError) as e:
+            raise ServiceError(str(e))
+        if request.get('qr'):
+            stages = stages + get_stages(['qr'])
+
+        self.converter.prefetch_domains(t for t in targets if '/' not in t)
+        if stages:
+            results = [result_to_dict(result)
+                       for target_results in self.converter.map_targets(
+                           self._hosts(targets), concurrency=self.concurrency,
+                           timeout=self.timeout, stages=stages)
+                       for result in target_results]
+        else:
+            results = [result_to_dict(result) for item in self._plain(targets) for result in item]
+        return {
+            'results': results,
+            'count': len(results),
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+        }
+
+    def _hosts(self, targets: List[str]):
+        for target in targets:
+            if '/' in target:
+                for batch in self.converter.iter_cidr_batches(target):
+                    yield from batch.ipv4
+            else:
+                yield target
+
+    def _plain(self, targets: List[str]):
+        for target in targets:
+            if '/' in target:
+                yield from self.converter.iter_cidr_batches(target)
+            else:
+                yield self.converter.process_target(target, enrich=False)
+
+    def health(self) -> Dict[str, Any]:
+        return {'status': 'ok', 'uptime_seconds': time.time() - self.started, 'requests': self.requests}
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {'requests': self.requests, 'metrics': self.converter.metrics.snapshot()}
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
+
+    def make_server(self, address: Union[str, Tuple[str, int]] = DEFAULT_ADDRESS):
+        """Bind the server; call serve_forever() on the result to start answering."""
+        if isinstance(address, str):
+            address = parse_address(address)
+        handler = self._handler()
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)
+            self._server = _UnixHTTPServer(address, handler)
+        else:
+            self._server = ThreadingHTTPServer(address, handler)
+            self._server.daemon_threads = True
+        return self._server
+
+    @property
+    def url(self) -> str:
+        address = self._server.server_address
+        if isinstance(address, str):
+            return f"unix:{address}"
+        return f"http://{address[0]}:{address[1]}"
+
+    def serve(self, address: Union[str, Tuple[str, int]] = DEFAULT_ADDRESS):
+        """Serve requests until interrupted."""
+        server = self.make_server(address)
+        print(f"RT-MASK service listening on {self.url}")
+        try:
+            server.serve_forever()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self._server is None:
+            return
+        server, self._server = self._server, None
+        server.server_close()
+        if isinstance(server.server_address, str) and os.path.exists(server.server_address):
+            os.unlink(server.server_address)
+
+    def _handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == '/health':
+                    self._reply(200, service.health())
+                elif url.path == '/stats':
+                    self._reply(200, service.stats())
+                elif url.path == '/metrics':
+                    self._reply(200, service.converter.metrics.prometheus(), 'text/plain; version=0.0.4')
+                elif url.path == '/convert':
+                    # An empty ?enrich= asks for a plain conversion
+                    query = parse_qs(url.query, keep_blank_values=True)
+                    request = {'targets': query.get('target', [])}
+                    if 'enrich' in query:
+                        request['enrich'] = [n for value in query['enrich'] for n in value.split(',') if n]
+                    request['qr'] = query.get('qr', ['false'])[0].lower() in ('1', 'true', 'yes')
+                    self._convert(request)
+                else:
+                    self._reply(404, {'error': f"unknown path {url.path}"})
+
+            def do_POST(self):
+                if urlsplit(self.path).path != '/convert':
+                    self._reply(404, {'error': f"unknown path {self.path}"})
+                    return
+                # The body of a request with a bad length cannot be skipped, so the connection is closed
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    self.close_connection = True
+                    self._reply(400, {'error': "invalid Content-Length"})
+                    return
+                if length > MAX_BODY_BYTES:
+                    self.close_connection = True
+                    self._reply(413, {'error': f"request body over {MAX_BODY_BYTES} bytes"})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError as e:
+                    self._reply(400, {'error': f"invalid JSON: {str(e)}"})
+                    return
+                if not isinstance(request, dict):
+                    self._reply(400, {'error': "expected a JSON object"})
+                    return
+                self._convert(request)
+
+            def _convert(self, request: Dict[str, Any]):
+                with service._lock:
+                    service.requests += 1
+                try:
+                    self._reply(200, service.convert(request))
+                except ServiceError as e:
+                    self._reply(e.status, {'error': str(e)})
+                except Exception as e:
+                    service.converter.logger.error(f"Failed to handle request: {str(e)}")
+                    self._reply(500, {'error': str(e)})
+
+            def _reply(self, status: int, body: Union[Dict[str, Any], str],
+                       content_type: str = 'application/json'):
+                data = (body if isinstance(body, str) else json.dumps(body)).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def address_string(self) -> str:
+                # Unix socket peers have no address
+                return self.client_address[0] if self.client_address else 'unix'
+
+            def log_message(self, format, *args):
+                service.converter.logger.debug(f"{self.address_string()} {format % args}")
+
+        return Handler
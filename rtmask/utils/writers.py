@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterable, List, Optional, Union
+
+from ..core.ip_converter import IPConversionResult
+from ..core.bulk import CIDRBatch
+from ..core.metrics import Metrics
+from ..core.store import ResultStore
+
+CSV_HEADER = ["IPv4", "IPv6", "URL (no SSL)", "URL (SSL)", "Domain", "Country", "City",
+              "Latitude", "Longitude", "Timezone", "Reachable", "Latency (ms)", "Reverse DNS"]
+
+# Rows buffered by the file object before they are pushed to disk. Small
+# enough that an interrupted run loses at most a moment of work.
+DEFAULT_FLUSH_EVERY = 1000
+
+# Rows per data file of a paginated HTML report
+DEFAULT_PAGE_SIZE = 1000
+
+PAGE_COLUMNS = ["IPv4", "IPv6", "URL (no SSL)", "URL (SSL)", "Domain", "Location",
+                "Reachable", "Latency", "Reverse DNS", "Registrar"]
+
+
+def result_to_dict(result: IPConversionResult) -> dict:
+    """Convert an IPConversionResult to a dictionary."""
+    return {
+        'ipv4': result.ipv4,
+        'ipv6': result.ipv6,
+        'url_nossl': result.url_nossl,
+        'url_ssl': result.url_ssl,
+        'domain': result.domain,
+        'geolocation': {
+            'country': result.geolocation.country,
+            'city': result.geolocation.city,
+            'latitude': result.geolocation.latitude,
+            'longitude': result.geolocation.longitude,
+            'timezone': result.geolocation.timezone,
+            'network': result.geolocation.network,
+            'checked_at': result.geolocation.checked_at
+        } if result.geolocation else None,
+        'network_info': {
+            'is_reachable': result.network_info.is_reachable,
+            'latency_ms': result.network_info.latency_ms,
+            'reverse_dns': result.network_info.reverse_dns,
+            'open_ports': result.network_info.open_ports,
+            'checked_at': result.network_info.checked_at
+        } if result.network_info else None,
+        'whois_info': {
+            'registrar': result.whois_info.registrar,
+            'creation_date': result.whois_info.creation_date,
+            'expiration_date': result.whois_info.expiration_date,
+            'name_servers': result.whois_info.name_servers,
+            'status': result.whois_info.status,
+            'network': result.whois_info.network,
+            'checked_at': result.whois_info.checked_at
+        } if result.whois_info else None,
+        'qr_code_path': result.qr_code_path
+    }
+
+
+def result_to_row(r: IPConversionResult) -> List[str]:
+    """Convert an IPConversionResult to a CSV row matching CSV_HEADER."""
+    return [
+        r.ipv4,
+        r.ipv6,
+        r.url_nossl,
+        r.url_ssl,
+        r.domain or '',
+        r.geolocation.country if r.geolocation else '',
+        r.geolocation.city if r.geolocation else '',
+        str(r.geolocation.latitude) if r.geolocation else '',
+        str(r.geolocation.longitude) if r.geolocation else '',
+        r.geolocation.timezone if r.geolocation else '',
+        str(r.network_info.is_reachable) if r.network_info else '',
+        str(r.network_info.latency_ms) if r.network_info and r.network_info.latency_ms else '',
+        r.network_info.reverse_dns if r.network_info and r.network_info.reverse_dns else ''
+    ]
+
+
+def result_to_page_row(r: IPConversionResult) -> list:
+    """Convert an IPConversionResult to a row of a paginated report (PAGE_COLUMNS)."""
+    return [
+        r.ipv4,
+        r.ipv6,
+        r.url_nossl,
+        r.url_ssl,
+        r.domain or '',
+        f"{r.geolocation.city}, {r.geolocation.country}" if r.geolocation else '',
+        r.network_info.is_reachable if r.network_info else None,
+        f"{r.network_info.latency_ms:.2f} ms" if r.network_info and r.network_info.latency_ms else '',
+        r.network_info.reverse_dns or '' if r.network_info else '',
+        r.whois_info.registrar or '' if r.whois_info else '',
+    ]
+
+
+class ResultWriter:
+    """Base class for writers that append results to a file as they arrive.
+
+    Writers are context managers; leaving the block (including through an
+    exception or Ctrl-C) writes any trailer so the file stays valid. With
+    `metrics`, time spent writing is recorded as the 'write' stage.
+    """
+
+    def __init__(self, path: Union[str, Path], flush_every: int = DEFAULT_FLUSH_EVERY,
+                 metrics: Optional[Metrics] = None):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.metrics = metrics
+        self.count = 0
+        self._unflushed = 0
+        self._file: Optional[IO[str]] = None
+
+    def __enter__(self) -> 'ResultWriter':
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def open(self):
+        self._file = self.path.open('w', newline='')
+        self._write_header()
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self._write_footer()
+        finally:
+            self._file.close()
+            self._file = None
+
+    def write(self, item: Union[IPConversionResult, CIDRBatch, ResultStore]):
+        """Append a result, or every row of a batch or store, to the file."""
+        if isinstance(item, ResultStore):
+            self.write_many(item)
+            return
+        if self.metrics is None:
+            self._write_item(item)
+        else:
+            with self.metrics.timer('write'):
+                self._write_item(item)
+
+    def _write_item(self, item: Union[IPConversionResult, CIDRBatch]):
+        if isinstance(item, CIDRBatch):
+            self._write_batch(item)
+            rows = len(item)
+        else:
+            self._write_result(item)
+            rows = 1
+        self.count += rows
+        self._unflushed += rows
+        if self._unflushed >= self.flush_every:
+            self._file.flush()
+            self._unflushed = 0
+
+    def write_many(self, items: Iterable[Union[IPConversionResult, CIDRBatch]]) -> int:
+        if isinstance(items, ResultStore):
+            # Plain runs come back as batches and use the fast paths below
+            items = items.iter_items()
+        for item in items:
+            self.write(item)
+        return self.count
+
+    def _write_header(self):
+        pass
+
+    def _write_footer(self):
+        pass
+
+    def _write_result(self, result: IPConversionResult):
+        raise NotImplementedError
+
+    def _write_batch(self, batch: CIDRBatch):
+        for result in batch:
+            self._write_result(result)
+
+
+class JSONLinesWriter(ResultWriter):
+    """One JSON object per line; every complete line is a valid record."""
+
+    def _write_result(self, result: IPConversionResult):
+        self._file.write(json.dumps(result_to_dict(result)) + '\n')
+
+
+class JSONWriter(ResultWriter):
+    """A JSON array written element by element and closed on exit."""
+
+    def _write_header(self):
+        self._file.write('[')
+
+    def _write_result(self, result: IPConversionResult):
+        prefix = ',\n  ' if self.count else '\n  '
+        self._file.write(prefix + json.dumps(result_to_dict(result)))
+
+    def _write_batch(self, batch: CIDRBatch):
+        # Batches are unenriched, so skip building a result object per row
+        empty = ', "domain": null, "geolocation": null, "network_info": null, "whois_info": null, "qr_code_path": null}'
+        rows = []
+        for i, (ipv4, ipv6, url_nossl, url_ssl) in enumerate(zip(batch.ipv4, batch.ipv6, batch.url_nossl, batch.url_ssl)):
+            prefix = ',\n  ' if self.count or i else '\n  '
+            rows.append(f'{prefix}{{"ipv4": "{ipv4}", "ipv6": "{ipv6}", '
+                        f'"url_nossl": "{url_nossl}", "url_ssl": "{url_ssl}"{empty}')
+        self._file.write(''.join(rows))
+
+    def _write_footer(self):
+        self._file.write('\n]\n' if self.count else ']\n')
+
+
+class CSVWriter(ResultWriter):
+    """CSV with a header row, every field quoted."""
+
+    def _write_header(self):
+        self._csv = csv.writer(self._file, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        self._csv.writerow(CSV_HEADER)
+
+    def _write_result(self, result: IPConversionResult):
+        self._csv.writerow(result_to_row(result))
+
+    def _write_batch(self, batch: CIDRBatch):
+        blank = [''] * (len(CSV_HEADER) - 4)
+        self._csv.writerows([ipv4, ipv6, url_nossl, url_ssl, *blank] for ipv4, ipv6, url_nossl, url_ssl
+                            in zip(batch.ipv4, batch.ipv6, batch.url_nossl, batch.url_ssl))
+
+
+class HTMLWriter(ResultWriter):
+    """An HTML report whose table rows are rendered and written in chunks.
+
+    The page head is written on open, each chunk of `chunk_size` rows is
+    rendered with the `report_rows.html` template, and the closing markup
+    (with the final row count) is written on close.
+    """
+
+    def __init__(self, path: Union[str, Path], jinja_env, chunk_size: int = 500,
+                 flush_every: int = DEFAULT_FLUSH_EVERY, metrics: Optional[Metrics] = None):
+        super().__init__(path, flush_every, metrics)
+        self.jinja_env = jinja_env
+        self.chunk_size = chunk_size
+        self._pending: List[IPConversionResult] = []
+
+    def _write_header(self):
+        self._rows_template = self.jinja_env.get_template('report_rows.html')
+        self._file.write(self.jinja_env.get_template('report_head.html').render(
+            generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ))
+
+    def _write_result(self, result: IPConversionResult):
+        self._pending.append(result)
+        if len(self._pending) >= self.chunk_size:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        if self._pending:
+            self._file.write(self._rows_template.render(results=self._pending))
+            self._pending = []
+
+    def _write_footer(self):
+        self._write_chunk()
+        self._file.write(self.jinja_env.get_template('report_tail.html').render(total_results=self.count))
+
+
+class PagedHTMLWriter(ResultWriter):
+    """An HTML report split into an index page and chunked data files.
+
+    Rows are collected `page_size` at a time and written as numbered
+    scripts in a `<name>_data` directory next to the index page, so memory
+    and the size of every file depend on the page size, not on the number
+    of results. The index page, written on close, loads one page at a time
+    and filters rows in the browser, fetching pages as it scans.
+
+    Data files are JSON wrapped in a `rtmaskPage(n, rows)` call rather
+    than plain .json, because browsers refuse to fetch() local files and
+    the report has to open straight from disk.
+    """
+
+    def __init__(self, path: Union[str, Path], jinja_env, page_size: int = DEFAULT_PAGE_SIZE,
+                 flush_every: int = DEFAULT_FLUSH_EVERY, metrics: Optional[Metrics] = None):
+        super().__init__(path, flush_every, metrics)
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+        self.jinja_env = jinja_env
+        self.page_size = page_size
+        self.data_dir = self.path.with_name(f"{self.path.stem}_data")
+        self.pages = 0
+        self._rows: List[list] = []
+
+    def _write_header(self):
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        # Pages left over from an earlier, longer report would be loaded too
+        for stale in self.data_dir.glob('page-*.js'):
+            stale.unlink()
+
+    def _write_result(self, result: IPConversionResult):
+        self._rows.append(result_to_page_row(result))
+        if len(self._rows) >= self.page_size:
+            self._write_page()
+
+    def _write_batch(self, batch: CIDRBatch):
+        blank = ['', '', None, '', '', '']
+        for ipv4, ipv6, url_nossl, url_ssl in zip(batch.ipv4, batch.ipv6, batch.url_nossl, batch.url_ssl):
+            self._rows.append([ipv4, ipv6, url_nossl, url_ssl, *blank])
+            if len(self._rows) >= self.page_size:
+                self._write_page()
+
+    def _write_page(self):
+        if not self._rows:
+            return
+        with open(self.data_dir / f"page-{self.pages:05d}.js", 'w') as f:
+            f.write(f"rtmaskPage({self.pages},{json.dumps(self._rows, separators=(',', ':'))});\n")
+        self.pages += 1
+        self._rows = []
+
+    def _write_footer(self):
+        self._write_page()
+        self._file.write(self.jinja_env.get_template('report_paged.html').render(
+            generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            total_results=self.count,
+            pages=self.pages,
+            page_size=self.page_size,
+            columns=PAGE_COLUMNS,
+            data_dir=self.data_dir.name,
+        ))
+
+
+WRITERS = {
+    'json': JSONWriter,
+    'jsonl': JSONLinesWriter,
+    'csv': CSVWriter,
+    'html': HTMLWriter,
+}
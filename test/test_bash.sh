@@ -98,6 +98,276 @@ run_test "Geolocation" \
     0 \
     '"geo":'
 
+# Test that a whole CIDR range is converted through the bulk path
+OUT_TMP=$(mktemp -d)
+run_test "Bulk CIDR CSV" \
+    "python3 RT-MASK.py -c 10.0.0.0/24 --format csv -o $OUT_TMP/r.csv --no-banner >/dev/null \
+     && [ \$(wc -l < $OUT_TMP/r.csv) -eq 255 ] && tail -n 1 $OUT_TMP/r.csv" \
+    0 \
+    '"10.0.0.254","::ffff:0a00:00fe"'
+rm -rf "$OUT_TMP"
+
+# Test that a target timeout must be positive
+run_test "Invalid Target Timeout" \
+    "python3 RT-MASK.py -i 10.0.0.1 --target-timeout 0" \
+    2 \
+    "expected a number above 0"
+
+# Test that results are written as JSON Lines, one object per line
+OUT_TMP=$(mktemp -d)
+run_test "JSONL Output" \
+    "python3 RT-MASK.py -c 10.0.0.0/30 --format jsonl -o $OUT_TMP/r.jsonl --no-banner >/dev/null \
+     && [ \$(wc -l < $OUT_TMP/r.jsonl) -eq 2 ] && tail -n 1 $OUT_TMP/r.jsonl" \
+    0 \
+    '^{"ipv4": "10.0.0.2", "ipv6": "::ffff:0a00:0002"'
+rm -rf "$OUT_TMP"
+
+# Test that a failed lookup is answered from the cache on the next run
+CACHE_TMP=$(mktemp -d)
+run_test "Cache Negative Answer" \
+    "python3 RT-MASK.py -d nonexistent.invalid --cache-dir $CACHE_TMP --no-banner; \
+     python3 RT-MASK.py -d nonexistent.invalid --cache-dir $CACHE_TMP --cache-stats --no-banner" \
+    0 \
+    "dns .*entries=1 .*hits=1 .*misses=0"
+rm -rf "$CACHE_TMP"
+
+# Test that --cache-ttl shortens how long answers are kept
+CACHE_TMP=$(mktemp -d)
+run_test "Cache TTL Override" \
+    "python3 RT-MASK.py -d nonexistent.invalid --cache-dir $CACHE_TMP --cache-ttl dns=1 --no-banner; sleep 2; \
+     python3 RT-MASK.py -d nonexistent.invalid --cache-dir $CACHE_TMP --cache-ttl dns=1 --cache-stats --no-banner" \
+    0 \
+    "dns .*hits=0 .*misses=1 .*ttl=1"
+rm -rf "$CACHE_TMP"
+
+# Test the reachability prober against a local TCP listener
+OUT_TMP=$(mktemp -d)
+python3 -m http.server 18751 --bind 127.0.0.1 --directory "$OUT_TMP" >/dev/null 2>&1 &
+LISTENER_PID=$!
+sleep 1
+run_test "Network Probe Ports" \
+    "python3 RT-MASK.py -i 127.0.0.1 --network --ports 18751,18752 --no-cache -o $OUT_TMP/r.jsonl --no-banner >/dev/null \
+     && cat $OUT_TMP/r.jsonl" \
+    0 \
+    '"network_info": {"is_reachable": true, "latency_ms": [0-9.]*, "reverse_dns": [^,]*, "open_ports": \[18751\]'
+kill $LISTENER_PID
+rm -rf "$OUT_TMP"
+
+# Test that the DNS concurrency must be at least 1
+run_test "Invalid DNS Concurrency" \
+    "python3 RT-MASK.py -d example.com --dns-concurrency 0" \
+    2 \
+    "expected at least 1"
+
+# Test plain tab-separated text output
+run_test "Plain Output" \
+    "python3 RT-MASK.py -i 10.0.0.1 --plain --no-banner" \
+    0 \
+    "^10.0.0.1	::ffff:0a00:0001	http://\[::ffff:0a00:0001\]"
+
+# Test that a second run skips the QR codes already in the ZIP archive
+QR_TMP=$(mktemp -d)
+run_test "QR Archive Rerun" \
+    "python3 RT-MASK.py -c 10.0.0.0/29 --qr --qr-archive codes.zip --output-dir $QR_TMP --no-banner >/dev/null \
+     && first=\$(md5sum < $QR_TMP/codes.zip) \
+     && python3 RT-MASK.py -c 10.0.0.0/29 --qr --qr-archive codes.zip --output-dir $QR_TMP --no-banner >/dev/null \
+     && [ \"\$first\" = \"\$(md5sum < $QR_TMP/codes.zip)\" ] \
+     && python3 -c 'import sys, zipfile; names = zipfile.ZipFile(sys.argv[1]).namelist(); print(len(names), len(set(names)))' $QR_TMP/codes.zip" \
+    0 \
+    "^6 6$"
+rm -rf "$QR_TMP"
+
+# Test that a second run keeps the sprite sheets and adds new codes on a new sheet
+QR_TMP=$(mktemp -d)
+run_test "QR Sprite Rerun" \
+    "python3 RT-MASK.py -c 10.0.0.0/29 --qr --qr-archive codes.png --output-dir $QR_TMP --no-banner >/dev/null \
+     && first=\$(md5sum < $QR_TMP/codes_0000.png) \
+     && python3 RT-MASK.py -c 10.0.0.0/28 --qr --qr-archive codes.png --output-dir $QR_TMP --no-banner >/dev/null \
+     && [ \"\$first\" = \"\$(md5sum < $QR_TMP/codes_0000.png)\" ] \
+     && python3 -c 'import json, sys; index = json.load(open(sys.argv[1])); print(len(index), sorted({tile[\"sheet\"] for tile in index.values()}))' $QR_TMP/codes.json" \
+    0 \
+    "^14 \['codes_0000.png', 'codes_0001.png'\]$"
+rm -rf "$QR_TMP"
+
+# Test that the QR worker count must be at least 1
+run_test "Invalid QR Workers" \
+    "python3 RT-MASK.py -i 10.0.0.1 --qr --qr-workers 0" \
+    2 \
+    "expected at least 1"
+
+# Test the per-stage statistics and the Prometheus metrics export
+OUT_TMP=$(mktemp -d)
+run_test "Stats And Metrics File" \
+    "python3 RT-MASK.py -d nonexistent.invalid --no-cache --stats --metrics-file $OUT_TMP/m.prom --no-banner \
+     && grep 'rtmask_stage_errors_total{stage=\"dns\"} 1' $OUT_TMP/m.prom" \
+    0 \
+    "^dns  *1  *1 "
+rm -rf "$OUT_TMP"
+
+# Test resuming a job written to --output-dir
+JOB_TMP=$(mktemp -d)
+run_test "Resume Job Output Dir" \
+    "python3 RT-MASK.py -c 10.0.0.0/30 --output-dir $JOB_TMP/out -o r.jsonl --job-dir $JOB_TMP/job --no-banner \
+     && rm $JOB_TMP/out/r.jsonl \
+     && (cd $JOB_TMP && python3 $PWD/RT-MASK.py --resume job --no-banner) \
+     && [ ! -e $JOB_TMP/r.jsonl ] && cat $JOB_TMP/out/r.jsonl" \
+    0 \
+    '"ipv4": "10.0.0.2"'
+rm -rf "$JOB_TMP"
+
+# Test that merged shards and a parallel run match a single run byte for byte
+SHARD_TMP=$(mktemp -d)
+run_test "Shard And Merge" \
+    "python3 RT-MASK.py -c 10.0.0.0/26 -o $SHARD_TMP/all.jsonl --no-banner >/dev/null \
+     && for k in 1 2 3; do python3 RT-MASK.py -c 10.0.0.0/26 --shard \$k/3 -o $SHARD_TMP/part-\$k.jsonl --no-banner >/dev/null; done \
+     && python3 RT-MASK.py --merge $SHARD_TMP/part-*.jsonl -o $SHARD_TMP/merged.jsonl --no-banner >/dev/null \
+     && cmp $SHARD_TMP/all.jsonl $SHARD_TMP/merged.jsonl && wc -l < $SHARD_TMP/merged.jsonl" \
+    0 \
+    "^62$"
+run_test "Parallel Matches Single Run" \
+    "python3 RT-MASK.py -c 10.0.0.0/26 -o $SHARD_TMP/all.json --no-banner >/dev/null \
+     && python3 RT-MASK.py -c 10.0.0.0/26 -o $SHARD_TMP/par.json --parallel 3 --no-banner >/dev/null \
+     && cmp $SHARD_TMP/all.json $SHARD_TMP/par.json && python3 RT-MASK.py --merge $SHARD_TMP/par.json --no-banner --plain" \
+    0 \
+    "^10.0.0.62	"
+rm -rf "$SHARD_TMP"
+
+# Test a parallel run into a relative --output-dir
+SHARD_TMP=$(mktemp -d)
+run_test "Parallel Relative Output Dir" \
+    "(cd $SHARD_TMP && python3 $PWD/RT-MASK.py -c 10.0.0.0/28 --output-dir out -o r.jsonl --parallel 2 --no-banner >/dev/null) \
+     && ls $SHARD_TMP/out && tail -n 1 $SHARD_TMP/out/r.jsonl" \
+    0 \
+    '"ipv4": "10.0.0.14"'
+rm -rf "$SHARD_TMP"
+
+# Test that the number of parallel shards must be at least 1
+run_test "Invalid Parallel Count" \
+    "python3 RT-MASK.py -c 10.0.0.0/28 --parallel 0" \
+    2 \
+    "expected at least 1"
+
+# Test that CSV shards cannot be merged into another format
+SHARD_TMP=$(mktemp -d)
+run_test "Merge CSV Into JSON" \
+    "python3 RT-MASK.py -c 10.0.0.0/30 -o $SHARD_TMP/part-1.csv --no-banner >/dev/null \
+     && python3 RT-MASK.py --merge $SHARD_TMP/part-1.csv -o $SHARD_TMP/merged.json --no-banner" \
+    1 \
+    "CSV shard outputs can only be merged into a CSV output"
+rm -rf "$SHARD_TMP"
+
+# Test the service endpoints against a local server
+SERVICE_URL=http://127.0.0.1:18750
+python3 RT-MASK.py --serve 127.0.0.1:18750 --no-cache --no-banner >/dev/null 2>&1 &
+SERVICE_PID=$!
+for _ in $(seq 50); do curl -s $SERVICE_URL/health >/dev/null && break; sleep 0.1; done
+run_test "Service Health" \
+    "curl -s $SERVICE_URL/health" \
+    0 \
+    '"status": "ok"'
+run_test "Service Convert" \
+    "curl -s -d '{\"targets\": [\"10.0.0.0/30\"], \"enrich\": []}' $SERVICE_URL/convert" \
+    0 \
+    '"ipv4": "10.0.0.2", "ipv6": "::ffff:0a00:0002".*"count": 2'
+run_test "Service Convert Query" \
+    "curl -s '$SERVICE_URL/convert?target=10.0.0.1&enrich='" \
+    0 \
+    '"ipv4": "10.0.0.1", "ipv6": "::ffff:0a00:0001".*"count": 1'
+run_test "Service Invalid Enrich" \
+    "curl -s -w ' %{http_code}' -d '{\"targets\": [\"10.0.0.1\"], \"enrich\": \"geo\"}' $SERVICE_URL/convert" \
+    0 \
+    'a list of stage names.* 400$'
+run_test "Service Invalid Content Length" \
+    "curl -s -w ' %{http_code}' -X POST -H 'Content-Length: abc' $SERVICE_URL/convert" \
+    0 \
+    'invalid Content-Length.* 400$'
+run_test "Service Metrics" \
+    "curl -s $SERVICE_URL/metrics" \
+    0 \
+    '^# TYPE rtmask_stage_calls_total counter'
+run_test "Service Stats" \
+    "curl -s $SERVICE_URL/stats" \
+    0 \
+    '^{"requests": 3, "metrics": {'
+kill $SERVICE_PID
+
+# Test that --dedupe processes every address of overlapping input once
+DEDUPE_TMP=$(mktemp -d)
+printf '10.0.0.0/30\n10.0.0.2\n10.0.0.0/29\n' > "$DEDUPE_TMP/targets.txt"
+run_test "Dedupe Overlapping Input" \
+    "python3 RT-MASK.py -f $DEDUPE_TMP/targets.txt --dedupe -o $DEDUPE_TMP/r.jsonl --no-banner \
+     && [ \$(wc -l < $DEDUPE_TMP/r.jsonl) -eq 6 ] && [ \$(sort -u $DEDUPE_TMP/r.jsonl | wc -l) -eq 6 ]" \
+    0 \
+    "6 targets to process instead of 9 (3 duplicates eliminated"
+rm -rf "$DEDUPE_TMP"
+
+# Test the paginated HTML report and its chunked data files
+HTML_TMP=$(mktemp -d)
+run_test "HTML Pages Report" \
+    "python3 RT-MASK.py -c 10.0.0.0/27 --format html-pages --page-size 10 --output-dir $HTML_TMP -o report.html --no-banner >/dev/null \
+     && [ \$(ls $HTML_TMP/report_data | wc -l) -eq 3 ] && grep 'Total results' $HTML_TMP/report.html \
+     && head -c 40 $HTML_TMP/report_data/page-00002.js" \
+    0 \
+    'rtmaskPage(2,\[\["10.0.0.21"'
+rm -rf "$HTML_TMP"
+
+# Test that the page size must be at least 1
+run_test "Invalid Page Size" \
+    "python3 RT-MASK.py -c 10.0.0.0/27 --format html-pages --page-size 0" \
+    2 \
+    "expected at least 1"
+
+# Test that RDAP and the port-43 fallback report a domain status the same way
+RDAP_CHECK='
+import sys
+sys.path[:0] = [".", "benchmarks"]
+import fakes
+from rtmask.core.http import HTTPClient
+from rtmask.core.rdap import RDAPClient
+with fakes.FakeRDAPServer() as rdap, fakes.FakeWhoisServer() as whois:
+    client = RDAPClient(HTTPClient(), bootstrap_url=rdap.url, referral_server="{}:{}".format(*whois.address))
+    rdap_status = client.lookup("host.test").status
+    whois_status = client.lookup("host.example").status
+    print("rdap", rdap_status, "port-43", whois_status, "queries", client.rdap_queries, client.whois_queries)
+'
+run_test "RDAP Status Normalisation" \
+    "python3 -c \"\$RDAP_CHECK\"" \
+    0 \
+    "^rdap \['client transfer prohibited'\] port-43 \['client transfer prohibited'\] queries 1 2$"
+
+# Test that a packed columnar file reads back as the same results
+RTM_TMP=$(mktemp -d)
+run_test "RTM Round Trip" \
+    "python3 RT-MASK.py -c 10.0.0.0/26 -o $RTM_TMP/r.rtm --no-banner >/dev/null \
+     && python3 RT-MASK.py -c 10.0.0.0/26 -o $RTM_TMP/direct.jsonl --no-banner >/dev/null \
+     && python3 RT-MASK.py --merge $RTM_TMP/r.rtm -o $RTM_TMP/read.jsonl --no-banner >/dev/null \
+     && cmp $RTM_TMP/direct.jsonl $RTM_TMP/read.jsonl && [ \"\$(head -c 8 $RTM_TMP/r.rtm)\" = RTMCOL01 ] && tail -n 1 $RTM_TMP/read.jsonl" \
+    0 \
+    '"ipv4": "10.0.0.62", "ipv6": "::ffff:0a00:003e"'
+rm -rf "$RTM_TMP"
+
+# Test that --previous reuses an earlier run and --changes reports the difference
+INC_TMP=$(mktemp -d)
+printf '10.0.0.2\n10.0.0.3\n' > "$INC_TMP/targets.txt"
+run_test "Previous Run And Changes" \
+    "python3 RT-MASK.py -c 10.0.0.0/30 --qr --output-dir $INC_TMP -o prev.jsonl --no-banner >/dev/null \
+     && python3 RT-MASK.py -f $INC_TMP/targets.txt --qr --output-dir $INC_TMP -o new.jsonl \
+        --previous $INC_TMP/prev.jsonl --changes $INC_TMP/changes.jsonl --no-banner \
+     && grep -c '\"change\": \"added\", \"target\": \"10.0.0.3\"' $INC_TMP/changes.jsonl \
+     && grep -c '\"change\": \"removed\", \"target\": \"10.0.0.1\"' $INC_TMP/changes.jsonl" \
+    0 \
+    "1 added, 0 changed, 1 removed"
+rm -rf "$INC_TMP"
+
+# Test the compact console table
+OUT_TMP=$(mktemp -d)
+run_test "Compact Table" \
+    "python3 RT-MASK.py -c 10.0.0.0/29 --compact --no-banner --no-progress > $OUT_TMP/table.txt \
+     && head -n 1 $OUT_TMP/table.txt | grep -q '^IPv4  *IPv6  *Domain\$' && tail -n 1 $OUT_TMP/table.txt" \
+    0 \
+    "^10.0.0.6         ::ffff:0a00:0006$"
+rm -rf "$OUT_TMP"
+
 # Print summary
 echo "===================="
 echo "Test Summary:"
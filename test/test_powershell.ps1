@@ -113,6 +113,317 @@ Run-Test -TestName "Windows API - Reverse DNS" -Command {
     throw "Reverse DNS lookup failed"
 } -ExpectedOutput '"ReverseDNS":'
 
+# Test that a whole CIDR range is converted through the bulk path
+$OutTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $OutTmp
+Run-Test -TestName "Bulk CIDR CSV" -Command {
+    python RT-MASK.py -c 10.0.0.0/24 --format csv -o (Join-Path $OutTmp "r.csv") --no-banner | Out-Null
+    $rows = Get-Content (Join-Path $OutTmp "r.csv")
+    if ($rows.Count -ne 255) {
+        throw "expected 255 lines, got $($rows.Count)"
+    }
+    $rows[-1]
+} -ExpectedOutput '"10.0.0.254","::ffff:0a00:00fe"'
+Remove-Item -Recurse -Force $OutTmp -ErrorAction SilentlyContinue
+
+# Test that a target timeout must be positive
+Run-Test -TestName "Invalid Target Timeout" -Command {
+    python RT-MASK.py -i 10.0.0.1 --target-timeout 0
+} -ExpectedExitCode 2 -ExpectedOutput "expected a number above 0"
+
+# Test that results are written as JSON Lines, one object per line
+$OutTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $OutTmp
+Run-Test -TestName "JSONL Output" -Command {
+    python RT-MASK.py -c 10.0.0.0/30 --format jsonl -o (Join-Path $OutTmp "r.jsonl") --no-banner | Out-Null
+    $rows = Get-Content (Join-Path $OutTmp "r.jsonl")
+    if ($rows.Count -ne 2) {
+        throw "expected 2 lines, got $($rows.Count)"
+    }
+    $rows[-1]
+} -ExpectedOutput '{"ipv4": "10.0.0.2", "ipv6": "::ffff:0a00:0002"'
+Remove-Item -Recurse -Force $OutTmp -ErrorAction SilentlyContinue
+
+# Test that a failed lookup is answered from the cache on the next run
+$CacheTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+Run-Test -TestName "Cache Negative Answer" -Command {
+    python RT-MASK.py -d nonexistent.invalid --cache-dir $CacheTmp --no-banner
+    python RT-MASK.py -d nonexistent.invalid --cache-dir $CacheTmp --cache-stats --no-banner
+} -ExpectedOutput "hits=1"
+Remove-Item -Recurse -Force $CacheTmp -ErrorAction SilentlyContinue
+
+# Test that --cache-ttl shortens how long answers are kept
+$CacheTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+Run-Test -TestName "Cache TTL Override" -Command {
+    python RT-MASK.py -d nonexistent.invalid --cache-dir $CacheTmp --cache-ttl dns=1 --no-banner
+    Start-Sleep -Seconds 2
+    python RT-MASK.py -d nonexistent.invalid --cache-dir $CacheTmp --cache-ttl dns=1 --cache-stats --no-banner
+} -ExpectedOutput "misses=1"
+Remove-Item -Recurse -Force $CacheTmp -ErrorAction SilentlyContinue
+
+# Test the reachability prober against a local TCP listener
+$OutTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $OutTmp
+$Listener = [System.Net.Sockets.TcpListener]::new([System.Net.IPAddress]::Loopback, 18751)
+$Listener.Start()
+Run-Test -TestName "Network Probe Ports" -Command {
+    python RT-MASK.py -i 127.0.0.1 --network --ports 18751,18752 --no-cache -o (Join-Path $OutTmp "r.jsonl") --no-banner | Out-Null
+    Get-Content (Join-Path $OutTmp "r.jsonl")
+} -ExpectedOutput '"open_ports": [18751]'
+$Listener.Stop()
+Remove-Item -Recurse -Force $OutTmp -ErrorAction SilentlyContinue
+
+# Test that the DNS concurrency must be at least 1
+Run-Test -TestName "Invalid DNS Concurrency" -Command {
+    python RT-MASK.py -d example.com --dns-concurrency 0
+} -ExpectedExitCode 2 -ExpectedOutput "expected at least 1"
+
+# Test plain tab-separated text output
+Run-Test -TestName "Plain Output" -Command {
+    python RT-MASK.py -i 10.0.0.1 --plain --no-banner
+} -ExpectedOutput "10.0.0.1`t::ffff:0a00:0001`thttp://[::ffff:0a00:0001]"
+
+# Test that a second run skips the QR codes already in the ZIP archive
+$QrTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+Run-Test -TestName "QR Archive Rerun" -Command {
+    python RT-MASK.py -c 10.0.0.0/29 --qr --qr-archive codes.zip --output-dir $QrTmp --no-banner | Out-Null
+    $first = (Get-FileHash (Join-Path $QrTmp "codes.zip")).Hash
+    python RT-MASK.py -c 10.0.0.0/29 --qr --qr-archive codes.zip --output-dir $QrTmp --no-banner | Out-Null
+    if ((Get-FileHash (Join-Path $QrTmp "codes.zip")).Hash -ne $first) {
+        throw "codes.zip was rewritten"
+    }
+    python -c "import sys, zipfile; names = zipfile.ZipFile(sys.argv[1]).namelist(); print(len(names), len(set(names)))" (Join-Path $QrTmp "codes.zip")
+} -ExpectedOutput "6 6"
+Remove-Item -Recurse -Force $QrTmp -ErrorAction SilentlyContinue
+
+# Test that a second run keeps the sprite sheets and adds new codes on a new sheet
+$QrTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+Run-Test -TestName "QR Sprite Rerun" -Command {
+    python RT-MASK.py -c 10.0.0.0/29 --qr --qr-archive codes.png --output-dir $QrTmp --no-banner | Out-Null
+    $first = (Get-FileHash (Join-Path $QrTmp "codes_0000.png")).Hash
+    python RT-MASK.py -c 10.0.0.0/28 --qr --qr-archive codes.png --output-dir $QrTmp --no-banner | Out-Null
+    if ((Get-FileHash (Join-Path $QrTmp "codes_0000.png")).Hash -ne $first) {
+        throw "codes_0000.png was rewritten"
+    }
+    python -c "import json, sys; index = json.load(open(sys.argv[1])); print(len(index), 'codes on', len({tile['sheet'] for tile in index.values()}), 'sheets')" (Join-Path $QrTmp "codes.json")
+} -ExpectedOutput "14 codes on 2 sheets"
+Remove-Item -Recurse -Force $QrTmp -ErrorAction SilentlyContinue
+
+# Test that the QR worker count must be at least 1
+Run-Test -TestName "Invalid QR Workers" -Command {
+    python RT-MASK.py -i 10.0.0.1 --qr --qr-workers 0
+} -ExpectedExitCode 2 -ExpectedOutput "expected at least 1"
+
+# Test the per-stage statistics and the Prometheus metrics export
+$OutTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $OutTmp
+Run-Test -TestName "Stats And Metrics File" -Command {
+    python RT-MASK.py -d nonexistent.invalid --no-cache --stats --metrics-file (Join-Path $OutTmp "m.prom") --no-banner | Out-Null
+    Get-Content (Join-Path $OutTmp "m.prom")
+} -ExpectedOutput 'rtmask_stage_errors_total{stage="dns"} 1'
+Remove-Item -Recurse -Force $OutTmp -ErrorAction SilentlyContinue
+
+# Test resuming a job written to --output-dir
+$JobTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $JobTmp
+Run-Test -TestName "Resume Job Output Dir" -Command {
+    $script = Join-Path (Get-Location) "RT-MASK.py"
+    python RT-MASK.py -c 10.0.0.0/30 --output-dir (Join-Path $JobTmp "out") -o r.jsonl --job-dir (Join-Path $JobTmp "job") --no-banner | Out-Null
+    Remove-Item (Join-Path $JobTmp "out/r.jsonl")
+    Push-Location $JobTmp
+    try {
+        python $script --resume job --no-banner | Out-Null
+    }
+    finally {
+        Pop-Location
+    }
+    if (Test-Path (Join-Path $JobTmp "r.jsonl")) {
+        throw "the resumed job wrote outside --output-dir"
+    }
+    Get-Content (Join-Path $JobTmp "out/r.jsonl")
+} -ExpectedOutput '"ipv4": "10.0.0.2"'
+Remove-Item -Recurse -Force $JobTmp -ErrorAction SilentlyContinue
+
+# Test that merged shards and a parallel run match a single run byte for byte
+$ShardTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $ShardTmp
+Run-Test -TestName "Shard And Merge" -Command {
+    python RT-MASK.py -c 10.0.0.0/26 -o (Join-Path $ShardTmp "all.jsonl") --no-banner | Out-Null
+    foreach ($k in 1..3) {
+        python RT-MASK.py -c 10.0.0.0/26 --shard "$k/3" -o (Join-Path $ShardTmp "part-$k.jsonl") --no-banner | Out-Null
+    }
+    $parts = Get-ChildItem (Join-Path $ShardTmp "part-*.jsonl") | ForEach-Object { $_.FullName }
+    python RT-MASK.py --merge @parts -o (Join-Path $ShardTmp "merged.jsonl") --no-banner | Out-Null
+    if ((Get-FileHash (Join-Path $ShardTmp "all.jsonl")).Hash -ne (Get-FileHash (Join-Path $ShardTmp "merged.jsonl")).Hash) {
+        throw "merged shards differ from a single run"
+    }
+    "$((Get-Content (Join-Path $ShardTmp "merged.jsonl")).Count) rows"
+} -ExpectedOutput "62 rows"
+Run-Test -TestName "Parallel Matches Single Run" -Command {
+    python RT-MASK.py -c 10.0.0.0/26 -o (Join-Path $ShardTmp "all.json") --no-banner | Out-Null
+    python RT-MASK.py -c 10.0.0.0/26 -o (Join-Path $ShardTmp "par.json") --parallel 3 --no-banner | Out-Null
+    if ((Get-FileHash (Join-Path $ShardTmp "all.json")).Hash -ne (Get-FileHash (Join-Path $ShardTmp "par.json")).Hash) {
+        throw "the parallel run differs from a single run"
+    }
+    python RT-MASK.py --merge (Join-Path $ShardTmp "par.json") --no-banner --plain
+} -ExpectedOutput "10.0.0.62`t"
+Remove-Item -Recurse -Force $ShardTmp -ErrorAction SilentlyContinue
+
+# Test a parallel run into a relative --output-dir
+$ShardTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $ShardTmp
+Run-Test -TestName "Parallel Relative Output Dir" -Command {
+    $script = Join-Path (Get-Location) "RT-MASK.py"
+    Push-Location $ShardTmp
+    try {
+        python $script -c 10.0.0.0/28 --output-dir out -o r.jsonl --parallel 2 --no-banner | Out-Null
+    }
+    finally {
+        Pop-Location
+    }
+    Get-Content (Join-Path $ShardTmp "out/r.jsonl") -Tail 1
+} -ExpectedOutput '"ipv4": "10.0.0.14"'
+Remove-Item -Recurse -Force $ShardTmp -ErrorAction SilentlyContinue
+
+# Test that the number of parallel shards must be at least 1
+Run-Test -TestName "Invalid Parallel Count" -Command {
+    python RT-MASK.py -c 10.0.0.0/28 --parallel 0
+} -ExpectedExitCode 2 -ExpectedOutput "expected at least 1"
+
+# Test that CSV shards cannot be merged into another format
+$ShardTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $ShardTmp
+Run-Test -TestName "Merge CSV Into JSON" -Command {
+    python RT-MASK.py -c 10.0.0.0/30 -o (Join-Path $ShardTmp "part-1.csv") --no-banner | Out-Null
+    python RT-MASK.py --merge (Join-Path $ShardTmp "part-1.csv") -o (Join-Path $ShardTmp "merged.json") --no-banner
+} -ExpectedExitCode 1 -ExpectedOutput "CSV shard outputs can only be merged into a CSV output"
+Remove-Item -Recurse -Force $ShardTmp -ErrorAction SilentlyContinue
+
+# Test the service endpoints against a local server
+$ServiceUrl = "http://127.0.0.1:18750"
+$Service = Start-Process python -ArgumentList "RT-MASK.py", "--serve", "127.0.0.1:18750", "--no-cache", "--no-banner" -PassThru -WindowStyle Hidden
+foreach ($attempt in 1..50) {
+    try {
+        $null = Invoke-WebRequest -Uri "$ServiceUrl/health" -UseBasicParsing
+        break
+    }
+    catch {
+        Start-Sleep -Milliseconds 100
+    }
+}
+Run-Test -TestName "Service Health" -Command {
+    (Invoke-WebRequest -Uri "$ServiceUrl/health" -UseBasicParsing).Content
+} -ExpectedOutput '"status": "ok"'
+Run-Test -TestName "Service Convert" -Command {
+    (Invoke-WebRequest -Uri "$ServiceUrl/convert" -Method Post -Body '{"targets": ["10.0.0.0/30"], "enrich": []}' -UseBasicParsing).Content
+} -ExpectedOutput '"count": 2'
+Run-Test -TestName "Service Convert Query" -Command {
+    (Invoke-WebRequest -Uri "$ServiceUrl/convert?target=10.0.0.1&enrich=" -UseBasicParsing).Content
+} -ExpectedOutput '"ipv4": "10.0.0.1", "ipv6": "::ffff:0a00:0001"'
+Run-Test -TestName "Service Invalid Enrich" -Command {
+    try {
+        Invoke-WebRequest -Uri "$ServiceUrl/convert" -Method Post -Body '{"targets": ["10.0.0.1"], "enrich": "geo"}' -UseBasicParsing
+    }
+    catch {
+        "status $([int]$_.Exception.Response.StatusCode)"
+    }
+} -ExpectedOutput "status 400"
+Run-Test -TestName "Service Invalid Content Length" -Command {
+    python -c "import socket; s = socket.create_connection(('127.0.0.1', 18750)); s.sendall(b'POST /convert HTTP/1.1\r\nHost: localhost\r\nContent-Length: abc\r\n\r\n'); print(s.recv(4096).decode())"
+} -ExpectedOutput "HTTP/1.1 400"
+Run-Test -TestName "Service Metrics" -Command {
+    (Invoke-WebRequest -Uri "$ServiceUrl/metrics" -UseBasicParsing).Content
+} -ExpectedOutput "# TYPE rtmask_stage_calls_total counter"
+Run-Test -TestName "Service Stats" -Command {
+    (Invoke-WebRequest -Uri "$ServiceUrl/stats" -UseBasicParsing).Content
+} -ExpectedOutput '{"requests": 3, "metrics": {'
+Stop-Process -Id $Service.Id
+
+# Test that --dedupe processes every address of overlapping input once
+$DedupeTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $DedupeTmp
+Set-Content -Path (Join-Path $DedupeTmp "targets.txt") -Value "10.0.0.0/30", "10.0.0.2", "10.0.0.0/29"
+Run-Test -TestName "Dedupe Overlapping Input" -Command {
+    python RT-MASK.py -f (Join-Path $DedupeTmp "targets.txt") --dedupe -o (Join-Path $DedupeTmp "r.jsonl") --no-banner
+    $rows = Get-Content (Join-Path $DedupeTmp "r.jsonl")
+    if ($rows.Count -ne 6 -or ($rows | Sort-Object -Unique).Count -ne 6) {
+        throw "expected 6 distinct rows, got $($rows.Count)"
+    }
+} -ExpectedOutput "6 targets to process instead of 9"
+Remove-Item -Recurse -Force $DedupeTmp -ErrorAction SilentlyContinue
+
+# Test the paginated HTML report and its chunked data files
+$HtmlTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+Run-Test -TestName "HTML Pages Report" -Command {
+    python RT-MASK.py -c 10.0.0.0/27 --format html-pages --page-size 10 --output-dir $HtmlTmp -o report.html --no-banner | Out-Null
+    $pages = Get-ChildItem (Join-Path $HtmlTmp "report_data")
+    if ($pages.Count -ne 3) {
+        throw "expected 3 data files, got $($pages.Count)"
+    }
+    Get-Content (Join-Path $HtmlTmp "report_data/page-00002.js")
+} -ExpectedOutput 'rtmaskPage(2,[["10.0.0.21"'
+Remove-Item -Recurse -Force $HtmlTmp -ErrorAction SilentlyContinue
+
+# Test that the page size must be at least 1
+Run-Test -TestName "Invalid Page Size" -Command {
+    python RT-MASK.py -c 10.0.0.0/27 --format html-pages --page-size 0
+} -ExpectedExitCode 2 -ExpectedOutput "expected at least 1"
+
+# Test that RDAP and the port-43 fallback report a domain status the same way
+$RdapCheck = @'
+import sys
+sys.path[:0] = [".", "benchmarks"]
+import fakes
+from rtmask.core.http import HTTPClient
+from rtmask.core.rdap import RDAPClient
+with fakes.FakeRDAPServer() as rdap, fakes.FakeWhoisServer() as whois:
+    client = RDAPClient(HTTPClient(), bootstrap_url=rdap.url, referral_server="{}:{}".format(*whois.address))
+    rdap_status = client.lookup("host.test").status
+    whois_status = client.lookup("host.example").status
+    print("rdap", rdap_status, "port-43", whois_status, "queries", client.rdap_queries, client.whois_queries)
+'@
+Run-Test -TestName "RDAP Status Normalisation" -Command {
+    $RdapCheck | python -
+} -ExpectedOutput "rdap ['client transfer prohibited'] port-43 ['client transfer prohibited'] queries 1 2"
+
+# Test that a packed columnar file reads back as the same results
+$RtmTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $RtmTmp
+Run-Test -TestName "RTM Round Trip" -Command {
+    python RT-MASK.py -c 10.0.0.0/26 -o (Join-Path $RtmTmp "r.rtm") --no-banner | Out-Null
+    python RT-MASK.py -c 10.0.0.0/26 -o (Join-Path $RtmTmp "direct.jsonl") --no-banner | Out-Null
+    python RT-MASK.py --merge (Join-Path $RtmTmp "r.rtm") -o (Join-Path $RtmTmp "read.jsonl") --no-banner | Out-Null
+    if ((Get-FileHash (Join-Path $RtmTmp "direct.jsonl")).Hash -ne (Get-FileHash (Join-Path $RtmTmp "read.jsonl")).Hash) {
+        throw "results read back from r.rtm differ"
+    }
+    Get-Content (Join-Path $RtmTmp "read.jsonl") -Tail 1
+} -ExpectedOutput '"ipv4": "10.0.0.62", "ipv6": "::ffff:0a00:003e"'
+Remove-Item -Recurse -Force $RtmTmp -ErrorAction SilentlyContinue
+
+# Test that --previous reuses an earlier run and --changes reports the difference
+$IncTmp = Join-Path ([System.IO.Path]::GetTempPath()) ([System.IO.Path]::GetRandomFileName())
+$null = New-Item -ItemType Directory -Path $IncTmp
+Set-Content -Path (Join-Path $IncTmp "targets.txt") -Value "10.0.0.2", "10.0.0.3"
+Run-Test -TestName "Previous Run And Changes" -Command {
+    python RT-MASK.py -c 10.0.0.0/30 --qr --output-dir $IncTmp -o prev.jsonl --no-banner | Out-Null
+    python RT-MASK.py -f (Join-Path $IncTmp "targets.txt") --qr --output-dir $IncTmp -o new.jsonl `
+        --previous (Join-Path $IncTmp "prev.jsonl") --changes (Join-Path $IncTmp "changes.jsonl") --no-banner
+    $changes = Get-Content (Join-Path $IncTmp "changes.jsonl")
+    if (-not ($changes -match '"change": "added", "target": "10.0.0.3"') -or -not ($changes -match '"change": "removed", "target": "10.0.0.1"')) {
+        throw "unexpected change report: $changes"
+    }
+} -ExpectedOutput "1 added, 0 changed, 1 removed"
+Remove-Item -Recurse -Force $IncTmp -ErrorAction SilentlyContinue
+
+# Test the compact console table
+Run-Test -TestName "Compact Table" -Command {
+    $lines = python RT-MASK.py -c 10.0.0.0/29 --compact --no-banner --no-progress
+    if ($lines[0] -notmatch '^IPv4 +IPv6 +Domain$') {
+        throw "unexpected header: $($lines[0])"
+    }
+    $lines[-1]
+} -ExpectedOutput "10.0.0.6         ::ffff:0a00:0006"
+
 # Print summary
 Write-Host "===================="
 Write-Host "Test Summary:"